@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Minimal stand-in for the Przelewy24 REST API, for trying out payments and
+the reconciler locally. Point the app at it with:
+
+    PAYMENTS_P24_BASE_URL=http://localhost:8024/ ./manage.py runserver
+
+Every registered transaction is reported back with the --status given here
+(0 - not paid, 1 - paid but not verified, 2 - paid and verified), so
+reconcile_stale_payments can be run against it. Signatures are not checked.
+"""
+
+import argparse
+import itertools
+import json
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+order_ids = itertools.count(100000)
+transactions = {}  # sessionId -> transaction data
+
+
+class Handler(BaseHTTPRequestHandler):
+    status = 1
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, data, code=200):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _path(self) -> str:
+        # The client joins some endpoints with an extra slash:
+        return "/" + self.path.lstrip("/")
+
+    def do_GET(self):
+        path = self._path()
+        if path == "/api/v1/testAccess":
+            self._send_json({"data": True, "error": ""})
+        elif path.startswith("/api/v1/transaction/by/sessionId/"):
+            session_id = path.rsplit("/", 1)[-1]
+            if session_id not in transactions:
+                self._send_json({"error": "Transaction not found", "code": 404}, code=404)
+                return
+
+            transaction = transactions[session_id]
+            self._send_json({"data": {**transaction, "status": self.status}, "responseCode": 0})
+        elif path.startswith("/trnRequest/"):
+            body = b"<p>Przelewy24 stub: pretend you paid and run the reconciler.</p>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json({"error": "Not found", "code": 404}, code=404)
+
+    def do_POST(self):
+        path = self._path()
+        data = self._read_json()
+        if path == "/api/v1/transaction/register":
+            transactions[data["sessionId"]] = {
+                "sessionId": data["sessionId"],
+                "orderId": next(order_ids),
+                "amount": data["amount"],
+                "currency": data.get("currency", "PLN"),
+                "statement": f"p24-stub-{data['sessionId']}",
+            }
+            self._send_json({"data": {"token": uuid.uuid4().hex}, "responseCode": 0})
+        elif path == "/api/v1/transaction/refund":
+            self._send_json({"data": [{**refund, "status": True} for refund in data.get("refunds", [])]}, code=201)
+        else:
+            self._send_json({"error": "Not found", "code": 404}, code=404)
+
+    def do_PUT(self):
+        path = self._path()
+        self._read_json()
+        if path == "/api/v1/transaction/verify":
+            self._send_json({"data": {"status": "success"}, "responseCode": 0})
+        else:
+            self._send_json({"error": "Not found", "code": 404}, code=404)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8024)
+    parser.add_argument("--status", type=int, choices=(0, 1, 2), default=1, help="status reported for transactions")
+    args = parser.parse_args()
+
+    Handler.status = args.status
+    server = ThreadingHTTPServer(("localhost", args.port), Handler)
+    print(f"Przelewy24 stub listening on http://localhost:{args.port}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
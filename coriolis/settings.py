@@ -80,6 +80,20 @@ PRIVATE_MEDIA_ROOT = env.str("PRIVATE_MEDIA_ROOT", BASE_DIR / "private")
 
 TICKET_RENDERER_MAX_JOBS = env.int("TICKET_RENDERER_MAX_JOBS", 3)
 
+# Seconds for which anonymous front page/event index responses are cached
+# by Django (and by nginx via X-Accel-Expires). Set to 0 to disable.
+ANONYMOUS_PAGE_CACHE_TIMEOUT = env.int("ANONYMOUS_PAGE_CACHE_TIMEOUT", 10)
+
+# Largest application attachment accepted by the resumable upload endpoint, in bytes.
+RESUMABLE_UPLOAD_MAX_SIZE = env.int("RESUMABLE_UPLOAD_MAX_SIZE", 512 * 1024 * 1024)
+
+# Limits of unsubmitted resumable uploads a user can have per application type.
+RESUMABLE_UPLOAD_MAX_PENDING = env.int("RESUMABLE_UPLOAD_MAX_PENDING", 10)
+RESUMABLE_UPLOAD_MAX_PENDING_SIZE = env.int("RESUMABLE_UPLOAD_MAX_PENDING_SIZE", 1024 * 1024 * 1024)
+
+# Key for the process metrics endpoint (caches, gateway calls, etc). Disabled if unset.
+PROMETHEUS_METRICS_KEY = env.str("PROMETHEUS_METRICS_KEY", None)
+
 if hosts := env.str("ALLOWED_HOSTS", None):
     ALLOWED_HOSTS = [host.strip() for host in hosts.split(",")]
 
@@ -189,6 +203,7 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "events.middleware.AnonymousPageCacheMiddleware",
     "pyinstrument.middleware.ProfilerMiddleware",
 
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.shortcuts import redirect
+from django.utils.translation import get_language
+
+from events.models import ExportJob
+
+
+def start_export(request, kind: str, queryset, export_format: str = "xlsx"):
+    """Queues a background export of the selected objects and redirects
+    to the export job page, which shows the progress and download link.
+    Staff users can always see their own export jobs (see ExportJobAdmin)."""
+    from events.exports import dump_export_selection
+    from events.tasks.exports import run_export_job
+
+    job = ExportJob.objects.create(
+        user=request.user,
+        kind=kind,
+        format=export_format,
+        params=dump_export_selection(request, queryset),
+        language=get_language(),
+    )
+
+    transaction.on_commit(lambda: run_export_job.send(str(job.id)))
+    return redirect("admin:events_exportjob_change", job.id)
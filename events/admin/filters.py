@@ -1,6 +1,10 @@
+import json
+
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 
+from events.dynaforms.fields import BooleanField, ChoiceField, MultiSelectField, CheckboxField
+from events.dynaforms.utils import translate_text
 from events.models import TicketType, ApplicationType
 
 
@@ -31,3 +35,47 @@ class EventContextBasedApplicationTypeFilter(EventContextBasedObjectFilter):
     title = _("application type")
     parameter_name = "application_type"
     object_type = ApplicationType
+
+
+class ApplicationAnswerFilter(admin.SimpleListFilter):
+    """Filters applications by their answers to choice and checkbox fields
+    of the selected application type. Lookup values are JSON-encoded
+    (field, answer) pairs matched with JSON containment, which is served
+    by the GIN index on Application.answers."""
+
+    title = _("answer")
+    parameter_name = "answer"
+
+    def lookups(self, request, model_admin):
+        type_id = request.GET.get(EventContextBasedApplicationTypeFilter.parameter_name)
+        if not (type_id and type_id.isdigit()):
+            return []
+
+        if (application_type := ApplicationType.objects.filter(id=type_id).first()) is None:
+            return []
+
+        lookups = []
+        for name, field in application_type.get_dynaform().fields.items():
+            label = translate_text(field.label) if isinstance(field.label, dict) else field.label
+
+            if isinstance(field, BooleanField):
+                lookups.append((json.dumps([name, True]), f"{label}: {_('Yes')}"))
+                lookups.append((json.dumps([name, False]), f"{label}: {_('No')}"))
+            elif isinstance(field, ChoiceField):
+                multiple = isinstance(field, (MultiSelectField, CheckboxField))
+                for choice, choice_label in field.choices.items():
+                    answer = [choice] if multiple else choice
+                    lookups.append((json.dumps([name, answer]), f"{label}: {choice_label}"))
+
+        return lookups
+
+    def queryset(self, request, queryset):
+        if value := self.value():
+            try:
+                name, answer = json.loads(value)
+            except (ValueError, TypeError):
+                return queryset.none()
+
+            queryset = queryset.filter(answers__contains={name: answer})
+
+        return queryset
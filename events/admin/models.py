@@ -1,18 +1,27 @@
-from typing import Any
-from collections.abc import Callable
+import re
 
+import pydantic
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import storages
 from django.db import models
 from django.forms import CheckboxSelectMultiple
-from django.forms import ModelForm
-from django.urls import reverse
+from django.forms import ModelForm, ValidationError
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
-from events.admin.filters import EventContextBasedTicketTypeFilter, EventContextBasedApplicationTypeFilter
-from events.admin.xlsx_utils import create_in_memory_xlsx, finalize_in_memory_xlsx, xlsx_safe_value
+from events.admin.filters import (
+    EventContextBasedTicketTypeFilter,
+    EventContextBasedApplicationTypeFilter,
+    ApplicationAnswerFilter,
+)
+from events.admin.exports import start_export
 from events.models import (
     User,
     Event,
@@ -23,6 +32,7 @@ from events.models import (
     TicketType,
     Ticket,
     Payment,
+    PaymentWebhook,
     RefundRequest,
     Application,
     ApplicationType,
@@ -31,9 +41,10 @@ from events.models import (
     EventOrgBillingDetails,
     EventOrgInvoice,
     AgePublicKey,
+    ExportJob,
 )
 
-from events.dynaforms.fields import Dynaform
+from events.dynaforms.fields import Dynaform, SIMPLE_IDENTIFIER_PATTERN
 
 # Ensure users go through the allauth workflow when logging into admin.
 admin.site.login = staff_member_required(admin.site.login, login_url="/accounts/login")
@@ -162,6 +173,7 @@ class TicketAdmin(admin.ModelAdmin):
     formfield_overrides = {
         models.ManyToManyField: {"widget": CheckboxSelectMultiple},
     }
+    actions = ("export_as_xlsx", "export_as_csv", "export_as_parquet")
 
     def get_fields(self, request, obj=None):
         fields = list(super().get_fields(request, obj))
@@ -189,6 +201,18 @@ class TicketAdmin(admin.ModelAdmin):
             obj.type.name,
         )
 
+    @admin.action(description=_("Export as XLSX"))
+    def export_as_xlsx(self, request, queryset):
+        return start_export(request, "tickets", queryset)
+
+    @admin.action(description=_("Export as CSV"))
+    def export_as_csv(self, request, queryset):
+        return start_export(request, "tickets", queryset, export_format="csv")
+
+    @admin.action(description=_("Export as Parquet"))
+    def export_as_parquet(self, request, queryset):
+        return start_export(request, "tickets", queryset, export_format="parquet")
+
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -208,11 +232,33 @@ class PaymentAdmin(admin.ModelAdmin):
         )
 
 
+@admin.register(PaymentWebhook)
+class PaymentWebhookAdmin(admin.ModelAdmin):
+    list_display = ("transaction_id", "provider", "status", "state", "created", "processed")
+    list_filter = ("provider", "state", "status")
+    search_fields = ("transaction_id", "payment__id")
+    readonly_fields = ("created", "updated", "processed", "error")
+    autocomplete_fields = ("payment",)
+    actions = ["retry_failed_webhooks"]
+
+    @admin.action(description=_("Retry failed webhooks"))
+    def retry_failed_webhooks(self, request, queryset):
+        from events.tasks.payments import process_payment_webhook
+
+        failed_ids = list(queryset.filter(state=PaymentWebhook.State.FAILED).values_list("id", flat=True))
+        PaymentWebhook.objects.filter(id__in=failed_ids).update(state=PaymentWebhook.State.QUEUED)
+        for webhook_id in failed_ids:
+            process_payment_webhook.send(str(webhook_id))
+
+        self.message_user(request, _("Queued %(count)d webhook(s) for processing.") % {"count": len(failed_ids)})
+
+
 @admin.register(RefundRequest)
 class RefundRequestAdmin(admin.ModelAdmin):
     list_select_related = ("payment", "payment__ticket", "payment__ticket__type", "payment__ticket__event")
-    list_display = ("id", "created", "approved", "executed", "payment", "amount", "title")
-    list_filter = ("approved", )
+    list_display = ("id", "created", "approved", "state", "executed", "payment", "amount", "title")
+    list_filter = ("approved", "state")
+    readonly_fields = ("executed", "error")
     autocomplete_fields = ("payment", )
 
 
@@ -232,6 +278,16 @@ class ApplicationTypeAdminForm(ModelForm):
         validate_multiple_emails(mails)
         return mails
 
+    def clean_template(self):
+        template = self.cleaned_data["template"]
+
+        try:
+            Dynaform.build(None, template)
+        except (pydantic.ValidationError, ValueError, TypeError) as ex:
+            raise ValidationError(_("Invalid form template: %(error)s") % {"error": ex}) from ex
+
+        return template
+
 
 @admin.register(ApplicationType)
 class ApplicationTypeAdmin(admin.ModelAdmin):
@@ -247,22 +303,25 @@ class ApplicationTypeAdmin(admin.ModelAdmin):
 class ApplicationAdmin(admin.ModelAdmin):
     list_select_related = ("event", "type", "ticket", "ticket__event", "ticket__type", "ticket__type__event")
     list_display = ("name", "label", "event", "type_link", "status", "phone", "email", "ticket_code", "created")
-    list_filter = ("event", EventContextBasedApplicationTypeFilter, "status")
+    list_filter = ("event", EventContextBasedApplicationTypeFilter, ApplicationAnswerFilter, "status", "attachments_state")
     search_fields = ("name", "email", "phone")
+    search_help_text = _("Search by name, email or phone. Use 'field:text' to search in answers to a given field.")
     autocomplete_fields = ("user", "type", "ticket")
-    actions = ("download_as_xlsx",)
+    actions = ("download_as_xlsx", "reprocess_attachments")
 
-    @admin.display(description=_("label"))
-    def label(self, obj):
-        selector = obj.type.label_selector
-        if not selector:
-            return "-"
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_label()
 
-        maybe_label = obj.answers.get(selector)
-        if maybe_label:
-            return maybe_label
+    def get_search_results(self, request, queryset, search_term):
+        field, separator, text = search_term.partition(":")
+        if separator and re.fullmatch(SIMPLE_IDENTIFIER_PATTERN, field.strip()):
+            return queryset.filter(**{f"answers__{field.strip()}__icontains": text.strip()}), False
 
-        return "-"
+        return super().get_search_results(request, queryset, search_term)
+
+    @admin.display(description=_("label"), ordering="answer_label")
+    def label(self, obj):
+        return obj.answer_label or "-"
 
     @admin.display(description=_("type"))
     def type_link(self, obj):
@@ -283,73 +342,19 @@ class ApplicationAdmin(admin.ModelAdmin):
             obj.ticket.get_code(),
         )
 
-    @admin.action(description=_("Download as XLSX"))
-    def download_as_xlsx(self, request, queryset):
-        buffer, workbook, ws = create_in_memory_xlsx()
-        queryset.prefetch_related("type")
-
-        attr_cols = [
-            (_("ID"), lambda a: str(a.id)),
-            (_("User"), lambda a: a.user.email),
-            (_("Event"), lambda a: a.event.name),
-            (_("Type"), lambda a: a.type.name),
-            (_("Status"), lambda a: a.get_status_display()),
-            (_("Name"), lambda a: a.name),
-            (_("Phone"), lambda a: str(a.phone)),
-            (_("Email"), lambda a: a.email),
-            (_("Ticket"), lambda a: "-" if not a.ticket_id else a.ticket.get_code()),
-            (_("Ticket ID"), lambda a: "-" if not a.ticket_id else str(a.ticket_id)),
-            (_("Notes"), lambda a: a.notes),
-            (_("Org Notes"), lambda a: a.org_notes),
-        ]
-
-        cur_row = 1  # 0 is for headers
-        col_shift = len(attr_cols)
-
-        found_cols: list[str] = []
-        found_types: list[ApplicationType] = []
-
-        app: Application
-        for app in queryset:
-            # Extract data common for all applications, regardless of the type:
-            for col, (_unused_label, expr) in enumerate(attr_cols):
-                ws.write(cur_row, col, xlsx_safe_value(expr(app)))
+    @admin.action(description=_("Reprocess failed attachments"))
+    def reprocess_attachments(self, request, queryset):
+        from events.tasks.uploads import process_application_submission
 
-            # Extract the initial column order for each unique type:
-            if app.type not in found_types:
-                found_types.append(app.type)
-                if "fields" not in app.type.template:
-                    raise ValueError("Application type template appears to be invalid.")
+        failed_ids = list(queryset.filter(attachments_state=Application.AttachmentsState.FAILED).values_list("id", flat=True))
+        for application_id in failed_ids:
+            process_application_submission.send(str(application_id), settings.LANGUAGE_CODE)
 
-                dynaform = Dynaform.build(None, app.type.template)
-                new_cols = [fname for fname, fdata in dynaform.fields.items() if fdata.is_form_field()]
-                found_cols.extend(new_cols)
+        self.message_user(request, _("Queued %(count)d application(s) for processing.") % {"count": len(failed_ids)})
 
-            # Extract the specific application instance data per discovered column order:
-            for key, value in app.answers.items():
-                try:
-                    col = col_shift + found_cols.index(key)
-                except ValueError:
-                    found_cols.append(key)
-                    col = col_shift + len(found_cols) - 1
-
-                try:
-                    error = ws.write(cur_row, col, xlsx_safe_value(value))
-                    if error:
-                        ws.write(cur_row, col, f"ERROR: {error}")
-                except:  # noqa
-                    ws.write(cur_row, col, "UNKNOWN ERROR!")
-
-            cur_row += 1
-
-        # Headers:
-        for col, (label, _unused_expr) in enumerate(attr_cols):
-            ws.write(0, col, str(label))
-
-        for col, label in enumerate(found_cols):
-            ws.write(0, col + col_shift, label)
-
-        return finalize_in_memory_xlsx(buffer, workbook)
+    @admin.action(description=_("Download as XLSX"))
+    def download_as_xlsx(self, request, queryset):
+        return start_export(request, "applications", queryset)
 
 
 @admin.register(EventOrg)
@@ -364,35 +369,7 @@ class EventOrgAdmin(admin.ModelAdmin):
 
     @admin.action(description=_("Download the ticket list as XLSX"))
     def download_ticket_list_xlsx(self, request, queryset):
-        buffer, workbook, ws = create_in_memory_xlsx()
-        attr_cols: list[tuple[str, Callable[[Ticket], Any]]] = [
-            (_("Org ID"), lambda t: str(t.org_id)),
-            (_("Org Name"), lambda t: t.org.name),
-            (_("Ticket Type"), lambda t: t.type.short_name),
-            (_("Ticket Code"), lambda t: t.get_code()),
-            (_("Name"), lambda t: t.name),
-            (_("Email"), lambda t: t.email),
-            (_("Phone"), lambda t: str(t.phone)),
-            (_("Status"), lambda t: t.get_status_display()),
-            (_("Issued Identifier"), lambda t: t.issued_identifier),
-        ]
-
-        # Don't murder the database pretty please:
-        queryset = queryset.prefetch_related("ticket_set", "ticket_set__type")
-
-        row = 0
-        for col, (label, _unused_expr) in enumerate(attr_cols):
-            ws.write(row, col, str(label))
-
-        row = 1
-        for org in queryset:
-            for ticket in org.ticket_set.order_by("created"):
-                for col, (_unused_label, expr) in enumerate(attr_cols):
-                    ws.write(row, col, xlsx_safe_value(expr(ticket)))
-
-                row += 1
-
-        return finalize_in_memory_xlsx(buffer, workbook)
+        return start_export(request, "org_tickets", queryset)
 
 
 @admin.register(EventOrgTask)
@@ -414,53 +391,13 @@ class EventOrgBillingDetailsAdmin(admin.ModelAdmin):
     autocomplete_fields = ("event_org",)
     actions = ("download_as_xlsx", "download_as_manufaktur")
 
-    def download_xlsx_helper(self, queryset, attr_cols: list[tuple[str, Callable]]):
-        buffer, workbook, ws = create_in_memory_xlsx()
-
-        row = 0
-        for col, (label, _unused_expr) in enumerate(attr_cols):
-            ws.write(row, col, str(label))
-
-        row = 1
-        for bd in queryset:
-            for col, (_unused_label, expr) in enumerate(attr_cols):
-                ws.write(row, col, xlsx_safe_value(expr(bd)))
-
-            row += 1
-
-        return finalize_in_memory_xlsx(buffer, workbook)
-
     @admin.action(description=_("Download as Manufaktur data"))
     def download_as_manufaktur(self, request, queryset):
-        attr_cols = [
-            ("id", lambda bd: str(bd.id)),
-            ("org_id", lambda bd: str(bd.event_org.id)),
-            ("org_name", lambda bd: bd.event_org.name),
-            ("name", lambda bd: bd.name),
-            ("tax_id", lambda bd: bd.tax_id),
-            ("address", lambda bd: bd.address),
-            ("postcode", lambda bd: bd.postcode),
-            ("city", lambda bd: bd.city),
-            ("representative", lambda bd: bd.representative),
-        ]
-
-        return self.download_xlsx_helper(queryset, attr_cols)
+        return start_export(request, "manufaktur", queryset)
 
     @admin.action(description=_("Download as XLSX"))
     def download_as_xlsx(self, request, queryset):
-        attr_cols = [
-            (_("ID"), lambda bd: str(bd.id)),
-            (_("Org ID"), lambda bd: str(bd.event_org.id)),
-            (_("Event Org"), lambda bd: bd.event_org.name),
-            (_("Name"), lambda bd: bd.name),
-            (_("Tax ID"), lambda bd: bd.tax_id),
-            (_("Address"), lambda bd: bd.address),
-            (_("Postcode"), lambda bd: bd.postcode),
-            (_("City"), lambda bd: bd.city),
-            (_("Representative"), lambda bd: bd.representative),
-        ]
-
-        return self.download_xlsx_helper(queryset, attr_cols)
+        return start_export(request, "billing_details", queryset)
 
 
 @admin.register(EventOrgInvoice)
@@ -470,3 +407,70 @@ class EventOrgInvoiceAdmin(admin.ModelAdmin):
     list_filter = ("event",)
     search_fields = ("event_org__name", "name", "document_id")
     autocomplete_fields = ("event_org",)
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_select_related = ("user",)
+    list_display = ("kind", "format", "user", "state", "progress", "created", "expires", "download_link")
+    list_filter = ("state", "kind")
+    readonly_fields = ("kind", "format", "user", "state", "progress", "created", "expires", "error", "download_link")
+    fields = readonly_fields
+    change_form_template = "admin/events/exportjob/change_form.html"
+
+    def has_add_permission(self, request):
+        return False
+
+    # Exports are started from the admins of other models, so staff users
+    # can see (and download) their own jobs without any extra permissions:
+    def has_module_permission(self, request):
+        return request.user.is_active and request.user.is_staff
+
+    def has_view_permission(self, request, obj=None):
+        if not (request.user.is_active and request.user.is_staff):
+            return False
+
+        return obj is None or obj.user_id == request.user.id or super().has_view_permission(request, obj)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if not request.user.is_superuser:
+            queryset = queryset.filter(user=request.user)
+
+        return queryset
+
+    def get_urls(self):
+        return [
+            path(
+                "<uuid:job_id>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="events_exportjob_download",
+            ),
+            *super().get_urls(),
+        ]
+
+    def download_view(self, request, job_id):
+        job = get_object_or_404(ExportJob, id=job_id, state=ExportJob.State.DONE)
+        if job.user_id != request.user.id and not request.user.is_superuser:
+            raise PermissionDenied
+
+        return FileResponse(
+            storages["private"].open(job.file, "rb"),
+            as_attachment=True,
+            filename=job.get_download_filename(),
+        )
+
+    @admin.display(description=_("progress"))
+    def progress(self, obj):
+        return obj.get_progress()
+
+    @admin.display(description=_("download"))
+    def download_link(self, obj):
+        if obj.state != ExportJob.State.DONE:
+            return "-"
+
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse("admin:events_exportjob_download", args=(obj.id,)),
+            obj.get_download_filename(),
+        )
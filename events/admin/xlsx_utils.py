@@ -1,10 +1,10 @@
 import datetime
 import decimal
-import io
+import json
 from pprint import pformat
+from typing import BinaryIO
 
 import xlsxwriter
-from django.http import FileResponse
 
 XLSX_SAFE_TYPES = (
     bool,
@@ -19,37 +19,31 @@ XLSX_SAFE_TYPES = (
 )
 
 
-def create_in_memory_xlsx() -> (io.BytesIO, xlsxwriter.Workbook, xlsxwriter.workbook.Worksheet):
-    buffer = io.BytesIO()
+def create_streaming_xlsx(output: BinaryIO) -> (xlsxwriter.Workbook, xlsxwriter.workbook.Worksheet):
+    """Creates a workbook written to the given file. In the constant memory
+    mode, rows are flushed to disk as soon as the next one is started, so
+    rows must be written in order (headers first!)."""
     workbook = xlsxwriter.Workbook(
-        buffer,
+        output,
         {
-            "in_memory": True,
+            "constant_memory": True,
             "strings_to_urls": False,
         },
     )
 
-    return buffer, workbook, workbook.add_worksheet()
-
-
-def finalize_in_memory_xlsx(
-    buffer: io.BytesIO,
-    workbook: xlsxwriter.Workbook,
-    filename: str = "export.xlsx",
-) -> FileResponse:
-    workbook.close()
-    buffer.seek(0)
-
-    return FileResponse(
-        buffer,
-        as_attachment=True,
-        filename=filename,
-        headers={"Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
-    )
+    return workbook, workbook.add_worksheet()
 
 
 def xlsx_safe_value(value):
     if type(value) in XLSX_SAFE_TYPES:
         return value
 
+    # Multiple choice answers and the like:
+    if isinstance(value, list) and all(type(v) in XLSX_SAFE_TYPES for v in value):
+        return ", ".join(str(v) for v in value)
+
+    # Complex answers (e.g. file uploads) - much cheaper than pformat:
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False, default=str)
+
     return pformat(value)
@@ -0,0 +1,141 @@
+import datetime
+import json
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from django.core.cache import cache
+from django.db import transaction
+
+from events.cache import get_cached_config
+
+if TYPE_CHECKING:
+    import events.models
+
+# Counters mirror TicketType.tickets_remaining in the shared cache. They are
+# seeded from the database on a miss and then adjusted on every purchase,
+# cancellation and expiry. The TTL makes any drift (e.g. after a manual
+# UPDATE in the database) heal itself without ever needing a full rescan.
+AVAILABILITY_COUNTER_TIMEOUT = 5 * 60
+
+# Server-sent event streams hold a gunicorn thread each, so keep them short
+# and few. Clients that don't get a stream fall back to polling the JSON.
+AVAILABILITY_STREAM_DURATION = 25
+AVAILABILITY_STREAM_INTERVAL = 2
+AVAILABILITY_MAX_STREAMS_PER_PROCESS = 2
+
+availability_streams = threading.BoundedSemaphore(AVAILABILITY_MAX_STREAMS_PER_PROCESS)
+
+
+def get_counter_key(type_id: int) -> str:
+    return f"availability.tickettype.{type_id}"
+
+
+def set_ticket_type_counter(type_id: int, remaining: int | None):
+    if remaining is None:
+        cache.delete(get_counter_key(type_id))
+    else:
+        cache.set(get_counter_key(type_id), remaining, timeout=AVAILABILITY_COUNTER_TIMEOUT)
+
+
+def adjust_ticket_type_counter(type_id: int, delta: int):
+    """Applies a change to a cached counter. Missing counters are left
+    alone - they will be seeded from the database on the next read."""
+    try:
+        cache.incr(get_counter_key(type_id), delta)
+    except ValueError:
+        pass
+
+
+def handle_ticket_type_saved(sender: type, instance, **kwargs):
+    # Saves with F() expressions don't tell us the new value - reseed later:
+    remaining = instance.tickets_remaining if isinstance(instance.tickets_remaining, int) else None
+    transaction.on_commit(lambda: set_ticket_type_counter(instance.id, remaining))
+
+
+def handle_ticket_type_deleted(sender: type, instance, **kwargs):
+    transaction.on_commit(lambda: set_ticket_type_counter(instance.id, None))
+
+
+def get_public_ticket_types(event: "events.models.Event") -> list[dict]:
+    """Returns the static parts of online ticket types for a given event,
+    served from the config cache (invalidated on ticket type changes)."""
+    from events.models import TicketType
+
+    def load():
+        return list(
+            TicketType.objects.filter(event_id=event.id, self_registration=True)
+            .order_by("display_order", "id")
+            .values("id", "registration_from", "registration_to", "show_tickets_remaining")
+        )
+
+    return get_cached_config("events.tickettype", f"public.{event.id}", load)
+
+
+def get_ticket_type_counters(type_ids: list[int]) -> dict[int, int]:
+    from events.models import TicketType
+
+    keys = {get_counter_key(type_id): type_id for type_id in type_ids}
+    counters = {keys[key]: value for key, value in cache.get_many(keys.keys()).items()}
+
+    if missing := [type_id for type_id in type_ids if type_id not in counters]:
+        seeded = dict(TicketType.objects.filter(id__in=missing).values_list("id", "tickets_remaining"))
+        for type_id, remaining in seeded.items():
+            # add() does not overwrite a counter someone else just seeded:
+            cache.add(get_counter_key(type_id), remaining, timeout=AVAILABILITY_COUNTER_TIMEOUT)
+            counters[type_id] = remaining
+
+    return counters
+
+
+def get_event_availability(event: "events.models.Event") -> dict:
+    """Returns the current availability of online ticket types, including
+    the remaining counts only where the ticket type allows showing them."""
+    now = datetime.datetime.now()
+    types = get_public_ticket_types(event)
+    counters = get_ticket_type_counters([t["id"] for t in types])
+
+    availability = {}
+    for t in types:
+        remaining = max(0, counters.get(t["id"], 0))
+        availability[str(t["id"])] = {
+            "open": t["registration_from"] <= now <= t["registration_to"],
+            "sold_out": remaining <= 0,
+            "remaining": remaining if t["show_tickets_remaining"] else None,
+        }
+
+    return {"types": availability}
+
+
+class AvailabilityStream:
+    """Iterator producing server-sent events with the event availability
+    whenever it changes. Releases its stream slot when closed, even if the
+    client disconnects before the first chunk was sent."""
+
+    def __init__(self, event: "events.models.Event"):
+        self.event = event
+        self.deadline = time.monotonic() + AVAILABILITY_STREAM_DURATION
+        self.last_payload = None
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        # The first chunk also tells the browser when to reconnect:
+        prefix = f"retry: {AVAILABILITY_STREAM_INTERVAL * 1000}\n" if self.last_payload is None else ""
+
+        while time.monotonic() < self.deadline and not self.closed:
+            payload = json.dumps(get_event_availability(self.event))
+            if payload != self.last_payload:
+                self.last_payload = payload
+                return f"{prefix}data: {payload}\n\n"
+
+            time.sleep(AVAILABILITY_STREAM_INTERVAL)
+
+        raise StopIteration
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            availability_streams.release()
@@ -0,0 +1,322 @@
+import copy
+import datetime
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+if TYPE_CHECKING:
+    import events.models
+
+# Public event fragments are recomputed at least this often, even if
+# nothing bumps the version (e.g. a ticket type registration window opens).
+EVENT_PUBLIC_CACHE_TIMEOUT = 15 * 60
+
+GLOBAL_VERSION_KEY = "events.public.version"
+
+
+def get_event_version_key(event_id) -> str:
+    return f"events.public.version.{event_id}"
+
+
+def bump_event_cache_version(event_id=None):
+    """Invalidates the cached public fragments of a given event, or all of
+    them if no event ID is given (e.g. for global event pages)."""
+    key = GLOBAL_VERSION_KEY if event_id is None else get_event_version_key(event_id)
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No version stored yet (or it was evicted) - start from a value
+        # that can't collide with anything cached before the eviction:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+@dataclass
+class EventPublicFragments:
+    """User-independent parts of the event index page."""
+
+    description_html: str
+    can_purchase_tickets: bool
+    can_purchase_in_future: bool
+    new_application_types: list = field(default_factory=list)
+
+
+def get_event_public_fragments(event: "events.models.Event") -> EventPublicFragments:
+    """Returns the cached public fragments of the event index page,
+    computing them on a miss. Cache entries are keyed on the global and
+    per-event versions, so bumping either makes the old ones unreachable."""
+    version_key = get_event_version_key(event.id)
+    versions = cache.get_many([GLOBAL_VERSION_KEY, version_key])
+    key = f"events.public.{event.id}.{versions.get(GLOBAL_VERSION_KEY, 0)}.{versions.get(version_key, 0)}"
+
+    if (fragments := cache.get(key)) is not None:
+        return fragments
+
+    fragments, timeout = build_event_public_fragments(event)
+    cache.set(key, fragments, timeout=timeout)
+    return fragments
+
+
+def build_event_public_fragments(event: "events.models.Event") -> tuple[EventPublicFragments, int]:
+    """Computes the public event fragments along with the number of seconds
+    they stay valid for - until the next registration window opens or
+    closes, capped at EVENT_PUBLIC_CACHE_TIMEOUT."""
+    from events.models import ApplicationType, TicketType
+    from events.templatetags.events import render_markdown
+
+    now = datetime.datetime.now()
+
+    ticket_windows = list(
+        TicketType.objects.filter(event=event)
+        .filter(self_registration=True)
+        .filter(tickets_remaining__gt=0)
+        .values_list("registration_from", "registration_to")
+    )
+
+    application_types = list(ApplicationType.objects.filter(event=event).order_by("slug"))
+
+    boundaries = [
+        boundary
+        for window in ticket_windows + [(t.registration_from, t.registration_to) for t in application_types]
+        for boundary in window
+        if boundary > now
+    ]
+
+    timeout = EVENT_PUBLIC_CACHE_TIMEOUT
+    if boundaries:
+        timeout = max(1, min(timeout, int((min(boundaries) - now).total_seconds()) + 1))
+
+    fragments = EventPublicFragments(
+        description_html=render_markdown(event.description),
+        can_purchase_tickets=any(start <= now <= end for start, end in ticket_windows),
+        can_purchase_in_future=any(start > now for start, _end in ticket_windows),
+        new_application_types=[t for t in application_types if t.registration_from <= now <= t.registration_to],
+    )
+
+    return fragments, timeout
+
+
+class LocalLRUCache:
+    """A tiny thread-safe LRU cache, used in front of the shared cache.
+    If `ttl` is set, entries older than that many seconds are dropped."""
+
+    def __init__(self, max_size: int, ttl: float | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+
+            value, stored_at = item
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self.items[key]
+                return None
+
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (value, time.monotonic())
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+# Config models (events, ticket types, event pages) are read on almost every
+# request, but change a few times a day. Lookups go through a per-process
+# LRU, then the shared cache, then the database. Any save/delete bumps the
+# model's generation in the shared cache (so shared entries become
+# unreachable) and broadcasts it over Redis pub/sub (so every process drops
+# its local entries). Local entries also expire after a short TTL, bounding
+# staleness if a broadcast races with a concurrent read.
+
+CONFIG_CACHE_CHANNEL = "coriolis.config-cache"
+CONFIG_CACHE_TIMEOUT = 60 * 60
+CONFIG_LOCAL_CACHE_TTL = 60
+CONFIG_LOCAL_CACHE_SIZE = 512
+
+
+class ConfigCacheListener:
+    """Listens for config cache invalidations broadcast by other processes.
+    Started lazily on first use in every process (gunicorn workers and
+    dramatiq processes are forked, so we check the PID, not a flag)."""
+
+    def __init__(self):
+        self.local = LocalLRUCache(CONFIG_LOCAL_CACHE_SIZE, ttl=CONFIG_LOCAL_CACHE_TTL)
+        self.lock = threading.Lock()
+        self.pid: int | None = None
+        self.connected = threading.Event()
+
+    def ensure_started(self):
+        if self.pid == os.getpid():
+            return
+
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+
+            # Forked from a process that had entries and a listener - neither
+            # the entries nor the listener thread are valid in this process:
+            self.local = LocalLRUCache(CONFIG_LOCAL_CACHE_SIZE, ttl=CONFIG_LOCAL_CACHE_TTL)
+            self.connected = threading.Event()
+            self.pid = os.getpid()
+
+            thread = threading.Thread(target=self.run, name="config-cache-listener", daemon=True)
+            thread.start()
+
+    def can_use_local(self) -> bool:
+        """While disconnected we could be missing invalidations, so the local
+        tier is only trusted while the subscription is up."""
+        self.ensure_started()
+        return self.connected.is_set()
+
+    def run(self):
+        backoff = 1
+        while True:
+            try:
+                client = redis.Redis.from_url(settings.REDIS_URL, health_check_interval=30)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CONFIG_CACHE_CHANNEL)
+
+                # Anything we cached before (re)connecting may be stale:
+                self.local.clear()
+                self.connected.set()
+                backoff = 1
+
+                for _message in pubsub.listen():
+                    # Invalidations are rare, so dropping everything on any
+                    # of them is simpler than tracking individual entries.
+                    self.local.clear()
+            except Exception:  # noqa
+                logging.exception("Config cache listener disconnected, retrying...")
+
+            self.connected.clear()
+            self.local.clear()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+config_cache_listener = ConfigCacheListener()
+
+
+def get_config_generation_key(model_label: str) -> str:
+    return f"config.generation.{model_label}"
+
+
+def invalidate_config_cache(model_label: str):
+    """Makes all cached lookups of a given model unreachable, in all processes."""
+    key = get_config_generation_key(model_label)
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+    config_cache_listener.local.clear()
+
+    try:
+        redis.Redis.from_url(settings.REDIS_URL).publish(CONFIG_CACHE_CHANNEL, model_label)
+    except redis.RedisError:
+        logging.exception("Could not broadcast a config cache invalidation.")
+
+
+def handle_config_model_change(sender: type, instance, **kwargs):
+    model_label = sender._meta.label_lower
+    transaction.on_commit(lambda: invalidate_config_cache(model_label))
+
+
+def get_cached_config(model_label: str, lookup: str, loader):
+    """Returns the value produced by `loader` for a given model and lookup
+    key, going through the local and shared cache tiers. Model instances
+    are copied, so that callers can't modify the cached objects."""
+    use_local = config_cache_listener.can_use_local()
+    local_key = f"{model_label}.{lookup}"
+
+    if use_local and (value := config_cache_listener.local.get(local_key)) is not None:
+        return copy.copy(value)
+
+    generation_key = get_config_generation_key(model_label)
+    generation = cache.get(generation_key, 0)
+    shared_key = f"config.{model_label}.{generation}.{lookup}"
+
+    value = cache.get(shared_key)
+    if value is None:
+        value = loader()
+        cache.set(shared_key, value, timeout=CONFIG_CACHE_TIMEOUT)
+
+    if use_local:
+        config_cache_listener.local.set(local_key, value)
+
+    return copy.copy(value)
+
+
+def get_event_or_404(slug: str) -> "events.models.Event":
+    from events.models import Event
+
+    def load():
+        return Event.objects.filter(slug=slug).first() or False
+
+    if not (event := get_cached_config("events.event", f"slug.{slug}", load)):
+        raise Http404("No Event matches the given query.")
+
+    return event
+
+
+def get_ticket_type_or_404(event: "events.models.Event", type_id: int) -> "events.models.TicketType":
+    """Note that cached ticket types may have stale tickets_remaining
+    values - use them as hints only, sales go through reserve_tickets()."""
+    from events.models import TicketType
+
+    def load():
+        return TicketType.objects.filter(event_id=event.id, id=type_id).first() or False
+
+    if not (ticket_type := get_cached_config("events.tickettype", f"id.{event.id}.{type_id}", load)):
+        raise Http404("No TicketType matches the given query.")
+
+    return ticket_type
+
+
+def get_event_page_or_404(event: "events.models.Event", page_slug: str) -> "events.models.EventPage":
+    """Returns an event page by its slug, falling back to the global pages."""
+    from events.models import EventPage
+
+    def load():
+        return (
+            EventPage.objects.filter(event=event, slug=page_slug).first()
+            or EventPage.objects.filter(event=None, slug=page_slug).first()
+            or False
+        )
+
+    if not (page := get_cached_config("events.eventpage", f"slug.{event.id}.{page_slug}", load)):
+        raise Http404("Page not found.")
+
+    return page
+
+
+def get_global_event_pages() -> "list[events.models.EventPage]":
+    from events.models import EventPage
+
+    def load():
+        return list(EventPage.objects.filter(event=None, hidden=False))
+
+    return [copy.copy(p) for p in get_cached_config("events.eventpage", "global", load)]
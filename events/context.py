@@ -1,5 +1,5 @@
 from django.conf import settings
-from events.models import EventPage
+from events.cache import get_global_event_pages
 
 
 def global_listed_event_pages(request):
@@ -9,5 +9,5 @@ def global_listed_event_pages(request):
         "login_notice": settings.LOGIN_NOTICE,
         "login_footer": settings.LOGIN_FOOTER,
         "cookies_link": settings.COOKIES_POLICY_LINK,
-        "global_event_pages": EventPage.objects.filter(event=None, hidden=False),
+        "global_event_pages": get_global_event_pages(),
     }
@@ -12,11 +12,21 @@ class ComplexAnswerFileUpload(ComplexAnswerABC):
     kind: Literal["file_upload"] = "file_upload"
     filename: str
     encrypted: bool
+    sha256: str | None = None
+
+
+class ComplexAnswerStagedUpload(ComplexAnswerABC):
+    """File uploaded with the application, but not yet encrypted and moved
+    to its final place by the background processing task."""
+
+    kind: Literal["staged_upload"] = "staged_upload"
+    filename: str
 
 
 ComplexAnswerUnion = Annotated[
     Union[  # noqa: UP007
-        ComplexAnswerFileUpload
+        ComplexAnswerFileUpload,
+        ComplexAnswerStagedUpload,
     ],
     PydanticField(discriminator="kind"),
 ]
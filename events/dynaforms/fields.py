@@ -1,14 +1,19 @@
+import copy
+import hashlib
 import re
 from abc import ABC
+from dataclasses import dataclass
 from typing import Literal, Union, Annotated
 
 import pydantic
 from crispy_forms.layout import LayoutObject, HTML, Field
 from django.forms import fields, widgets
 from django.forms.widgets import Widget
+from django.utils.translation import get_language
 from phonenumber_field import formfields as pnfields
 from pydantic import field_validator, BaseModel, Field as PydanticField
 
+from events.cache import LocalLRUCache
 from events.dynaforms.utils import (
     translate_text,
     parse_text_type_transform,
@@ -20,6 +25,10 @@ type LocalizableLabel = str | dict[str, str]
 
 SIMPLE_IDENTIFIER_PATTERN = r"^[a-zA-Z0-9_-]+$"
 
+# Compiled forms depend on the active language (labels and choices are
+# translated while building them), so keep a few per application type.
+COMPILED_DYNAFORM_CACHE_SIZE = 128
+
 
 class DynaformNode(BaseModel, ABC):
     kind: Literal[None]
@@ -338,6 +347,52 @@ class Dynaform(BaseModel):
         return layout_objects
 
 
+@dataclass(frozen=True)
+class CompiledDynaform:
+    """A validated Dynaform with prebuilt form fields and layout objects.
+    Shared between requests, so callers get copies of the prototypes."""
+
+    dynaform: Dynaform
+    field_prototypes: dict[str, Field]
+    layout_prototypes: list[LayoutObject]
+
+    @property
+    def fields(self) -> dict[str, DynaformFieldUnion]:
+        return self.dynaform.fields
+
+    def get_prefix(self):
+        return self.dynaform.get_prefix()
+
+    def get_fields(self):
+        # Same as what Django does with Form.base_fields for every form instance:
+        return {name: copy.deepcopy(field) for name, field in self.field_prototypes.items()}
+
+    def get_layout_objects(self):
+        return copy.deepcopy(self.layout_prototypes)
+
+
+compiled_dynaforms = LocalLRUCache(max_size=COMPILED_DYNAFORM_CACHE_SIZE)
+
+
+def get_compiled_dynaform(name: str | None, template: str, cache_id: str | int | None = None) -> CompiledDynaform:
+    """Returns a compiled Dynaform for a given template, building it only
+    once per process and language. Keys contain the template hash, so any
+    edits to the template are picked up without explicit invalidation."""
+    template_hash = hashlib.sha256(template.encode()).hexdigest()
+    key = (cache_id, template_hash, get_language(), name)
+
+    if (compiled := compiled_dynaforms.get(key)) is None:
+        dynaform = Dynaform.build(name, template)
+        compiled = CompiledDynaform(
+            dynaform=dynaform,
+            field_prototypes=dynaform.get_fields(),
+            layout_prototypes=dynaform.get_layout_objects(),
+        )
+        compiled_dynaforms.set(key, compiled)
+
+    return compiled
+
+
 def dynaform_prefix(name: str | None) -> str:
     if name:
         return f"df__{name}__"
@@ -8,7 +8,7 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import get_language, get_supported_language_variant
 from django.utils.translation import gettext as _
 
-from events.dynaforms.answers import ComplexAnswerUnion, ComplexAnswerFileUpload
+from events.dynaforms.answers import ComplexAnswerUnion, ComplexAnswerFileUpload, ComplexAnswerStagedUpload
 from events.templatetags.events import render_markdown
 
 TextFormats = Literal["text", "html", "markdown"]
@@ -102,6 +102,8 @@ def get_pretty_answer_value(answer: object, field: Field | None) -> str:
                 pass
 
             return label
+        elif isinstance(try_val, ComplexAnswerStagedUpload):
+            return _("%(name)s (processing)") % {"name": os.path.basename(try_val.filename)}
         else:
             logging.error(f"Unknown answer content type: {answer}")
             return "-"
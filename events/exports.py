@@ -0,0 +1,484 @@
+import csv
+import io
+import json
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any, BinaryIO
+
+from django.contrib import admin
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.db.models import F, Func, Value
+from django.db.models.functions import Cast, Coalesce, Concat, Greatest, Length, LPad
+from django.http import HttpRequest, QueryDict
+from django.utils.translation import gettext as _
+from django.utils.translation import gettext_lazy
+
+from events.admin.xlsx_utils import create_streaming_xlsx, xlsx_safe_value
+from events.models import Application, ApplicationType, EventOrg, EventOrgBillingDetails, Ticket, User
+from events.models.tickets import TicketPaymentMethod, TicketSource, TicketStatus
+
+# Rows fetched from the database at once by the exports.
+EXPORT_CHUNK_SIZE = 2000
+
+
+class ExportWriter(ABC):
+    """Writes rows of cells to a binary file, one row at a time."""
+
+    extension: str
+    content_type: str
+
+    def __init__(self, output: BinaryIO):
+        self.output = output
+
+    def write_headers(self, headers: list[str], types: list[str | None] | None = None) -> None:
+        """`types` are the column data types (see ExportTable.types), for
+        the formats that store them."""
+        self.write_row(headers)
+
+    @abstractmethod
+    def write_row(self, values: list) -> None:
+        pass
+
+    def close(self) -> None:  # noqa: B027 - optional hook
+        """Finishes the file. The output itself is left open for the caller."""
+
+
+class XlsxExportWriter(ExportWriter):
+    """Uses the xlsxwriter constant memory mode - every row is flushed to
+    disk as soon as the next one is started, so memory use stays flat."""
+
+    extension = "xlsx"
+    content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    def __init__(self, output: BinaryIO):
+        super().__init__(output)
+        self.workbook, self.worksheet = create_streaming_xlsx(output)
+        self.row = 0
+
+    def write_row(self, values: list) -> None:
+        for col, value in enumerate(values):
+            if value is None:
+                continue
+
+            try:
+                if error := self.worksheet.write(self.row, col, xlsx_safe_value(value)):
+                    self.worksheet.write(self.row, col, f"ERROR: {error}")
+            except:  # noqa
+                self.worksheet.write(self.row, col, "UNKNOWN ERROR!")
+
+        self.row += 1
+
+    def close(self) -> None:
+        self.workbook.close()
+
+
+class CsvExportWriter(ExportWriter):
+    extension = "csv"
+    content_type = "text/csv"
+
+    def __init__(self, output: BinaryIO):
+        super().__init__(output)
+        self.text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+        self.writer = csv.writer(self.text)
+
+    def write_row(self, values: list) -> None:
+        self.writer.writerow(
+            [json.dumps(v, ensure_ascii=False, default=str) if type(v) in (list, dict) else v for v in values]
+        )
+
+    def close(self) -> None:
+        # Leave the underlying file open for the caller:
+        self.text.flush()
+        self.text.detach()
+
+
+class ParquetExportWriter(ExportWriter):
+    """Writes row groups of EXPORT_CHUNK_SIZE rows. Column types come from
+    the export table (see ExportTable.types) - untyped columns are stored
+    as strings, so a later row group can never clash with the schema."""
+
+    extension = "parquet"
+    content_type = "application/vnd.apache.parquet"
+
+    def __init__(self, output: BinaryIO):
+        super().__init__(output)
+
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as ex:
+            raise ImproperlyConfigured("Parquet exports require pyarrow - install the `parquet` extra.") from ex
+
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.batch: list = []
+        self.schema = None
+        self.parquet_writer = None
+
+    def get_arrow_type(self, data_type: str | None):
+        arrow_types = {
+            "bool": self.pa.bool_(),
+            "int": self.pa.int64(),
+            # Same as the money fields (max_digits=10, decimal_places=2):
+            "decimal": self.pa.decimal128(10, 2),
+            "datetime": self.pa.timestamp("us"),
+        }
+        return arrow_types.get(data_type, self.pa.string())
+
+    def write_headers(self, headers: list[str], types: list[str | None] | None = None) -> None:
+        types = types or [None] * len(headers)
+        self.schema = self.pa.schema(
+            [(str(header), self.get_arrow_type(data_type)) for header, data_type in zip(headers, types, strict=True)]
+        )
+        self.parquet_writer = self.pq.ParquetWriter(self.output, self.schema)
+
+    def write_row(self, values: list) -> None:
+        self.batch.append(values)
+        if len(self.batch) >= EXPORT_CHUNK_SIZE:
+            self.flush()
+
+    def get_array(self, values, arrow_type):
+        if arrow_type == self.pa.string():
+            return self.pa.array([None if v is None else str(xlsx_safe_value(v)) for v in values], type=arrow_type)
+
+        return self.pa.array(values, type=arrow_type, from_pandas=False)
+
+    def flush(self) -> None:
+        if not self.batch:
+            return
+
+        columns = list(zip(*self.batch, strict=True))
+        self.batch = []
+
+        arrays = [self.get_array(column, field.type) for column, field in zip(columns, self.schema, strict=True)]
+        self.parquet_writer.write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self.flush()
+        self.parquet_writer.close()
+
+
+EXPORT_WRITERS: dict[str, type[ExportWriter]] = {
+    "xlsx": XlsxExportWriter,
+    "csv": CsvExportWriter,
+    "parquet": ParquetExportWriter,
+}
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    headers: list[str]
+    rows: Iterable[list]
+    total: int
+    # Data types of the columns ("bool", "int", "decimal", "datetime" or
+    # None for strings) - only used by the formats that store them.
+    types: list[str | None] | None = None
+
+
+@dataclass(frozen=True)
+class ExportDefinition:
+    name: str
+    filename: str
+    build: Callable[[dict], ExportTable]
+
+
+EXPORTS: dict[str, ExportDefinition] = {}
+
+
+def register_export(name: str, filename: str):
+    """Registers a function building an ExportTable from the job parameters
+    (usually the selection made in the admin, see dump_export_selection())."""
+
+    def decorator(build: Callable[[dict], ExportTable]):
+        EXPORTS[name] = ExportDefinition(name=name, filename=filename, build=build)
+        return build
+
+    return decorator
+
+
+def dump_export_selection(request: HttpRequest, queryset: models.QuerySet) -> dict:
+    """Describes the objects selected in the admin changelist. Selections
+    of "all objects" (across all pages - tens of thousands of them) are
+    stored as the changelist filters instead of listing every object."""
+    if request.POST.get("select_across") == "1":
+        return {"filters": request.GET.urlencode(), "user": str(request.user.pk)}
+
+    return {"pks": [str(pk) for pk in queryset.values_list("pk", flat=True)]}
+
+
+def load_export_selection(model: type[models.Model], params: dict) -> models.QuerySet:
+    """Primary keys of the objects selected by dump_export_selection(). The
+    filtered selections go through the ModelAdmin again, as the same user."""
+    if "filters" not in params:
+        return model.objects.filter(pk__in=params["pks"]).values("pk")
+
+    request = HttpRequest()
+    request.method = "GET"
+    request.GET = QueryDict(params["filters"])
+    request.user = User.objects.get(pk=params["user"])
+
+    model_admin = admin.site.get_model_admin(model)
+    return model_admin.get_changelist_instance(request).get_queryset(request).values("pk")
+
+
+def build_simple_table(queryset: models.QuerySet, attr_cols: list[tuple[str, Callable[[Any], Any]]]) -> ExportTable:
+    def rows():
+        for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield [expr(obj) for _unused_label, expr in attr_cols]
+
+    return ExportTable(
+        headers=[str(label) for label, _unused_expr in attr_cols],
+        rows=rows(),
+        total=queryset.count(),
+    )
+
+
+@register_export("applications", "applications")
+def export_applications(params: dict) -> ExportTable:
+    queryset = (
+        Application.objects.filter(id__in=load_export_selection(Application, params))
+        .select_related("user", "event", "type", "ticket", "ticket__event", "ticket__type")
+        .order_by("created")
+    )
+
+    attr_cols = [
+        (_("ID"), lambda a: str(a.id)),
+        (_("User"), lambda a: a.user.email),
+        (_("Event"), lambda a: a.event.name),
+        (_("Type"), lambda a: a.type.name),
+        (_("Status"), lambda a: a.get_status_display()),
+        (_("Name"), lambda a: a.name),
+        (_("Phone"), lambda a: str(a.phone)),
+        (_("Email"), lambda a: a.email),
+        (_("Ticket"), lambda a: "-" if not a.ticket_id else a.ticket.get_code()),
+        (_("Ticket ID"), lambda a: "-" if not a.ticket_id else str(a.ticket_id)),
+        (_("Notes"), lambda a: a.notes),
+        (_("Org Notes"), lambda a: a.org_notes),
+    ]
+
+    col_shift = len(attr_cols)
+
+    # Rows are written as we go, so all the answer columns must be known
+    # upfront: fields of every type in the template order, then any
+    # leftover keys (answers to fields since removed from the template).
+    type_ids = queryset.order_by().values_list("type_id", flat=True).distinct()
+    answer_cols: dict[str, None] = {}
+    for application_type in ApplicationType.objects.filter(id__in=type_ids).order_by("id"):
+        for fname, fdata in application_type.get_dynaform().fields.items():
+            if fdata.is_form_field():
+                answer_cols[fname] = None
+
+    answer_keys = (
+        queryset.order_by()
+        .annotate(answer_key=Func(F("answers"), function="jsonb_object_keys", output_field=models.TextField()))
+        .values_list("answer_key", flat=True)
+        .distinct()
+    )
+    for key in sorted(answer_keys):
+        answer_cols.setdefault(key, None)
+
+    answer_col_map = {key: col_shift + i for i, key in enumerate(answer_cols)}
+
+    def rows():
+        app: Application
+        for app in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            row = [expr(app) for _unused_label, expr in attr_cols] + [None] * len(answer_col_map)
+            for key, value in app.answers.items():
+                row[answer_col_map[key]] = value
+
+            yield row
+
+    return ExportTable(
+        headers=[str(label) for label, _unused_expr in attr_cols] + list(answer_col_map.keys()),
+        rows=rows(),
+        total=queryset.count(),
+    )
+
+
+def str_or_none(value) -> str | None:
+    return None if value is None else str(value)
+
+
+def get_ticket_code_expression(relation: str = ""):
+    """SQL equivalent of Ticket.get_code(), so exports do not have to
+    load the ticket type and event of every ticket. Pass the `relation`
+    prefix (e.g. "ticket__") to use it on querysets of other models."""
+    code = Cast(f"{relation}code", output_field=models.TextField())
+    return Concat(
+        Coalesce(F(f"{relation}type__code_prefix"), Value("")),
+        LPad(
+            code,
+            Greatest(F(f"{relation}event__ticket_code_length"), Length(code), output_field=models.IntegerField()),
+            Value("0"),
+        ),
+        output_field=models.TextField(),
+    )
+
+
+@dataclass(frozen=True)
+class TicketExportColumn:
+    label: str
+    expression: str | Callable[[], models.Expression]
+    choices: type[models.Choices] | None = None
+    convert: Callable[[Any], Any] | None = None
+    data_type: str | None = None
+
+    def get_converter(self) -> Callable[[Any], Any] | None:
+        if self.choices is not None:
+            # Resolved once per export, in the language of the export:
+            labels = {value: str(label) for value, label in self.choices.choices}
+            return lambda value: labels.get(value, value)
+
+        return self.convert
+
+
+# Columns available in ticket exports, in their default order. Plain
+# strings are field lookups, callables build SQL expressions.
+TICKET_EXPORT_COLUMNS: dict[str, TicketExportColumn] = {
+    "id": TicketExportColumn(gettext_lazy("ID"), "id", convert=str),
+    "code": TicketExportColumn(gettext_lazy("Ticket Code"), get_ticket_code_expression),
+    "event": TicketExportColumn(gettext_lazy("Event"), "event__name"),
+    "type": TicketExportColumn(gettext_lazy("Ticket Type"), "type__name"),
+    "type_short_name": TicketExportColumn(gettext_lazy("Ticket Type (short)"), "type__short_name"),
+    "status": TicketExportColumn(gettext_lazy("Status"), "status", choices=TicketStatus),
+    "status_deadline": TicketExportColumn(gettext_lazy("Status Deadline"), "status_deadline", data_type="datetime"),
+    "source": TicketExportColumn(gettext_lazy("Source"), "source", choices=TicketSource),
+    "payment_method": TicketExportColumn(gettext_lazy("Payment Method"), "payment_method", choices=TicketPaymentMethod),
+    "paid": TicketExportColumn(gettext_lazy("Paid"), "paid", data_type="bool"),
+    "contributed_value": TicketExportColumn(
+        gettext_lazy("Contributed Value"), "contributed_value", data_type="decimal"
+    ),
+    "contributed_value_currency": TicketExportColumn(gettext_lazy("Currency"), "contributed_value_currency"),
+    "name": TicketExportColumn(gettext_lazy("Name"), "name"),
+    "email": TicketExportColumn(gettext_lazy("Email"), "email"),
+    "phone": TicketExportColumn(gettext_lazy("Phone"), "phone", convert=str_or_none),
+    "city": TicketExportColumn(gettext_lazy("City"), "city"),
+    "age_gate": TicketExportColumn(gettext_lazy("Age Gate"), "age_gate", data_type="bool"),
+    "nickname": TicketExportColumn(gettext_lazy("Nickname"), "nickname"),
+    "shirt_size": TicketExportColumn(gettext_lazy("Shirt Size"), "shirt_size"),
+    "user_email": TicketExportColumn(gettext_lazy("User"), "user__email"),
+    "org_id": TicketExportColumn(gettext_lazy("Org ID"), "org_id", convert=str_or_none),
+    "org_name": TicketExportColumn(gettext_lazy("Org Name"), "org__name"),
+    "issued_identifier": TicketExportColumn(gettext_lazy("Issued Identifier"), "issued_identifier"),
+    "notes": TicketExportColumn(gettext_lazy("Notes"), "notes"),
+    "private_notes": TicketExportColumn(gettext_lazy("Private Notes"), "private_notes"),
+    "accreditation_notes": TicketExportColumn(gettext_lazy("Accreditation Notes"), "accreditation_notes"),
+    "created": TicketExportColumn(gettext_lazy("Created"), "created", data_type="datetime"),
+    "updated": TicketExportColumn(gettext_lazy("Updated"), "updated", data_type="datetime"),
+}
+
+DEFAULT_TICKET_EXPORT_COLUMNS = [
+    "id",
+    "code",
+    "type",
+    "status",
+    "name",
+    "email",
+    "phone",
+    "paid",
+    "contributed_value",
+    "org_name",
+    "created",
+]
+
+
+def build_ticket_table(queryset: models.QuerySet, columns: list[str]) -> ExportTable:
+    """Builds a ticket export selecting only the requested columns in a
+    single query, read through a server-side cursor as plain tuples."""
+    if unknown := [key for key in columns if key not in TICKET_EXPORT_COLUMNS]:
+        raise ValueError(f"Unknown ticket export columns: {', '.join(unknown)}")
+
+    selected = [(key, TICKET_EXPORT_COLUMNS[key]) for key in columns]
+    annotations = {f"export_{key}": col.expression() for key, col in selected if callable(col.expression)}
+    fields = [f"export_{key}" if callable(col.expression) else col.expression for key, col in selected]
+    converters = [(i, conv) for i, (_key, col) in enumerate(selected) if (conv := col.get_converter()) is not None]
+    values = queryset.annotate(**annotations).values_list(*fields)
+
+    def rows():
+        for row in values.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            if converters:
+                row = list(row)
+                for i, conv in converters:
+                    row[i] = conv(row[i])
+
+            yield row
+
+    return ExportTable(
+        headers=[str(col.label) for _key, col in selected],
+        rows=rows(),
+        total=queryset.count(),
+        types=[col.data_type for _key, col in selected],
+    )
+
+
+@register_export("tickets", "tickets")
+def export_tickets(params: dict) -> ExportTable:
+    queryset = Ticket.objects.filter(id__in=load_export_selection(Ticket, params)).order_by("event_id", "created")
+    return build_ticket_table(queryset, params.get("columns") or DEFAULT_TICKET_EXPORT_COLUMNS)
+
+
+@register_export("org_tickets", "org-tickets")
+def export_org_tickets(params: dict) -> ExportTable:
+    queryset = Ticket.objects.filter(org_id__in=load_export_selection(EventOrg, params)).order_by(
+        "org__name", "org_id", "created"
+    )
+    return build_ticket_table(
+        queryset,
+        [
+            "org_id",
+            "org_name",
+            "type_short_name",
+            "code",
+            "name",
+            "email",
+            "phone",
+            "status",
+            "issued_identifier",
+        ],
+    )
+
+
+def get_billing_details_queryset(params: dict) -> models.QuerySet:
+    return (
+        EventOrgBillingDetails.objects.filter(id__in=load_export_selection(EventOrgBillingDetails, params))
+        .select_related("event_org")
+        .order_by("id")
+    )
+
+
+@register_export("billing_details", "billing-details")
+def export_billing_details(params: dict) -> ExportTable:
+    return build_simple_table(
+        get_billing_details_queryset(params),
+        [
+            (_("ID"), lambda bd: str(bd.id)),
+            (_("Org ID"), lambda bd: str(bd.event_org.id)),
+            (_("Event Org"), lambda bd: bd.event_org.name),
+            (_("Name"), lambda bd: bd.name),
+            (_("Tax ID"), lambda bd: bd.tax_id),
+            (_("Address"), lambda bd: bd.address),
+            (_("Postcode"), lambda bd: bd.postcode),
+            (_("City"), lambda bd: bd.city),
+            (_("Representative"), lambda bd: bd.representative),
+        ],
+    )
+
+
+@register_export("manufaktur", "manufaktur")
+def export_manufaktur(params: dict) -> ExportTable:
+    return build_simple_table(
+        get_billing_details_queryset(params),
+        [
+            ("id", lambda bd: str(bd.id)),
+            ("org_id", lambda bd: str(bd.event_org.id)),
+            ("org_name", lambda bd: bd.event_org.name),
+            ("name", lambda bd: bd.name),
+            ("tax_id", lambda bd: bd.tax_id),
+            ("address", lambda bd: bd.address),
+            ("postcode", lambda bd: bd.postcode),
+            ("city", lambda bd: bd.city),
+            ("representative", lambda bd: bd.representative),
+        ],
+    )
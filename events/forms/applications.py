@@ -6,8 +6,7 @@ from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from phonenumber_field.formfields import PhoneNumberField
 
-from events.dynaforms.fields import Dynaform
-from events.models import Event, Application, ApplicationType
+from events.models import Event, Application, ApplicationType, StagedUpload, User
 
 
 class ApplicationDynaform(forms.Form):
@@ -41,12 +40,34 @@ class ApplicationDynaform(forms.Form):
 
     DYNAFORM_NAME = "act"
 
-    def __init__(self, *args, event: Event, application_type: ApplicationType, template: str = None, **kwargs):
+    def __init__(self, *args, event: Event, application_type: ApplicationType, user: User, **kwargs):
         super().__init__(*args, **kwargs)
-        self.dynaform = Dynaform.build(ApplicationDynaform.DYNAFORM_NAME, template)
+        self.user = user
+        self.application_type = application_type
+        self.dynaform = application_type.get_dynaform(ApplicationDynaform.DYNAFORM_NAME)
         self.dynamic_fields = self.dynaform.get_fields()
 
         self.fields.update(self.dynamic_fields)
+
+        # Files can be uploaded in resumable chunks before submitting the form,
+        # in which case a hidden field holds the staged upload ID instead:
+        self.upload_fields: dict[str, str] = {}
+        self.required_uploads: set[str] = set()
+        for name, field in self.dynamic_fields.items():
+            if not isinstance(field, forms.FileField):
+                continue
+
+            upload_field_name = f"{name}__upload"
+            self.upload_fields[name] = upload_field_name
+            self.fields[upload_field_name] = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
+            field.widget.attrs["data-resumable-upload"] = upload_field_name
+            field.widget.attrs["data-upload-field"] = name.removeprefix(self.dynaform.get_prefix())
+
+            if field.required:
+                field.required = False
+                self.required_uploads.add(name)
+
         self.fields["notes"] = forms.CharField(
             label=_("Notes"),
             required=False,
@@ -70,8 +91,37 @@ class ApplicationDynaform(forms.Form):
 
         self.helper.form_action = form_url
         self.helper.attrs["novalidate"] = True
+        upload_url = reverse("staged_upload_create", kwargs={"slug": event.slug, "id": application_type.id})
+        if key := self.initial.get("key"):
+            upload_url += "?key=" + key
+
+        self.helper.attrs["data-upload-url"] = upload_url
+        self.helper.render_hidden_fields = True
         self.helper.add_input(Submit("submit", _("Submit Application"), css_class="btn btn-lg btn-primary"))
 
+    def clean(self):
+        cleaned_data = super().clean()
+        prefix = self.dynaform.get_prefix()
+
+        for name, upload_field_name in self.upload_fields.items():
+            if upload_id := cleaned_data.get(upload_field_name):
+                upload = StagedUpload.objects.filter(
+                    id=upload_id,
+                    user=self.user,
+                    application_type=self.application_type,
+                    field_name=name.removeprefix(prefix),
+                    completed__isnull=False,
+                ).first()
+
+                if upload is None:
+                    self.add_error(name, _("The uploaded file was not found - please upload it again."))
+                else:
+                    cleaned_data[name] = upload
+            elif name in self.required_uploads and not cleaned_data.get(name):
+                self.add_error(name, self.fields[name].error_messages["required"])
+
+        return cleaned_data
+
 
 class ApplicationStatusSelfServiceForm(forms.Form):
     def __init__(self, event: Event, application: Application, flow: str, *args, **kwargs):
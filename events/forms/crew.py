@@ -7,6 +7,7 @@ from django import forms
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
+from events.issuance import MAX_TICKETS_PER_ISSUE
 from events.models import Event, Ticket, TicketType, TicketPaymentMethod
 
 
@@ -34,7 +35,7 @@ class CrewFindTicketForm(forms.Form):
 
 
 class CrewNewTicketForm(forms.Form):
-    how_many = forms.IntegerField(label=_("How many?"), initial=1, min_value=1, max_value=100)
+    how_many = forms.IntegerField(label=_("How many?"), initial=1, min_value=1, max_value=MAX_TICKETS_PER_ISSUE)
     ticket_type = forms.ChoiceField(label=_("Ticket type"), widget=forms.RadioSelect)
     age_gate = forms.ChoiceField(label=_("Is attendee of age?"), widget=forms.RadioSelect)
     payment_method = forms.ChoiceField(label=_("Payment method"), widget=forms.RadioSelect)
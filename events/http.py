@@ -0,0 +1,78 @@
+"""Outbound HTTP plumbing for payment gateway clients.
+
+Gateway calls happen during checkout, so every client keeps its
+connections alive between calls instead of paying for a TCP and TLS
+handshake each time. requests sessions are not safe to share between
+the gthread worker threads, so each thread gets its own session."""
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from events.metrics import PAYMENT_GATEWAY_REQUEST_SECONDS
+
+# (connect, read) - fail fast if the gateway is unreachable, but give
+# it some time to respond to requests that were already sent.
+GATEWAY_TIMEOUT = (3.05, 15)
+
+# Connection errors are retried for every method (nothing was sent yet),
+# read errors and 5xx responses only for the idempotent ones. POSTs that
+# create transactions or refunds are never resent after being sent.
+GATEWAY_RETRY = Retry(
+    total=3,
+    connect=2,
+    read=2,
+    status=2,
+    backoff_factor=0.25,
+    status_forcelist=(502, 503, 504),
+    allowed_methods=frozenset({"GET", "HEAD", "PUT"}),
+    raise_on_status=False,
+)
+
+
+def mount_gateway_adapter(session: requests.Session) -> requests.Session:
+    # Each session is used by a single thread, so a couple of connections is plenty:
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2, max_retries=GATEWAY_RETRY)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def create_gateway_session() -> requests.Session:
+    return mount_gateway_adapter(requests.Session())
+
+
+class ThreadLocalSessions:
+    """Lazily creates one session per thread with the given factory."""
+
+    def __init__(self, factory: Callable[[], requests.Session]):
+        self.factory = factory
+        self.local = threading.local()
+
+    def get(self) -> requests.Session:
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = self.factory()
+
+        return session
+
+
+@contextmanager
+def observe_gateway_request(provider: str, endpoint: str) -> Iterator[SimpleNamespace]:
+    """Records the latency of the wrapped gateway call. Set `status` on the
+    yielded object to the response status code - calls that raise before
+    that are recorded with the "error" status."""
+    observation = SimpleNamespace(status="error")
+    started = time.perf_counter()
+
+    try:
+        yield observation
+    finally:
+        PAYMENT_GATEWAY_REQUEST_SECONDS.labels(provider, endpoint, str(observation.status)).observe(
+            time.perf_counter() - started
+        )
@@ -0,0 +1,101 @@
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.translation import gettext as _
+
+from events.availability import adjust_ticket_type_counter
+from events.cache import bump_event_cache_version, invalidate_config_cache
+from events.models import Event, Ticket, TicketType
+from events.tasks.ticket_renderer import render_ticket_variants
+from events.utils import generate_ticket_codes
+
+# Upper bound for a single issuance request from the crew/org panels.
+MAX_TICKETS_PER_ISSUE = 500
+
+# How many times we try to allocate a fresh batch of codes if another
+# request managed to take some of ours between allocation and insert.
+CODE_ALLOCATION_ATTEMPTS = 3
+
+
+def reserve_tickets(ticket_type: TicketType, count: int):
+    """Atomically takes `count` tickets from the ticket type pool, raising
+    ValueError if there are not enough left. Must run in a transaction
+    that also creates the tickets, so that failures give them back."""
+    reserved = TicketType.objects.filter(
+        id=ticket_type.id,
+        tickets_remaining__gte=count,
+    ).update(tickets_remaining=F("tickets_remaining") - count)
+
+    if not reserved:
+        raise ValueError(_("We ran out of these tickets."))
+
+    transaction.on_commit(lambda: adjust_ticket_type_counter(ticket_type.id, -count))
+
+    # Selling out changes what the event index shows, but UPDATE does not
+    # fire post_save, so drop the cached fragments and ticket types ourselves:
+    if TicketType.objects.filter(id=ticket_type.id, tickets_remaining=0).exists():
+        transaction.on_commit(lambda: handle_ticket_type_inventory_change(ticket_type))
+
+
+def handle_ticket_type_inventory_change(ticket_type: TicketType):
+    bump_event_cache_version(ticket_type.event_id)
+    invalidate_config_cache(TicketType._meta.label_lower)
+
+
+def release_tickets(ticket_type: TicketType, count: int):
+    """Gives `count` tickets back to the ticket type pool."""
+    TicketType.objects.filter(id=ticket_type.id).update(tickets_remaining=F("tickets_remaining") + count)
+    transaction.on_commit(lambda: adjust_ticket_type_counter(ticket_type.id, count))
+    transaction.on_commit(lambda: handle_ticket_type_inventory_change(ticket_type))
+
+
+@transaction.atomic
+def issue_tickets(
+    event: Event,
+    ticket_type: TicketType,
+    count: int,
+    *,
+    reserve_inventory: bool = True,
+    **fields,
+) -> list[Ticket]:
+    """Creates `count` tickets of a given type with the same `fields`.
+
+    Reserves the inventory, allocates all codes in one go, inserts the
+    tickets in bulk, then queues the ticket renders once the transaction
+    commits. Raises ValueError with a user-facing message
+    if the tickets cannot be issued."""
+    if count < 1:
+        raise ValueError(_("Invalid ticket quantity."))
+
+    if reserve_inventory:
+        reserve_tickets(ticket_type, count)
+
+    rejected_codes: set[int] = set()
+    for attempt in range(CODE_ALLOCATION_ATTEMPTS):
+        codes = generate_ticket_codes(event, count, exclude=rejected_codes)
+        tickets = [Ticket(event=event, type=ticket_type, code=code, **fields) for code in codes]
+
+        try:
+            with transaction.atomic():
+                created_tickets = Ticket.objects.bulk_create(tickets)
+            break
+        except IntegrityError:
+            # Someone else got one of our codes in the meantime. Roll back
+            # to the savepoint and draw again, skipping the codes we just had.
+            logging.warning(f"Ticket code collision while issuing tickets (attempt {attempt + 1}), retrying...")
+            rejected_codes.update(codes)
+    else:
+        raise ValueError(_("Could not allocate ticket codes - please try again."))
+
+    if ticket_type.can_personalize:
+        ticket_ids = [str(t.id) for t in created_tickets]
+        transaction.on_commit(lambda: enqueue_ticket_renders(ticket_ids))
+
+    return created_tickets
+
+
+def enqueue_ticket_renders(ticket_ids: list[str]):
+    """Queues renders for a batch of freshly issued tickets."""
+    for ticket_id in ticket_ids:
+        render_ticket_variants.send(ticket_id)
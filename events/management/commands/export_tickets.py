@@ -0,0 +1,87 @@
+import time
+from argparse import ArgumentParser
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events.exports import EXPORT_WRITERS, TICKET_EXPORT_COLUMNS, DEFAULT_TICKET_EXPORT_COLUMNS, build_ticket_table
+from events.models.events import Event
+from events.models.tickets import Ticket, TicketStatus
+
+
+class Command(BaseCommand):
+    help = (
+        "Export tickets of the specified event to a CSV, XLSX or Parquet file. "
+        "Rows are streamed from the database, so this works for events of any size."
+    )
+
+    def add_arguments(self, parser: ArgumentParser):
+        parser.add_argument(
+            "--event-slug",
+            help="Event to export tickets from.",
+            required=True,
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write the export to.",
+            required=True,
+        )
+        parser.add_argument(
+            "--format",
+            help="Output file format.",
+            choices=sorted(EXPORT_WRITERS),
+            default="csv",
+        )
+        parser.add_argument(
+            "--columns",
+            help=f"Comma-separated list of columns to export. Available: {', '.join(TICKET_EXPORT_COLUMNS)}",
+            default=",".join(DEFAULT_TICKET_EXPORT_COLUMNS),
+        )
+        parser.add_argument(
+            "--status",
+            help="Only export tickets with this status. Can be repeated.",
+            action="append",
+            choices=TicketStatus.values,
+        )
+        parser.add_argument(
+            "--type-id",
+            help="Only export tickets of this ticket type ID. Can be repeated.",
+            action="append",
+            type=int,
+        )
+
+    def handle(self, **options):
+        slug = options["event_slug"]
+        try:
+            event = Event.objects.get(slug=slug)
+        except Event.DoesNotExist as e:
+            raise CommandError(f"Requested event '{slug}' not found, bailing out!") from e
+
+        queryset = Ticket.objects.filter(event=event).order_by("created")
+        if options["status"]:
+            queryset = queryset.filter(status__in=options["status"])
+        if options["type_id"]:
+            queryset = queryset.filter(type_id__in=options["type_id"])
+
+        columns = [column.strip() for column in options["columns"].split(",") if column.strip()]
+        try:
+            table = build_ticket_table(queryset, columns)
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+
+        self.stderr.write(f"Exporting {table.total} ticket(s) of {event}...")
+        started = time.monotonic()
+
+        rows_done = 0
+        with open(options["output"], "wb") as output:
+            writer = EXPORT_WRITERS[options["format"]](output)
+            writer.write_headers(table.headers, table.types)
+            for row in table.rows:
+                writer.write_row(row)
+                rows_done += 1
+
+            writer.close()
+
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            self.style.SUCCESS(f"Exported {rows_done} ticket(s) in {elapsed:.1f}s to {options['output']}.")
+        )
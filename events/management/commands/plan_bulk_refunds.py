@@ -0,0 +1,195 @@
+import csv
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError, no_translations
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from payments import PaymentStatus
+
+from events.exports import get_ticket_code_expression
+from events.models.events import Event
+from events.models.payments import Payment, RefundRequest
+from events.models.tickets import Ticket, TicketStatus
+from events.tasks.refunds import execute_refunds
+
+# Rows fetched from the database at once, and refunds created per transaction.
+REFUND_PLAN_CHUNK_SIZE = 2000
+REFUND_CREATE_CHUNK_SIZE = 1000
+
+REPORT_HEADERS = [
+    "ticket_id",
+    "ticket_code",
+    "name",
+    "contributed_value",
+    "payment_id",
+    "captured_amount",
+    "refund_amount",
+    "result",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Plan refunds for tickets of the specified event (e.g. after it was cancelled), refunding "
+        "from the confirmed payment with the largest captured amount of every ticket. Writes a CSV "
+        "report of the plan and only creates the refunds with --create. Tickets that already have "
+        "refund requests are skipped, so it is safe to run this again after a partial run."
+    )
+
+    def add_arguments(self, parser: ArgumentParser):
+        parser.add_argument(
+            "--event-slug",
+            help="Event to refund tickets of.",
+            required=True,
+        )
+        parser.add_argument(
+            "--report",
+            help="CSV file to write the refund plan to.",
+            required=True,
+        )
+        parser.add_argument(
+            "--ticket-type-id",
+            help="Only refund tickets of this ticket type ID. Can be repeated.",
+            action="append",
+            type=int,
+        )
+        parser.add_argument(
+            "--status",
+            help="Only refund tickets with this status. Can be repeated, defaults to ready and used tickets.",
+            action="append",
+            choices=TicketStatus.values,
+        )
+        parser.add_argument(
+            "--amount",
+            help="Amount to refund for every ticket. Defaults to the whole contributed value of each ticket.",
+            type=Decimal,
+            default=None,
+        )
+        parser.add_argument(
+            "--title",
+            help="Refund title shown to the payer.",
+            default="",
+        )
+        parser.add_argument(
+            "--create",
+            action="store_true",
+            help="Create the planned (and approved!) refund requests. Without this, only the report is written.",
+        )
+        parser.add_argument(
+            "--execute",
+            action="store_true",
+            help="Queue the refund executor once the refund requests are created.",
+        )
+
+    @staticmethod
+    def create_refunds(refunds: list[RefundRequest]):
+        with transaction.atomic():
+            RefundRequest.objects.bulk_create(refunds)
+
+    @no_translations
+    def handle(self, **options):
+        slug = options["event_slug"]
+        try:
+            event = Event.objects.get(slug=slug)
+        except Event.DoesNotExist as e:
+            raise CommandError(f"Requested event '{slug}' not found, bailing out!") from e
+
+        if len(options["title"]) > RefundRequest._meta.get_field("title").max_length:
+            raise CommandError("Refund title is too long.")
+
+        if options["execute"] and not options["create"]:
+            raise CommandError("--execute requires --create.")
+
+        tickets = Ticket.objects.filter(
+            event=event,
+            status__in=options["status"] or [TicketStatus.READY, TicketStatus.USED],
+            contributed_value__gt=0,
+        )
+        if options["ticket_type_id"]:
+            tickets = tickets.filter(type_id__in=options["ticket_type_id"])
+
+        # Reruns skip everything that was already handled, successfully or not:
+        candidates = tickets.exclude(payment__refundrequest__isnull=False)
+        skipped = tickets.count() - candidates.count()
+
+        # The confirmed payment with the largest captured amount of every ticket:
+        best_payments = (
+            Payment.objects.filter(ticket__in=candidates.values("id"), status=PaymentStatus.CONFIRMED)
+            .annotate(ticket_code=get_ticket_code_expression("ticket__"))
+            .annotate(
+                rank=Window(
+                    RowNumber(),
+                    partition_by=[F("ticket_id")],
+                    order_by=[F("captured_amount").desc(), F("created").asc()],
+                )
+            )
+            .filter(rank=1)
+            .order_by("ticket_id")
+            .values_list(
+                "ticket_id", "ticket_code", "ticket__name", "ticket__contributed_value", "id", "captured_amount"
+            )
+        )
+
+        unpaid_tickets = (
+            candidates.exclude(payment__status=PaymentStatus.CONFIRMED)
+            .annotate(ticket_code=get_ticket_code_expression())
+            .order_by("id")
+            .values_list("id", "ticket_code", "name", "contributed_value")
+        )
+
+        started = time.monotonic()
+        results = Counter()
+        pending: list[RefundRequest] = []
+
+        with open(options["report"], "w", newline="") as report_file:
+            report = csv.writer(report_file)
+            report.writerow(REPORT_HEADERS)
+
+            for ticket_id, code, name, contributed, payment_id, captured in best_payments.iterator(
+                chunk_size=REFUND_PLAN_CHUNK_SIZE
+            ):
+                refund_amount = options["amount"] if options["amount"] is not None else contributed
+
+                if refund_amount > contributed:
+                    result = "amount_exceeds_contributed_value"
+                elif refund_amount > captured:
+                    result = "amount_exceeds_captured_amount"
+                elif options["create"]:
+                    result = "created"
+                    pending.append(
+                        RefundRequest(
+                            approved=True,
+                            payment_id=payment_id,
+                            amount=refund_amount,
+                            title=options["title"],
+                        )
+                    )
+                else:
+                    result = "planned"
+
+                if len(pending) >= REFUND_CREATE_CHUNK_SIZE:
+                    self.create_refunds(pending)
+                    pending = []
+
+                results[result] += 1
+                report.writerow([ticket_id, code, name, contributed, payment_id, captured, refund_amount, result])
+
+            for ticket_id, code, name, contributed in unpaid_tickets.iterator(chunk_size=REFUND_PLAN_CHUNK_SIZE):
+                results["no_confirmed_payment"] += 1
+                report.writerow([ticket_id, code, name, contributed, "", "", "", "no_confirmed_payment"])
+
+        if pending:
+            self.create_refunds(pending)
+
+        summary = ", ".join(f"{result}: {count}" for result, count in sorted(results.items())) or "nothing to do"
+        self.stderr.write(f"Skipped {skipped} ticket(s) with existing refund requests.")
+        self.stderr.write(f"Refund plan for {event} ({summary}) written to {options['report']}.")
+        self.stderr.write(self.style.SUCCESS(f"Done in {time.monotonic() - started:.1f}s."))
+
+        if options["execute"] and results["created"]:
+            execute_refunds.send()
+            self.stderr.write(f"Queued the execution of {results['created']} refund(s).")
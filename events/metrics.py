@@ -0,0 +1,86 @@
+"""Process-level Prometheus metrics (caches, outbound calls, etc).
+
+Gunicorn runs several worker processes, each with its own counters. Set
+PROMETHEUS_MULTIPROC_DIR to an empty, writable directory (wiped on every
+restart) to have all workers share their samples - otherwise a scrape
+only sees the worker that happened to handle it."""
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+MARKDOWN_CACHE_LOOKUPS = Counter(
+    "coriolis_markdown_cache_lookups",
+    "Markdown render cache lookups by cache tier and result.",
+    ["tier", "result"],
+)
+MARKDOWN_RENDER_SECONDS = Histogram(
+    "coriolis_markdown_render_seconds",
+    "Time spent rendering Markdown on cache misses.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+MARKDOWN_SECONDS_SAVED = Counter(
+    "coriolis_markdown_seconds_saved",
+    "Rendering time avoided thanks to cache hits (based on the original render time).",
+)
+
+PAYMENT_GATEWAY_REQUEST_SECONDS = Histogram(
+    "coriolis_payment_gateway_request_seconds",
+    "Outbound payment gateway API call latency, including retries.",
+    ["provider", "endpoint", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30),
+)
+
+PAYMENT_WEBHOOKS = Counter(
+    "coriolis_payment_webhooks",
+    "Payment gateway webhooks by provider and result (queued, duplicate, processed, error, failed).",
+    ["provider", "result"],
+)
+PAYMENT_WEBHOOK_TO_PAID_SECONDS = Histogram(
+    "coriolis_payment_webhook_to_paid_seconds",
+    "Time from receiving a payment gateway webhook to the ticket being marked as paid.",
+    ["provider"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+
+PAYMENT_RECONCILIATIONS = Counter(
+    "coriolis_payment_reconciliations",
+    "Waiting payments checked with the gateway by provider and result (confirmed, pending, error).",
+    ["provider", "result"],
+)
+PAYMENT_RECONCILIATION_SECONDS = Histogram(
+    "coriolis_payment_reconciliation_seconds",
+    "Time spent on a single payment reconciliation batch.",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+REFUNDS = Counter(
+    "coriolis_refunds",
+    "Executed refund requests by provider and result (done, failed).",
+    ["provider", "result"],
+)
+REFUNDS_PENDING = Gauge(
+    "coriolis_refunds_pending",
+    "Refund requests left in the batch being executed.",
+    multiprocess_mode="mostrecent",
+)
+REFUND_SECONDS = Histogram(
+    "coriolis_refund_seconds",
+    "Time spent executing a single refund, including the gateway calls and throttling.",
+    ["provider"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+def get_metrics_registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def get_process_metrics_output() -> str:
+    """Returns the process metrics in the Prometheus text format."""
+    return generate_latest(get_metrics_registry()).decode("utf-8")
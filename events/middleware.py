@@ -1,5 +1,9 @@
+import re
+
 from django.conf import settings
 from django.contrib import messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
 from django.http import HttpRequest
 from django.http import HttpResponse
 from django.shortcuts import redirect
@@ -127,3 +131,75 @@ class ForceDefaultLanguageMiddleware:
     def __call__(self, request):
         request.META.pop("HTTP_ACCEPT_LANGUAGE", None)
         return self.get_response(request)
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Serves the front page and event index pages to anonymous visitors from
+    a short-lived cache, skipping the whole Django stack on a hit. Should
+    be placed as early as possible, right after the security/static ones.
+
+    Requests with a session or pending messages (both stored in cookies),
+    query strings or non-GET methods always bypass the cache. Responses are
+    stored per host, path and language cookie, and only if they don't set
+    any cookies - so nothing user-specific (like a CSRF token) gets cached.
+    Cacheable responses get X-Accel-Expires, so nginx can cache them too.
+    """
+
+    cacheable_paths = re.compile(r"^/(event/[a-zA-Z0-9_-]+/)?$")
+    bypass_cookies = (settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.timeout = settings.ANONYMOUS_PAGE_CACHE_TIMEOUT
+        self.languages = {code for code, _name in settings.LANGUAGES}
+
+    def __call__(self, request: HttpRequest):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+
+        key = self.get_cache_key(request)
+        if (cached := cache.get(key)) is not None:
+            content, headers = cached
+            response = HttpResponse(content, headers=headers)
+            response["X-Page-Cache"] = "hit"
+            return response
+
+        response = self.get_response(request)
+        if not self.is_cacheable_response(response):
+            return response
+
+        response["Cache-Control"] = "max-age=0, must-revalidate"
+        response["X-Accel-Expires"] = str(self.timeout)
+        cache.set(key, (response.content, dict(response.items())), timeout=self.timeout)
+
+        response["X-Page-Cache"] = "miss"
+        return response
+
+    def is_cacheable_request(self, request: HttpRequest) -> bool:
+        return (
+            self.timeout > 0
+            and request.method == "GET"
+            and not request.META.get("QUERY_STRING")
+            and not any(request.COOKIES.get(name) for name in self.bypass_cookies)
+            and self.cacheable_paths.fullmatch(request.path_info) is not None
+        )
+
+    def is_cacheable_response(self, response: HttpResponse) -> bool:
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and response.get("Content-Type", "").startswith("text/html")
+            and "private" not in response.get("Cache-Control", "")
+            and "no-store" not in response.get("Cache-Control", "")
+        )
+
+    def get_cache_key(self, request: HttpRequest) -> str:
+        # ForceDefaultLanguageMiddleware drops Accept-Language, so the
+        # language cookie is the only input for the page language:
+        language = request.COOKIES.get(settings.LANGUAGE_COOKIE_NAME)
+        if language not in self.languages:
+            language = "default"
+
+        return f"pages.anon.{request.get_host()}.{language}.{request.path_info}"
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0081_refundrequest"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="eventorg",
+            index=models.Index(fields=["event", "name", "id"], name="events_even_event_i_ca980c_idx"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.11 on 2026-10-19 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0082_eventorg_events_even_event_i_ca980c_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="application",
+            name="attachments_state",
+            field=models.CharField(
+                choices=[
+                    ("PROC", "Processing Attachments"),
+                    ("REDY", "Ready"),
+                    ("FAIL", "Attachment Processing Failed"),
+                ],
+                default="REDY",
+                help_text="Uploaded files are encrypted and stored in the background after submitting the application.",
+                max_length=4,
+                verbose_name="attachments state",
+            ),
+        ),
+    ]
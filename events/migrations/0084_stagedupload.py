@@ -0,0 +1,89 @@
+# Generated by Django 5.2.11 on 2026-10-19 15:52
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0083_application_attachments_state"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StagedUpload",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created"),
+                ),
+                (
+                    "updated",
+                    models.DateTimeField(auto_now=True, verbose_name="updated"),
+                ),
+                (
+                    "field_name",
+                    models.CharField(max_length=256, verbose_name="field name"),
+                ),
+                (
+                    "filename",
+                    models.CharField(max_length=256, verbose_name="filename"),
+                ),
+                (
+                    "storage_name",
+                    models.CharField(
+                        help_text="Where the file is being assembled in the private storage.",
+                        max_length=512,
+                        verbose_name="storage name",
+                    ),
+                ),
+                ("size", models.BigIntegerField(verbose_name="size")),
+                ("offset", models.BigIntegerField(default=0, verbose_name="offset")),
+                (
+                    "completed",
+                    models.DateTimeField(blank=True, null=True, verbose_name="completed"),
+                ),
+                (
+                    "application_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="events.applicationtype",
+                        verbose_name="application type",
+                    ),
+                ),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="events.event",
+                        verbose_name="event",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="user",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "staged upload",
+                "verbose_name_plural": "staged uploads",
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.11 on 2026-10-19 16:48
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0084_stagedupload"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="application",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["answers"], name="application_answers_gin", opclasses=["jsonb_path_ops"]
+            ),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.11 on 2026-10-19 17:41
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0085_application_answers_gin"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created"),
+                ),
+                (
+                    "updated",
+                    models.DateTimeField(auto_now=True, verbose_name="updated"),
+                ),
+                ("kind", models.CharField(max_length=64, verbose_name="kind")),
+                (
+                    "format",
+                    models.CharField(default="xlsx", max_length=16, verbose_name="format"),
+                ),
+                (
+                    "params",
+                    models.JSONField(default=dict, verbose_name="parameters"),
+                ),
+                ("language", models.CharField(max_length=16, verbose_name="language")),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("QUED", "Queued"),
+                            ("RUNG", "Running"),
+                            ("DONE", "Done"),
+                            ("FAIL", "Failed"),
+                        ],
+                        default="QUED",
+                        max_length=4,
+                        verbose_name="state",
+                    ),
+                ),
+                (
+                    "rows_total",
+                    models.IntegerField(blank=True, null=True, verbose_name="rows total"),
+                ),
+                ("rows_done", models.IntegerField(default=0, verbose_name="rows done")),
+                (
+                    "file",
+                    models.CharField(blank=True, max_length=512, verbose_name="file"),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="error")),
+                (
+                    "expires",
+                    models.DateTimeField(blank=True, null=True, verbose_name="expires"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="user",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "export job",
+                "verbose_name_plural": "export jobs",
+                "ordering": ["-created"],
+            },
+        ),
+    ]
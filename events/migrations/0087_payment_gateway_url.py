@@ -0,0 +1,34 @@
+# Generated by Django 5.2.11 on 2026-10-19 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0086_exportjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="gateway_url",
+            field=models.URLField(
+                blank=True,
+                help_text="Payment page of the transaction registered with the gateway.",
+                max_length=1024,
+                verbose_name="gateway URL",
+            ),
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="gateway_url_expires",
+            field=models.DateTimeField(
+                blank=True,
+                default=None,
+                help_text="Date/time after which the gateway no longer accepts the registered transaction.",
+                null=True,
+                verbose_name="gateway URL expires",
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.11 on 2026-10-19 18:41
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0087_payment_gateway_url"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentWebhook",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created", models.DateTimeField(auto_now_add=True, verbose_name="created")),
+                ("updated", models.DateTimeField(auto_now=True, verbose_name="updated")),
+                ("provider", models.CharField(max_length=255, verbose_name="provider")),
+                ("transaction_id", models.CharField(max_length=255, verbose_name="transaction ID")),
+                ("status", models.CharField(max_length=64, verbose_name="status")),
+                ("data", models.JSONField(default=dict, verbose_name="data")),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[("QUED", "Queued"), ("DONE", "Done")],
+                        default="QUED",
+                        max_length=4,
+                        verbose_name="state",
+                    ),
+                ),
+                ("processed", models.DateTimeField(blank=True, null=True, verbose_name="processed")),
+                ("error", models.TextField(blank=True, verbose_name="error")),
+                (
+                    "payment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="events.payment",
+                        verbose_name="payment",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "payment webhook",
+                "verbose_name_plural": "payment webhooks",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("provider", "transaction_id", "status"),
+                        name="payment_webhook_idempotency_key",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.11 on 2026-10-19 19:20
+
+from django.db import migrations, models
+
+
+def mark_confirmed_payments(apps, schema_editor):
+    # Confirmed payments were already added to their tickets:
+    Payment = apps.get_model("events", "Payment")
+    Payment.objects.filter(status="confirmed").update(contributed_to_ticket=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0088_paymentwebhook"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="contributed_to_ticket",
+            field=models.BooleanField(
+                default=False,
+                help_text="Was the captured amount already added to the ticket contributed value?",
+                verbose_name="contributed to ticket",
+            ),
+        ),
+        migrations.RunPython(mark_confirmed_payments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.11 on 2026-10-19 19:58
+
+from django.db import migrations, models
+
+
+def mark_executed_refunds(apps, schema_editor):
+    RefundRequest = apps.get_model("events", "RefundRequest")
+    RefundRequest.objects.filter(executed__isnull=False).update(state="DONE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0089_payment_contributed_to_ticket"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="refundrequest",
+            name="state",
+            field=models.CharField(
+                choices=[("PEND", "Pending"), ("SUBM", "Submitting"), ("DONE", "Done"), ("FAIL", "Failed")],
+                default="PEND",
+                help_text="Refunds stuck in Submitting or Failed might have reached the gateway - "
+                "check the gateway panel before moving them back to Pending.",
+                max_length=4,
+                verbose_name="state",
+            ),
+        ),
+        migrations.AddField(
+            model_name="refundrequest",
+            name="error",
+            field=models.TextField(blank=True, verbose_name="error"),
+        ),
+        migrations.RunPython(mark_executed_refunds, migrations.RunPython.noop),
+    ]
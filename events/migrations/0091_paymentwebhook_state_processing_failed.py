@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-19 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0090_refundrequest_state"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="paymentwebhook",
+            name="state",
+            field=models.CharField(
+                choices=[("QUED", "Queued"), ("PROC", "Processing"), ("DONE", "Done"), ("FAIL", "Failed")],
+                default="QUED",
+                max_length=4,
+                verbose_name="state",
+            ),
+        ),
+    ]
@@ -1,8 +1,9 @@
 from .applications import ApplicationType, Application
 from .events import Event, EventPage, EventPageType, TicketRenderer
+from .exports import ExportJob
 from .notifications import NotificationChannel
 from .orgs import EventOrg, EventOrgTask, EventOrgBillingDetails, EventOrgInvoice
-from .payments import Payment, RefundRequest
+from .payments import Payment, PaymentWebhook, RefundRequest
 from .tickets import TicketFlag, TicketType, Ticket, TicketStatus, TicketSource, TicketPaymentMethod
 from .users import User
-from .uploads import AgePublicKey, AgePublicKeyType
+from .uploads import AgePublicKey, AgePublicKeyType, StagedUpload
@@ -1,7 +1,9 @@
 import uuid
 
+from django.contrib.postgres.indexes import GinIndex
 from django.core.mail import EmailMessage
 from django.db import models
+from django.db.models import F, Func
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -105,6 +107,27 @@ class ApplicationType(models.Model):
     def get_absolute_url(self):
         return reverse("application_form", kwargs={"slug": self.event.slug, "id": self.id})
 
+    def get_dynaform(self, name: str | None = None):
+        from events.dynaforms.fields import get_compiled_dynaform
+
+        return get_compiled_dynaform(name, self.template, self.id)
+
+
+class JSONKeyText(Func):
+    """Extracts a JSON object value as text, with the key taken from
+    another expression (`json ->> key` in Postgres)."""
+
+    arg_joiner = " ->> "
+    template = "(%(expressions)s)"
+    output_field = models.TextField()
+
+
+class ApplicationQuerySet(models.QuerySet):
+    def with_label(self):
+        """Annotates `answer_label` with the answer picked by the label
+        selector of each application's type, computed in the database."""
+        return self.annotate(answer_label=JSONKeyText(F("answers"), F("type__label_selector")))
+
 
 class Application(models.Model):
     class ApplicationStatus(models.TextChoices):
@@ -115,6 +138,11 @@ class Application(models.Model):
         APPROVED = "APRV", _("Accepted")
         REJECTED = "REJD", _("Rejected")
 
+    class AttachmentsState(models.TextChoices):
+        PROCESSING = "PROC", _("Processing Attachments")
+        READY = "REDY", _("Ready")
+        FAILED = "FAIL", _("Attachment Processing Failed")
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created = models.DateTimeField(auto_now_add=True, verbose_name=_("created"))
     updated = models.DateTimeField(auto_now=True, verbose_name=_("updated"))
@@ -137,6 +165,13 @@ class Application(models.Model):
     )
 
     answers = models.JSONField(verbose_name=_("answers"))
+    attachments_state = models.CharField(
+        max_length=4,
+        verbose_name=_("attachments state"),
+        choices=AttachmentsState.choices,
+        default=AttachmentsState.READY,
+        help_text=_("Uploaded files are encrypted and stored in the background after submitting the application."),
+    )
 
     notes = models.TextField(
         blank=True,
@@ -162,10 +197,16 @@ class Application(models.Model):
     # Non-database fields:
     _original_status: str | None = None
 
+    objects = ApplicationQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("application")
         verbose_name_plural = _("applications")
-        indexes = [models.Index(fields=["event", "user"])]
+        indexes = [
+            models.Index(fields=["event", "user"]),
+            # Serves answers__contains lookups (admin answer filters):
+            GinIndex(fields=["answers"], name="application_answers_gin", opclasses=["jsonb_path_ops"]),
+        ]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
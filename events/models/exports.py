@@ -0,0 +1,60 @@
+import uuid
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from events.models.users import User
+
+
+class ExportJob(models.Model):
+    """Export requested from the admin, generated in the background
+    into the private storage and downloadable until it expires."""
+
+    class State(models.TextChoices):
+        QUEUED = "QUED", _("Queued")
+        RUNNING = "RUNG", _("Running")
+        DONE = "DONE", _("Done")
+        FAILED = "FAIL", _("Failed")
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created = models.DateTimeField(auto_now_add=True, verbose_name=_("created"))
+    updated = models.DateTimeField(auto_now=True, verbose_name=_("updated"))
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("user"))
+    kind = models.CharField(max_length=64, verbose_name=_("kind"))
+    format = models.CharField(max_length=16, default="xlsx", verbose_name=_("format"))
+    params = models.JSONField(default=dict, verbose_name=_("parameters"))
+    language = models.CharField(max_length=16, verbose_name=_("language"))
+
+    state = models.CharField(
+        max_length=4,
+        verbose_name=_("state"),
+        choices=State.choices,
+        default=State.QUEUED,
+    )
+    rows_total = models.IntegerField(blank=True, null=True, verbose_name=_("rows total"))
+    rows_done = models.IntegerField(default=0, verbose_name=_("rows done"))
+    file = models.CharField(max_length=512, blank=True, verbose_name=_("file"))
+    error = models.TextField(blank=True, verbose_name=_("error"))
+    expires = models.DateTimeField(blank=True, null=True, verbose_name=_("expires"))
+
+    class Meta:
+        verbose_name = _("export job")
+        verbose_name_plural = _("export jobs")
+        ordering = ["-created"]
+
+    def __str__(self):
+        return f"{self.kind}.{self.format} ({self.get_state_display()}, {self.id})"
+
+    def get_progress(self) -> str:
+        if self.rows_total is None:
+            return "-"
+
+        return f"{self.rows_done}/{self.rows_total}"
+
+    def get_download_filename(self) -> str:
+        from events.exports import EXPORTS
+
+        export = EXPORTS.get(self.kind)
+        name = export.filename if export else self.kind
+        return f"{name}-{self.created:%Y%m%d-%H%M%S}.{self.format}"
@@ -11,6 +11,35 @@ from djmoney.money import Money
 from djmoney.models.fields import MoneyField
 
 
+def subquery_count(queryset: models.QuerySet) -> models.Subquery:
+    """Wraps a queryset filtered on OuterRef into a scalar COUNT subquery.
+    Unlike Count() over joins, multiple of these don't multiply each other."""
+    return models.Subquery(
+        queryset.order_by().annotate(_count=models.Func(models.F("pk"), function="COUNT")).values("_count"),
+        output_field=models.IntegerField(),
+    )
+
+
+class EventOrgQuerySet(models.QuerySet):
+    def with_stats(self):
+        """Annotates orgs with the ticket/task/billing counters shown
+        in the crew views, so templates don't query them per org."""
+        from events.models.tickets import Ticket, TicketStatus
+
+        tickets = Ticket.objects.filter(org=models.OuterRef("pk"))
+        tasks = EventOrgTask.objects.filter(event_org=models.OuterRef("pk"))
+        billing_details = EventOrgBillingDetails.objects.filter(event_org=models.OuterRef("pk"))
+
+        return self.annotate(
+            ticket_count=subquery_count(tickets),
+            tickets_used_count=subquery_count(tickets.filter(status=TicketStatus.USED)),
+            task_count=subquery_count(tasks),
+            tasks_done_count=subquery_count(tasks.filter(done=True)),
+            billing_details_count=subquery_count(billing_details),
+            first_representative=models.Subquery(billing_details.order_by("id").values("representative")[:1]),
+        )
+
+
 class EventOrg(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     event = models.ForeignKey("events.Event", on_delete=models.CASCADE, verbose_name=_("event"))
@@ -41,9 +70,14 @@ class EventOrg(models.Model):
         verbose_name=_("target ticket count"),
     )
 
+    objects = EventOrgQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("event org")
         verbose_name_plural = _("event orgs")
+        indexes = [
+            models.Index(fields=["event", "name", "id"]),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.event.name})"
@@ -51,13 +85,29 @@ class EventOrg(models.Model):
     def get_absolute_url(self):
         return reverse("crew_orgs_details", kwargs={"slug": self.event.slug, "org_id": self.id})
 
+    # The methods below use the with_stats() annotations if available:
+
+    def get_ticket_count(self) -> int:
+        if hasattr(self, "ticket_count"):
+            return self.ticket_count
+        return self.ticket_set.count()
+
+    def get_task_count(self) -> int:
+        if hasattr(self, "task_count"):
+            return self.task_count
+        return self.task_set.count()
+
     def has_ticket_slots_left(self):
-        return self.ticket_set.count() < self.target_ticket_count
+        return self.get_ticket_count() < self.target_ticket_count
 
     def has_all_tickets_used(self):
+        if hasattr(self, "tickets_used_count"):
+            return 0 < self.tickets_used_count == self.ticket_count
         return self.ticket_set.count() > 0 and all(ticket.status == "USED" for ticket in self.ticket_set.all())
 
     def has_all_tasks_done(self):
+        if hasattr(self, "tasks_done_count") and hasattr(self, "task_count"):
+            return 0 < self.tasks_done_count == self.task_count
         return self.task_set.count() > 0 and all(task.done for task in self.task_set.all())
 
 
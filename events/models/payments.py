@@ -1,16 +1,19 @@
 import uuid
-from datetime import datetime
-from collections.abc import Iterable
+from datetime import datetime, timedelta
+from decimal import Decimal
+from collections.abc import Callable, Iterable
 
 from django.conf import settings
 from django.db import models, transaction
+from django.db.models import F, Sum
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
-from payments import PurchasedItem
+from payments import PaymentStatus, PurchasedItem
+from payments.core import provider_factory
 from payments.models import BasePayment
 
 from events.models.events import Event
-from events.models.tickets import Ticket
+from events.models.tickets import Ticket, TicketStatus, TicketPaymentMethod
 from events.models.users import User
 
 
@@ -30,12 +33,109 @@ class Payment(BasePayment):
     refund_title = models.CharField(max_length=64, verbose_name=_("refund title"), blank=True)
     refund_data = models.JSONField(verbose_name=_("refund data"), blank=True, default=dict)
 
+    contributed_to_ticket = models.BooleanField(
+        default=False,
+        verbose_name=_("contributed to ticket"),
+        help_text=_("Was the captured amount already added to the ticket contributed value?"),
+    )
+
+    gateway_url = models.URLField(
+        max_length=1024,
+        blank=True,
+        verbose_name=_("gateway URL"),
+        help_text=_("Payment page of the transaction registered with the gateway."),
+    )
+    gateway_url_expires = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=None,
+        verbose_name=_("gateway URL expires"),
+        help_text=_("Date/time after which the gateway no longer accepts the registered transaction."),
+    )
+
     def __str__(self):
         if self.transaction_id:
             return f"{self.variant} ({self.id}, {self.transaction_id})"
         else:
             return f"{self.variant} ({self.id})"
 
+    def is_gateway_url_expired(self) -> bool:
+        return self.gateway_url_expires is not None and self.gateway_url_expires <= datetime.now()
+
+    def get_gateway_url(self) -> str | None:
+        """Returns the registered gateway payment page, if it can still be used.
+        Providers reuse it instead of registering a new transaction."""
+        if self.gateway_url and not self.is_gateway_url_expired():
+            return self.gateway_url
+
+        return None
+
+    def set_gateway_url(self, url: str, valid_for: timedelta, save: bool = True):
+        self.gateway_url = url
+        self.gateway_url_expires = datetime.now() + valid_for
+        if save:
+            self.save(update_fields=["gateway_url", "gateway_url_expires", "updated"])
+
+    @transaction.atomic
+    def contribute_to_ticket(self) -> bool:
+        """Adds the captured amount of a confirmed payment to its ticket,
+        marking the ticket as paid once it is paid in full. Happens once
+        per payment, no matter how many times the status is signalled.
+        Returns whether anything changed."""
+        if self.status != PaymentStatus.CONFIRMED:
+            return False
+
+        # Claim the contribution first - only one caller can flip the flag:
+        claimed = Payment.objects.filter(pk=self.pk, contributed_to_ticket=False).update(contributed_to_ticket=True)
+        if not claimed:
+            return False
+
+        self.contributed_to_ticket = True
+
+        # Lock just the ticket row, so parallel confirmations queue up here:
+        ticket = Ticket.objects.select_for_update(of=("self",)).select_related("event", "type").get(pk=self.ticket_id)
+        currency = self.currency or ticket.contributed_value.currency.code
+        if currency != ticket.contributed_value.currency.code:
+            raise ValueError(f"Payment {self.id} currency {currency} does not match the ticket contributed value.")
+
+        Ticket.objects.filter(pk=ticket.pk).update(contributed_value=F("contributed_value") + self.captured_amount)
+        ticket.contributed_value.amount += self.captured_amount
+
+        fields = {"payment_method": TicketPaymentMethod.ONLINE, "updated": datetime.now()}
+        if ticket.contributed_value >= ticket.get_price() and self._revive_ticket(ticket):
+            fields.update(status=TicketStatus.READY, status_deadline=None, paid=True)
+
+        # Not save() - it would send the status email while the row is locked:
+        Ticket.objects.filter(pk=ticket.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(ticket, name, value)
+
+        if ticket._original_status != ticket.status:
+            ticket._original_status = ticket.status
+            if message := ticket.get_status_change_email():
+                transaction.on_commit(message.send)
+
+        self.ticket = ticket
+        return True
+
+    def _revive_ticket(self, ticket: Ticket) -> bool:
+        """Cancelled tickets already gave their inventory back, so a late
+        payment has to take it again. If the tickets ran out meanwhile,
+        the ticket stays cancelled and the payment is queued for a refund
+        (waiting for approval in the admin)."""
+        from events.issuance import reserve_tickets
+
+        if ticket.status != TicketStatus.CANCELLED:
+            return True
+
+        try:
+            reserve_tickets(ticket.type, 1)
+        except ValueError:
+            RefundRequest.objects.create(payment=self, amount=self.captured_amount)
+            return False
+
+        return True
+
     def get_finalize_url(self) -> str:
         prefix = "https://" if settings.PAYMENT_USES_SSL else "http://"  # noqa
         path = reverse("ticket_payment_finalize", args=[self.event.slug, self.ticket.id, self.id])
@@ -57,7 +157,89 @@ class Payment(BasePayment):
         )
 
 
+class PaymentWebhook(models.Model):
+    """Gateway notification accepted by a payment provider. Webhooks are
+    acknowledged right away and processed in the background - the unique
+    (provider, transaction ID, status) key deduplicates gateway retries."""
+
+    class State(models.TextChoices):
+        QUEUED = "QUED", _("Queued")
+        PROCESSING = "PROC", _("Processing")
+        DONE = "DONE", _("Done")
+        FAILED = "FAIL", _("Failed")
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created = models.DateTimeField(auto_now_add=True, verbose_name=_("created"))
+    updated = models.DateTimeField(auto_now=True, verbose_name=_("updated"))
+
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, verbose_name=_("payment"))
+    provider = models.CharField(max_length=255, verbose_name=_("provider"))
+    transaction_id = models.CharField(max_length=255, verbose_name=_("transaction ID"))
+    status = models.CharField(max_length=64, verbose_name=_("status"))
+    data = models.JSONField(default=dict, verbose_name=_("data"))
+
+    state = models.CharField(
+        max_length=4,
+        verbose_name=_("state"),
+        choices=State.choices,
+        default=State.QUEUED,
+    )
+    processed = models.DateTimeField(blank=True, null=True, verbose_name=_("processed"))
+    error = models.TextField(blank=True, verbose_name=_("error"))
+
+    class Meta:
+        verbose_name = _("payment webhook")
+        verbose_name_plural = _("payment webhooks")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["provider", "transaction_id", "status"],
+                name="payment_webhook_idempotency_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} {self.transaction_id}: {self.status}"
+
+    @classmethod
+    def enqueue(
+        cls, payment: Payment, transaction_id: str, status: str, data: dict, retry_failed: bool = False
+    ) -> "PaymentWebhook":
+        """Durably records the webhook and queues its processing once the
+        current transaction commits. Duplicates return the existing one -
+        with `retry_failed`, a failed duplicate is queued again (e.g. when
+        the gateway itself confirmed the payment since)."""
+        from events.metrics import PAYMENT_WEBHOOKS
+        from events.tasks.payments import process_payment_webhook
+
+        webhook, created = cls.objects.get_or_create(
+            provider=payment.variant,
+            transaction_id=str(transaction_id),
+            status=status,
+            defaults={"payment": payment, "data": data},
+        )
+
+        queued = created
+        if not created and retry_failed and webhook.state == cls.State.FAILED:
+            queued = cls.objects.filter(id=webhook.id, state=cls.State.FAILED).update(
+                state=cls.State.QUEUED, updated=datetime.now()
+            )
+            if queued:
+                webhook.state = cls.State.QUEUED
+
+        PAYMENT_WEBHOOKS.labels(payment.variant, "queued" if queued else "duplicate").inc()
+        if queued:
+            transaction.on_commit(lambda: process_payment_webhook.send(str(webhook.id)))
+
+        return webhook
+
+
 class RefundRequest(models.Model):
+    class State(models.TextChoices):
+        PENDING = "PEND", _("Pending")
+        SUBMITTING = "SUBM", _("Submitting")
+        DONE = "DONE", _("Done")
+        FAILED = "FAIL", _("Failed")
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created = models.DateTimeField(auto_now_add=True, verbose_name=_("created"))
     updated = models.DateTimeField(auto_now=True, verbose_name=_("updated"))
@@ -66,27 +248,93 @@ class RefundRequest(models.Model):
     scheduled = models.DateTimeField(verbose_name=_("scheduled"), blank=True, null=True)
     executed = models.DateTimeField(verbose_name=_("executed"), blank=True, null=True)
 
+    state = models.CharField(
+        max_length=4,
+        verbose_name=_("state"),
+        choices=State.choices,
+        default=State.PENDING,
+        help_text=_(
+            "Refunds stuck in Submitting or Failed might have reached the gateway - "
+            "check the gateway panel before moving them back to Pending."
+        ),
+    )
+    error = models.TextField(blank=True, verbose_name=_("error"))
+
     payment = models.ForeignKey(Payment, on_delete=models.CASCADE, verbose_name=_("payment"))
     amount = models.DecimalField(max_digits=9, decimal_places=2, default="0.00")
     title = models.CharField(max_length=64, verbose_name=_("refund title"), blank=True)
 
-    @transaction.atomic
-    def execute(self):
-        if not self.approved:
-            raise RuntimeError("Refund request was not approved.")
+    def execute(self, before_submit: Callable[[], None] | None = None) -> Decimal:
+        """Executes the refund in phases, so no database transaction or row
+        lock is held while the gateway is being called: the refund is first
+        marked as submitting (and committed), then sent to the gateway, and
+        the result is recorded afterwards. `before_submit` is called right
+        before the gateway call (e.g. to respect the gateway rate limits)."""
+        with transaction.atomic():
+            refund = RefundRequest.objects.select_for_update().get(pk=self.pk)
+            if not refund.approved:
+                raise RuntimeError("Refund request was not approved.")
+
+            if refund.state != RefundRequest.State.PENDING or refund.executed:
+                raise RuntimeError("Refund request was already executed.")
+
+            # Lock the payment too, so parallel refunds of it queue up here:
+            payment = Payment.objects.select_for_update().get(pk=refund.payment_id)
+
+            # Submitted refunds are only subtracted from the captured amount once done:
+            submitting = RefundRequest.objects.filter(payment=payment, state=RefundRequest.State.SUBMITTING).aggregate(
+                total=Sum("amount", default=Decimal("0.00"))
+            )["total"]
+
+            error = None
+            if payment.status != PaymentStatus.CONFIRMED:
+                error = "Only confirmed payments can be refunded."
+            elif refund.amount > payment.captured_amount - submitting:
+                error = "Refund request cannot refund more money than was initially paid."
+
+            if error is None:
+                refund.state = RefundRequest.State.SUBMITTING
+                refund.save(update_fields=["state", "updated"])
+
+                refund.payment = payment
+                payment.refund_title = refund.title
+                payment.save(update_fields=["refund_title", "updated"])
+            else:
+                # Committed, so the executor does not pick it up again on every run:
+                refund.state = RefundRequest.State.FAILED
+                refund.error = error
+                refund.save(update_fields=["state", "error", "updated"])
+
+        if error is not None:
+            self.state, self.error = refund.state, refund.error
+            raise RuntimeError(error)
+
+        if before_submit is not None:
+            before_submit()
 
-        if self.executed:
-            raise RuntimeError("Refund request was already executed.")
+        try:
+            provider = provider_factory(payment.variant, payment)
+            amount = provider.refund(payment, refund.amount)
+        except Exception as ex:
+            # We cannot know if the gateway got the request - never retry these automatically:
+            RefundRequest.objects.filter(pk=refund.pk).update(state=RefundRequest.State.FAILED, error=str(ex))
+            raise
 
-        if self.amount > self.payment.captured_amount:
-            raise RuntimeError("Refund request cannot refund more money than was initially paid.")
+        with transaction.atomic():
+            Payment.objects.filter(pk=payment.pk).update(
+                captured_amount=F("captured_amount") - amount,
+                refund_data=payment.refund_data,
+            )
+            payment.refresh_from_db(fields=["captured_amount", "status"])
+            if payment.captured_amount <= 0 and payment.status != PaymentStatus.REFUNDED:
+                payment.change_status(PaymentStatus.REFUNDED)
 
-        self.payment.refund_title = self.title
-        self.payment.refund(amount=self.amount)
+            Ticket.objects.filter(pk=payment.ticket_id).update(contributed_value=F("contributed_value") - amount)
 
-        if self.payment.ticket:
-            self.payment.ticket.contributed_value.amount -= self.amount
-            self.payment.ticket.save(update_fields=["contributed_value"])
+            refund.state = RefundRequest.State.DONE
+            refund.executed = datetime.now()
+            refund.error = ""
+            refund.save(update_fields=["state", "executed", "error", "updated"])
 
-        self.executed = datetime.now()
-        self.save()
+        self.state, self.executed, self.error = refund.state, refund.executed, refund.error
+        return amount
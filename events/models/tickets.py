@@ -5,7 +5,7 @@ import uuid
 from colorfield.fields import ColorField
 from django.conf import settings
 from django.contrib.humanize.templatetags.humanize import naturaltime
-from django.core.mail import EmailMessage
+from django.core.mail import EmailMessage, get_connection
 from django.db import models
 from django.db.models import Q
 from django.template.loader import render_to_string
@@ -437,24 +437,39 @@ class Ticket(models.Model):
             return
 
         # Notify about the status change:
-        if self.event.emails_enabled:
-            EmailMessage(
-                subject=_("%(event)s: Ticket '%(code)s' (new status)")
-                % {"event": self.event.name, "code": self.get_code()},
-                body=render_to_string(
-                    "events/emails/ticket_changed.html",
-                    {
-                        "event": self.event,
-                        "ticket": self,
-                    },
-                ).strip(),
-                to=[self.email],
-                reply_to=[self.event.org_mail],
-            ).send()
+        if message := self.get_status_change_email():
+            message.send()
 
     def get_absolute_url(self):
         return reverse("ticket_details", kwargs={"slug": self.event.slug, "ticket_id": self.id})
 
+    def get_status_change_email(self) -> EmailMessage | None:
+        """Builds the "ticket status changed" email, if the event sends them."""
+        if not self.event.emails_enabled:
+            return None
+
+        return EmailMessage(
+            subject=_("%(event)s: Ticket '%(code)s' (new status)")
+            % {"event": self.event.name, "code": self.get_code()},
+            body=render_to_string(
+                "events/emails/ticket_changed.html",
+                {
+                    "event": self.event,
+                    "ticket": self,
+                },
+            ).strip(),
+            to=[self.email],
+            reply_to=[self.event.org_mail],
+        )
+
+    @staticmethod
+    def send_status_change_emails(tickets: "list[Ticket]"):
+        """Sends status change emails for many tickets over a single mail
+        server connection. Meant for bulk updates that bypass save()."""
+        emails = [m for m in (t.get_status_change_email() for t in tickets) if m is not None]
+        if emails:
+            get_connection().send_messages(emails)
+
     def get_flags(self) -> set[TicketFlag]:
         return set(self.type.flags.all()) | set(self.flags.all())
 
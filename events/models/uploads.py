@@ -1,11 +1,16 @@
+import hashlib
+import uuid
+
 import pyrage
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from events.cache import LocalLRUCache
 from events.dynaforms.fields import SIMPLE_IDENTIFIER_PATTERN
 from events.models.events import Event
+from events.models.users import User
 
 
 class AgePublicKeyType(models.TextChoices):
@@ -13,6 +18,13 @@ class AgePublicKeyType(models.TextChoices):
     SSH_ED25519 = "ssh-ed25519", _("SSH Ed25519 Public Key (ssh-ed25519 ...)")
 
 
+# Parsed pyrage recipients, keyed on the event, key name and the pubkey hash,
+# so that changed keys never hit stale entries, even in other processes.
+AGE_RECIPIENT_CACHE_SIZE = 256
+
+age_recipients = LocalLRUCache(max_size=AGE_RECIPIENT_CACHE_SIZE)
+
+
 class AgePublicKey(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, verbose_name=_("event"))
     name = models.CharField(
@@ -66,16 +78,70 @@ class AgePublicKey(models.Model):
 
         return recipient_type.from_str(self.pubkey)
 
+    def get_cached_pyrage_recipient(self):
+        pubkey_hash = hashlib.sha256(self.pubkey.encode()).hexdigest()
+        key = (self.event_id, self.name, self.kind, pubkey_hash)
+
+        if (recipient := age_recipients.get(key)) is None:
+            recipient = self.to_pyrage_recipient()
+            age_recipients.set(key, recipient)
+
+        return recipient
+
     @classmethod
     def resolve_pubkeys(cls, event: Event, key_names: list[str]) -> (list, dict[str, Exception]):
         recipients = []
         errors = {}
 
-        for pubkey_name in sorted(set(key_names)):
+        key_names = sorted(set(key_names))
+        keys = {key.name: key for key in cls.objects.filter(event=event, name__in=key_names)}
+
+        for pubkey_name in key_names:
             try:
-                key = cls.objects.get(event=event, name=pubkey_name)
-                recipients.append(key.to_pyrage_recipient())
+                if (key := keys.get(pubkey_name)) is None:
+                    raise cls.DoesNotExist(f"AgePublicKey '{pubkey_name}' does not exist.")
+
+                recipients.append(key.get_cached_pyrage_recipient())
             except Exception as e:
                 errors[pubkey_name] = e
 
         return recipients, errors
+
+
+def handle_age_public_key_change(sender: type, instance: AgePublicKey, **kwargs):
+    age_recipients.clear()
+
+
+class StagedUpload(models.Model):
+    """A file uploaded in resumable chunks before submitting an application.
+    The form references it by id, then the application takes over the file."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created = models.DateTimeField(auto_now_add=True, verbose_name=_("created"))
+    updated = models.DateTimeField(auto_now=True, verbose_name=_("updated"))
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("user"))
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, verbose_name=_("event"))
+    application_type = models.ForeignKey(
+        "ApplicationType",
+        on_delete=models.CASCADE,
+        verbose_name=_("application type"),
+    )
+    field_name = models.CharField(max_length=256, verbose_name=_("field name"))
+    filename = models.CharField(max_length=256, verbose_name=_("filename"))
+    storage_name = models.CharField(
+        max_length=512,
+        verbose_name=_("storage name"),
+        help_text=_("Where the file is being assembled in the private storage."),
+    )
+
+    size = models.BigIntegerField(verbose_name=_("size"))
+    offset = models.BigIntegerField(default=0, verbose_name=_("offset"))
+    completed = models.DateTimeField(blank=True, null=True, verbose_name=_("completed"))
+
+    class Meta:
+        verbose_name = _("staged upload")
+        verbose_name_plural = _("staged uploads")
+
+    def __str__(self) -> str:
+        return f"{self.filename} ({self.offset}/{self.size})"
@@ -0,0 +1,111 @@
+import hashlib
+import threading
+import time
+import xml.etree.ElementTree as etree
+
+from django.core.cache import cache
+from markdown import Markdown
+from markdown.extensions.tables import TableExtension, TableProcessor
+
+from events.cache import LocalLRUCache
+from events.metrics import MARKDOWN_CACHE_LOOKUPS, MARKDOWN_RENDER_SECONDS, MARKDOWN_SECONDS_SAVED
+
+# Bump this whenever the extension list or their configuration changes,
+# so that the HTML rendered by the old pipeline is no longer served.
+MARKDOWN_EXTENSIONS_VERSION = 1
+
+MARKDOWN_LOCAL_CACHE_SIZE = 2048
+MARKDOWN_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+class CustomTableProcessor(TableProcessor):
+    def run(self, parent: etree.Element, blocks: list[str]) -> None:
+        super().run(parent, blocks)
+        if len(parent) > 0 and parent[-1].tag == "table":
+            table = parent[-1]
+            table.attrib["class"] = "table table-bordered table-striped table-hover"
+
+
+class CustomTableExtension(TableExtension):
+    def extendMarkdown(self, md):
+        """ Add an instance of `CustomTableProcessor` to `BlockParser`. """
+        if '|' not in md.ESCAPED_CHARS:
+            md.ESCAPED_CHARS.append('|')
+        processor = CustomTableProcessor(md.parser, self.getConfigs())
+        md.parser.blockprocessors.register(processor, 'table', 75)
+
+
+_thread_state = threading.local()
+_local_cache = LocalLRUCache(MARKDOWN_LOCAL_CACHE_SIZE)
+
+
+def get_markdown() -> Markdown:
+    """Returns a reset Markdown pipeline owned by the current thread.
+    Building one (with all the extensions) costs much more than parsing
+    a typical short text, and instances are not thread-safe."""
+    md = getattr(_thread_state, "markdown", None)
+    if md is None:
+        md = Markdown(output_format="html", extensions=[
+            "abbr",
+            "attr_list",
+            "def_list",
+            "fenced_code",
+            "footnotes",
+            "md_in_html",
+            CustomTableExtension(),
+        ])
+        _thread_state.markdown = md
+
+    return md.reset()
+
+
+def convert_markdown(content: str, strip_wrapper: bool) -> str:
+    text = get_markdown().convert(content).strip()
+
+    # A quick and somewhat hacky way to strip the wrapping
+    # <p> element, but only if there's a single <p> in the text.
+    # This is not fully compliant, but much faster than building
+    # the full HTML tree, then serializing it back to text.
+    if (
+            strip_wrapper
+            and text.startswith("<p>")
+            and text.endswith("</p>")
+            and text.find("</p>") == text.rfind("</p>")
+    ):
+        text = text[3:-4]
+
+    return text
+
+
+def render_markdown_cached(content: str, strip_wrapper: bool = False) -> str:
+    """Renders Markdown to HTML, memoizing the result in a local LRU cache
+    and the shared (Redis) cache. Entries are keyed on the content hash,
+    the strip_wrapper flag and the extension set version."""
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    key = f"markdown.v{MARKDOWN_EXTENSIONS_VERSION}.{int(strip_wrapper)}.{digest}"
+
+    # Cached values are (html, seconds it took to render it originally):
+    if (entry := _local_cache.get(key)) is not None:
+        MARKDOWN_CACHE_LOOKUPS.labels("local", "hit").inc()
+        MARKDOWN_SECONDS_SAVED.inc(entry[1])
+        return entry[0]
+
+    MARKDOWN_CACHE_LOOKUPS.labels("local", "miss").inc()
+
+    if (entry := cache.get(key)) is not None:
+        MARKDOWN_CACHE_LOOKUPS.labels("shared", "hit").inc()
+        MARKDOWN_SECONDS_SAVED.inc(entry[1])
+        _local_cache.set(key, entry)
+        return entry[0]
+
+    MARKDOWN_CACHE_LOOKUPS.labels("shared", "miss").inc()
+
+    start = time.perf_counter()
+    text = convert_markdown(content, strip_wrapper)
+    elapsed = time.perf_counter() - start
+    MARKDOWN_RENDER_SECONDS.observe(elapsed)
+
+    entry = (text, elapsed)
+    cache.set(key, entry, timeout=MARKDOWN_CACHE_TIMEOUT)
+    _local_cache.set(key, entry)
+    return text
@@ -1,34 +1,48 @@
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from djmoney.money import Money
 from payments import PaymentStatus
 from payments.signals import status_changed
 
 
 @receiver(status_changed)
 def handle_payment_status_change(sender: type, **kwargs):
-    from events.models import Payment, Ticket, TicketStatus, TicketPaymentMethod
+    from events.models import Payment
 
     payment: Payment = kwargs.get("instance")
     if payment is None:
         raise ValueError("The status change was signalled for an unknown Payment.")
 
-    ticket: Ticket = payment.ticket
-
     if payment.status == PaymentStatus.CONFIRMED:
-        ticket.contributed_value += Money(
-            payment.captured_amount, payment.currency or ticket.contributed_value.currency
-        )
+        payment.contribute_to_ticket()
+
 
-        if ticket.contributed_value >= ticket.get_price():
-            ticket.status = TicketStatus.READY
-            ticket.status_deadline = None
-            ticket.paid = True
+def handle_event_config_change(sender: type, instance, **kwargs):
+    """Drops the cached public fragments of the affected event."""
+    from events.cache import bump_event_cache_version
+    from events.models import Event
 
-        ticket.payment_method = TicketPaymentMethod.ONLINE
-        ticket.save()
+    bump_event_cache_version(instance.id if isinstance(instance, Event) else instance.event_id)
 
 
 def connect_signals():
     """Just make sure this module is imported for now, since we
-    connect all signals via @receiver annotations."""
-    pass
+    connect all signals via @receiver annotations, except for
+    the ones that need to be attached to multiple models."""
+    from events.availability import handle_ticket_type_saved, handle_ticket_type_deleted
+    from events.cache import handle_config_model_change
+    from events.models import Event, TicketType, ApplicationType, EventPage, AgePublicKey
+    from events.models.uploads import handle_age_public_key_change
+
+    for model in (Event, TicketType, ApplicationType, EventPage):
+        post_save.connect(handle_event_config_change, sender=model, dispatch_uid=f"event_config_save_{model.__name__}")
+        post_delete.connect(handle_event_config_change, sender=model, dispatch_uid=f"event_config_delete_{model.__name__}")
+
+    for model in (Event, TicketType, EventPage):
+        post_save.connect(handle_config_model_change, sender=model, dispatch_uid=f"config_save_{model.__name__}")
+        post_delete.connect(handle_config_model_change, sender=model, dispatch_uid=f"config_delete_{model.__name__}")
+
+    post_save.connect(handle_ticket_type_saved, sender=TicketType, dispatch_uid="availability_save_TicketType")
+    post_delete.connect(handle_ticket_type_deleted, sender=TicketType, dispatch_uid="availability_delete_TicketType")
+
+    post_save.connect(handle_age_public_key_change, sender=AgePublicKey, dispatch_uid="age_recipients_save")
+    post_delete.connect(handle_age_public_key_change, sender=AgePublicKey, dispatch_uid="age_recipients_delete")
@@ -32,3 +32,174 @@ if (!document.cookie.split('; ').find(row => row.startsWith('cookieprompt='))) {
         bootstrap.Toast.getOrCreateInstance(output).show();
     }
 }
+
+// Anonymous pages may be served from a shared cache, so they can't embed a
+// per-visitor CSRF token. Instead, forms marked with data-csrf-from-cookie
+// submit the CSRF cookie value (creating a random one if it's missing):
+function getOrCreateCsrfCookie() {
+    const name = "csrftoken";
+    let row = document.cookie.split('; ').find(row => row.startsWith(name + '='));
+    if (row) return row.substring(name.length + 1);
+
+    const chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789";
+    const random = crypto.getRandomValues(new Uint8Array(32));
+    const secret = Array.from(random, (x) => chars[x % chars.length]).join('');
+
+    document.cookie = `${name}=${secret}; path=/; SameSite=Lax` + (location.protocol === "https:" ? "; Secure" : "");
+    return secret;
+}
+
+for (const csrfInput of document.querySelectorAll("input[data-csrf-from-cookie]")) {
+    csrfInput.form.addEventListener("submit", () => {
+        csrfInput.value = getOrCreateCsrfCookie();
+    });
+}
+
+// The ticket picker keeps the ticket availability up to date, preferring
+// a server-sent event stream and polling the JSON endpoint if it's busy:
+function applyTicketAvailability(container, availability) {
+    for (const [typeId, type] of Object.entries(availability.types)) {
+        const card = container.querySelector(`[data-ticket-type="${typeId}"]`);
+        if (card === null) continue;
+
+        const state = !type.open ? "closed" : (type.sold_out ? "sold-out" : "open");
+        for (const element of card.querySelectorAll("[data-availability-state]")) {
+            element.classList.toggle("d-none", element.dataset.availabilityState !== state);
+        }
+
+        const badge = card.querySelector("[data-availability-remaining]");
+        if (badge !== null && type.remaining !== null) {
+            badge.textContent = badge.textContent.replace(/\d+/, type.remaining);
+        }
+    }
+}
+
+function pollTicketAvailability(container) {
+    fetch(container.dataset.availabilityUrl)
+        .then((response) => response.ok ? response.json() : null)
+        .then((availability) => availability && applyTicketAvailability(container, availability))
+        .catch(() => null)
+        .finally(() => setTimeout(() => pollTicketAvailability(container), 10000));
+}
+
+let availabilityContainer = document.querySelector("[data-availability-url]");
+if (availabilityContainer !== null) {
+    if (window.EventSource) {
+        const source = new EventSource(availabilityContainer.dataset.availabilityStreamUrl);
+        source.onmessage = (event) => applyTicketAvailability(availabilityContainer, JSON.parse(event.data));
+        source.onerror = () => {
+            // The browser reconnects closed streams by itself, but gives up on errors:
+            if (source.readyState === EventSource.CLOSED) pollTicketAvailability(availabilityContainer);
+        };
+    } else {
+        pollTicketAvailability(availabilityContainer);
+    }
+}
+
+// Application attachments are uploaded in resumable chunks before submitting
+// the form (see events/views/uploads.py), which then only sends their IDs:
+const RESUMABLE_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const RESUMABLE_UPLOAD_MAX_FAILURES = 5;
+
+function encodeUploadMetadata(value) {
+    return btoa(String.fromCharCode(...new TextEncoder().encode(value)));
+}
+
+async function getUploadChecksum(blob) {
+    // WebCrypto is only available on HTTPS - skip chunk checksums without it:
+    if (!window.crypto || !crypto.subtle) return null;
+    const digest = await crypto.subtle.digest("SHA-256", await blob.arrayBuffer());
+    return "sha256 " + btoa(String.fromCharCode(...new Uint8Array(digest)));
+}
+
+async function getUploadOffset(location) {
+    const response = await fetch(location, {method: "HEAD", headers: {"Tus-Resumable": "1.0.0"}});
+    return response.ok ? parseInt(response.headers.get("Upload-Offset")) : null;
+}
+
+async function uploadResumable(form, input, file, onProgress) {
+    const csrfToken = form.querySelector("input[name=csrfmiddlewaretoken]").value;
+    const resumeKey = ["upload", form.dataset.uploadUrl, input.dataset.uploadField, file.name, file.size, file.lastModified].join(":");
+
+    let location = localStorage.getItem(resumeKey);
+    let offset = location ? await getUploadOffset(location) : null;
+
+    if (offset === null) {
+        const metadata = `filename ${encodeUploadMetadata(file.name)},field ${encodeUploadMetadata(input.dataset.uploadField)}`;
+        const created = await fetch(form.dataset.uploadUrl, {
+            method: "POST",
+            headers: {"Tus-Resumable": "1.0.0", "Upload-Length": file.size, "Upload-Metadata": metadata, "X-CSRFToken": csrfToken},
+        });
+
+        if (created.status !== 201) throw new Error(`Could not start the upload (${created.status}).`);
+        location = created.headers.get("Location");
+        offset = 0;
+        localStorage.setItem(resumeKey, location);
+    }
+
+    let failures = 0;
+    while (offset < file.size) {
+        onProgress(offset / file.size);
+        const chunk = file.slice(offset, offset + RESUMABLE_UPLOAD_CHUNK_SIZE);
+        const headers = {
+            "Tus-Resumable": "1.0.0",
+            "Content-Type": "application/offset+octet-stream",
+            "Upload-Offset": offset,
+            "X-CSRFToken": csrfToken,
+        };
+
+        const checksum = await getUploadChecksum(chunk);
+        if (checksum !== null) headers["Upload-Checksum"] = checksum;
+
+        const response = await fetch(location, {method: "PATCH", headers: headers, body: chunk}).catch(() => null);
+        if (response !== null && response.headers.has("Upload-Offset")) {
+            offset = parseInt(response.headers.get("Upload-Offset"));
+            if (response.ok) {
+                failures = 0;
+                continue;
+            }
+        }
+
+        if (++failures > RESUMABLE_UPLOAD_MAX_FAILURES) {
+            throw new Error(`Upload failed (${response === null ? "network error" : response.status}).`);
+        }
+
+        // Back off, then ask the server how much of the last chunk made it:
+        await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** failures));
+        offset = (await getUploadOffset(location).catch(() => null)) ?? offset;
+    }
+
+    localStorage.removeItem(resumeKey);
+    return location.split("/").pop();
+}
+
+for (const uploadForm of document.querySelectorAll("form[data-upload-url]")) {
+    uploadForm.addEventListener("submit", async (event) => {
+        const inputs = [...uploadForm.querySelectorAll("input[type=file][data-resumable-upload]")].filter(
+            (input) => input.files.length > 0
+        );
+        if (inputs.length === 0) return;
+
+        event.preventDefault();
+        const submitButton = uploadForm.querySelector("[type=submit]");
+        const submitLabel = submitButton.value;
+        submitButton.disabled = true;
+
+        try {
+            for (const input of inputs) {
+                const uploadId = await uploadResumable(uploadForm, input, input.files[0], (progress) => {
+                    submitButton.value = `${input.files[0].name}: ${Math.floor(progress * 100)}%`;
+                });
+
+                uploadForm.querySelector(`input[name="${input.dataset.resumableUpload}"]`).value = uploadId;
+                input.value = "";
+            }
+
+            uploadForm.submit();
+        } catch (error) {
+            alert(error.message);
+            submitButton.value = submitLabel;
+            submitButton.disabled = false;
+        }
+    });
+}
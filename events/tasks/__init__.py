@@ -1,5 +1,8 @@
 from .deadlines import collect_dead_tickets  # noqa
+from .exports import run_export_job, collect_expired_exports  # noqa
 from .notifications import notify_channel  # noqa
+from .payments import process_payment_webhook, reconcile_stale_payments  # noqa
 from .test import test_dramatiq  # noqa
 from .ticket_renderer import render_ticket_variants  # noqa
 from .refunds import execute_refunds, execute_single_refund  # noqa
+from .uploads import process_application_submission, collect_stale_uploads  # noqa
@@ -1,27 +1,76 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import dramatiq
+from django.db import transaction
+from django.db.models import F, TextField, Value
+from django.db.models.functions import Concat
 from django.utils.translation import gettext_lazy as _
 from dramatiq_crontab import cron
+from payments import PaymentStatus
 
+from events.models import Payment, PaymentWebhook
 from events.models.tickets import Ticket, TicketStatus
+from events.tasks.payments import REGISTERED_WITH_GATEWAY, process_payment_webhook, reconcile_payments
+
+# Tickets with payment confirmations queued (or retried) less than this ago
+# are not cancelled yet. Older ones are stuck (or failed) and no longer hold up
+# the sweep, so the inventory is not locked up forever.
+WEBHOOK_GRACE_PERIOD = timedelta(hours=1)
 
 
 @cron("*/15 * * * *")  # Every 15mins
 @dramatiq.actor
 def collect_dead_tickets():
+    from events.issuance import release_tickets
+
     dead_tickets = (
-        Ticket.objects.filter(event__active=True).filter(status_deadline__lt=datetime.now()).select_related("event")
+        Ticket.objects.filter(event__active=True).filter(status_deadline__lt=datetime.now()).select_related("event", "type")
+    )
+
+    # A lost webhook must not get a paid ticket cancelled - ask the gateways
+    # about the payments first and apply the confirmations right away:
+    waiting_payments = Payment.objects.filter(
+        ticket__in=dead_tickets.filter(status=TicketStatus.WAITING_FOR_PAYMENT).values("id"),
+        status__in=(PaymentStatus.WAITING, PaymentStatus.INPUT),
+    ).filter(REGISTERED_WITH_GATEWAY)
+
+    reconciled_webhooks = reconcile_payments(waiting_payments)
+    for webhook in reconciled_webhooks:
+        try:
+            process_payment_webhook(str(webhook.id))
+        except Exception:  # noqa
+            collect_dead_tickets.logger.exception(f"Could not process reconciled webhook {webhook.id}.")
+
+    # Tickets with payment confirmations still being processed will be paid shortly,
+    # and the ones the gateway just confirmed as paid are never cancelled:
+    pending_webhooks = PaymentWebhook.objects.filter(
+        state__in=(PaymentWebhook.State.QUEUED, PaymentWebhook.State.PROCESSING),
+        updated__gt=datetime.now() - WEBHOOK_GRACE_PERIOD,
     )
+    dead_tickets = dead_tickets.exclude(payment__in=pending_webhooks.values("payment")).exclude(
+        payment__in=[webhook.payment_id for webhook in reconciled_webhooks]
+    )
+
+    cancelled_tickets = []
+    note = str(_("[System] The ticket was not paid for in time.")) + "\n"
 
-    cancelled_tickets = 0
+    for ticket in dead_tickets.filter(status=TicketStatus.WAITING_FOR_PAYMENT):
+        # Only cancel tickets that are still unpaid - a confirmation may have
+        # been committed since the query above. Unpaid tickets go back to the
+        # pool, same as if they were cancelled by the user:
+        with transaction.atomic():
+            cancelled = Ticket.objects.filter(id=ticket.id, status=TicketStatus.WAITING_FOR_PAYMENT).update(
+                status_deadline=None,
+                status=TicketStatus.CANCELLED,
+                notes=Concat(Value(note), F("notes"), output_field=TextField()),
+            )
+            if cancelled:
+                release_tickets(ticket.type, 1)
 
-    for ticket in dead_tickets:
-        if ticket.status == TicketStatus.WAITING_FOR_PAYMENT:
-            ticket.status_deadline = None
+        if cancelled:
             ticket.status = TicketStatus.CANCELLED
-            ticket.notes = _("[System] The ticket was not paid for in time.") + "\n" + ticket.notes
-            ticket.save(update_fields=["status_deadline", "status", "notes"])
-            cancelled_tickets += 1
+            cancelled_tickets.append(ticket)
 
-    collect_dead_tickets.logger.info(f"Cancelled {cancelled_tickets} ticket(s).")
+    # update() skips save(), so notify about the status changes ourselves:
+    Ticket.send_status_change_emails(cancelled_tickets)
+    collect_dead_tickets.logger.info(f"Cancelled {len(cancelled_tickets)} ticket(s).")
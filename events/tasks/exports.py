@@ -0,0 +1,103 @@
+import datetime
+import os
+import tempfile
+
+import dramatiq
+from django.core.files.storage import storages
+from django.utils import translation
+from dramatiq_crontab import cron
+
+from events.exports import EXPORTS, EXPORT_WRITERS
+from events.models import ExportJob
+
+# How long finished exports can be downloaded before they are removed.
+EXPORT_EXPIRY = datetime.timedelta(days=1)
+
+# How often (in rows) the progress is saved for the admin progress page.
+EXPORT_PROGRESS_INTERVAL = 1000
+
+# Exports running for longer are stopped by dramatiq. Jobs still marked as
+# running after that (e.g. because the worker died) are marked as failed.
+EXPORT_TIME_LIMIT = datetime.timedelta(hours=1)
+
+
+@dramatiq.actor(max_retries=0, time_limit=int(EXPORT_TIME_LIMIT.total_seconds() * 1000))
+def run_export_job(job_id: str):
+    started = ExportJob.objects.filter(id=job_id, state=ExportJob.State.QUEUED).update(
+        state=ExportJob.State.RUNNING, updated=datetime.datetime.now()
+    )
+    if not started:
+        return  # Redelivered after we started working on it.
+
+    job = ExportJob.objects.get(id=job_id)
+
+    storage = storages["private"]
+    writer_class = EXPORT_WRITERS[job.format]
+    file_name = f"exports/{job.id}.{writer_class.extension}"
+    file_path = storage.path(file_name)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    try:
+        with translation.override(job.language):
+            table = EXPORTS[job.kind].build(job.params)
+            ExportJob.objects.filter(id=job.id).update(rows_total=table.total)
+
+            # Written next to the final file and moved in place once done:
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(file_path), suffix=".tmp", delete=False) as output:
+                try:
+                    writer = writer_class(output)
+                    writer.write_headers(table.headers, table.types)
+
+                    rows_done = 0
+                    for rows_done, row in enumerate(table.rows, start=1):
+                        writer.write_row(row)
+                        if rows_done % EXPORT_PROGRESS_INTERVAL == 0:
+                            ExportJob.objects.filter(id=job.id).update(rows_done=rows_done)
+
+                    writer.close()
+                except BaseException:
+                    os.unlink(output.name)
+                    raise
+
+            os.replace(output.name, file_path)
+    except BaseException as ex:  # Including the time limit
+        job.state = ExportJob.State.FAILED
+        job.error = str(ex) or type(ex).__name__
+        job.save(update_fields=["state", "error", "updated"])
+        raise
+
+    job.state = ExportJob.State.DONE
+    job.file = file_name
+    job.rows_total = rows_done
+    job.rows_done = rows_done
+    job.expires = datetime.datetime.now() + EXPORT_EXPIRY
+    job.save(update_fields=["state", "file", "rows_total", "rows_done", "expires", "updated"])
+
+
+@cron("41 * * * *")  # Every hour
+@dramatiq.actor
+def collect_expired_exports():
+    storage = storages["private"]
+    now = datetime.datetime.now()
+
+    # Abandoned by a worker that died, so they did not get to fail on their own:
+    abandoned_jobs = ExportJob.objects.filter(
+        state=ExportJob.State.RUNNING, updated__lt=now - EXPORT_TIME_LIMIT
+    ).update(state=ExportJob.State.FAILED, error="Abandoned by the worker.", updated=now)
+
+    # Finished exports expire, failed ones are kept around for a while for debugging:
+    expired_jobs = ExportJob.objects.filter(expires__lt=now) | ExportJob.objects.filter(
+        state=ExportJob.State.FAILED, created__lt=now - EXPORT_EXPIRY
+    )
+
+    removed_jobs = 0
+    for job in expired_jobs:
+        if job.file:
+            storage.delete(job.file)
+
+        job.delete()
+        removed_jobs += 1
+
+    collect_expired_exports.logger.info(
+        f"Removed {removed_jobs} expired export(s), marked {abandoned_jobs} abandoned one(s) as failed."
+    )
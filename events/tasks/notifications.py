@@ -1,9 +1,14 @@
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import cached_property
 
 import dramatiq
 import requests
 from django.utils.translation import gettext_lazy as _
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 from events.models import Ticket, NotificationChannel
 from events.models.notifications import (
@@ -14,6 +19,64 @@ from events.models.notifications import (
 
 TELEGRAM_BOT_ENDPOINT = "https://api.telegram.org/bot{token}/{method}"
 
+# (connect, read) - a dead host should not hold the worker for the full read timeout.
+NOTIFICATION_TIMEOUT = (3.05, 10)
+NOTIFICATION_MAX_WORKERS = 8
+
+# Webhook POSTs are not idempotent, so we only retry when the target
+# explicitly tells us it did not process the message (rate limits,
+# gateway errors) or when we could not connect at all.
+NOTIFICATION_RETRY_POLICIES: dict[str, Retry] = {
+    NotificationChannelTarget.DISCORD_WEBHOOK: Retry(
+        total=3,
+        connect=2,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+    NotificationChannelTarget.TELEGRAM_MESSAGE: Retry(
+        total=3,
+        connect=2,
+        read=0,
+        backoff_factor=1.0,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+}
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_target_session(target: str) -> requests.Session:
+    """Returns a per-process keep-alive session for the given channel target.
+    urllib3 connection pools are thread-safe and these sessions never carry
+    cookies, so a single instance can be shared by all delivery threads."""
+    if session := _sessions.get(target):
+        return session
+
+    with _sessions_lock:
+        if session := _sessions.get(target):
+            return session
+
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=NOTIFICATION_MAX_WORKERS,
+            max_retries=NOTIFICATION_RETRY_POLICIES.get(target, Retry(total=0)),
+        )
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        _sessions[target] = session
+        return session
+
 
 @dataclass
 class NotificationChannelTicketUsedPayload(NotificationChannelPayload):
@@ -21,15 +84,16 @@ class NotificationChannelTicketUsedPayload(NotificationChannelPayload):
 
     ticket_id: str
 
-    def get_ticket(self):
+    @cached_property
+    def ticket(self) -> Ticket | None:
         try:
-            return Ticket.objects.get(id=self.ticket_id)
+            return Ticket.objects.select_related("type", "event").get(id=self.ticket_id)
         except Ticket.DoesNotExist:
             logging.error(f"Tried to notify about missing ticket: {self.ticket_id}")
             return None
 
     def get_markdown_text(self, bold_marker: str):
-        if not (ticket := self.get_ticket()):
+        if not (ticket := self.ticket):
             return None
 
         parts = [
@@ -41,12 +105,89 @@ class NotificationChannelTicketUsedPayload(NotificationChannelPayload):
 
         return " \\- ".join([str(x) for x in parts])
 
-    def get_discord_text(self) -> str | None:
+    @cached_property
+    def discord_text(self) -> str | None:
         return self.get_markdown_text("**")
 
-    def get_telegram_text(self) -> str | None:
+    @cached_property
+    def telegram_text(self) -> str | None:
         return self.get_markdown_text("*")
 
+    def get_discord_text(self) -> str | None:
+        return self.discord_text
+
+    def get_telegram_text(self) -> str | None:
+        return self.telegram_text
+
+
+@dataclass
+class NotificationDelivery:
+    """A single prepared HTTP request to a notification channel target."""
+
+    channel: NotificationChannel
+    url: str
+    body: dict
+
+    def send(self):
+        session = get_target_session(self.channel.target)
+
+        try:
+            r = session.post(self.url, json=self.body, timeout=NOTIFICATION_TIMEOUT)
+        except requests.RequestException as e:
+            logging.warning(f"{self.channel.get_target_display()} request failed on {self.channel=}: {e}")
+            return
+
+        if not r.ok:
+            logging.warning(f"{self.channel.get_target_display()} request returned {r.status_code}: {r.text}")
+
+
+def prepare_discord_delivery(
+    channel: NotificationChannel,
+    payload: NotificationChannelPayload,
+) -> NotificationDelivery | None:
+    if not (content := payload.get_discord_text()):
+        logging.warning(f"Tried to notify Discord with a payload that does not return Markdown: {payload=}")
+        return None
+
+    discord_webhook_url = channel.configuration.get("url")
+    if discord_webhook_url is None:
+        logging.warning(f"Tried to notify Discord without a webhook URL on channel: {channel=}")
+        return None
+
+    return NotificationDelivery(channel, discord_webhook_url, {"content": content})
+
+
+def prepare_telegram_delivery(
+    channel: NotificationChannel,
+    payload: NotificationChannelPayload,
+) -> NotificationDelivery | None:
+    if not (content := payload.get_telegram_text()):
+        logging.warning(f"Tried to notify Telegram with a payload that does not return Markdown: {payload=}")
+        return None
+
+    token = channel.configuration.get("token")
+    chat_id = channel.configuration.get("chat_id")
+    if not token or not chat_id:
+        logging.warning("Tried to notify Telegram with invalid configuration (missing token or chat_id).")
+        return None
+
+    return NotificationDelivery(
+        channel,
+        TELEGRAM_BOT_ENDPOINT.format(token=token, method="sendMessage"),
+        {
+            "chat_id": chat_id,
+            "text": content,
+            "parse_mode": "MarkdownV2",
+            "disable_notification": True,
+        },
+    )
+
+
+DELIVERY_PREPARERS = {
+    NotificationChannelTarget.DISCORD_WEBHOOK: prepare_discord_delivery,
+    NotificationChannelTarget.TELEGRAM_MESSAGE: prepare_telegram_delivery,
+}
+
 
 @dramatiq.actor
 def notify_channel(event_id: int, source: NotificationChannelSource, payload_args: dict):
@@ -57,50 +198,22 @@ def notify_channel(event_id: int, source: NotificationChannelSource, payload_arg
         logging.error(f"Unknown notification source: {source}")
         return
 
-    channels = NotificationChannel.objects.filter(event_id=event_id, source=source)
+    deliveries: list[NotificationDelivery] = []
+
+    channels = NotificationChannel.objects.filter(event_id=event_id, source=source, enabled=True)
     for channel in channels:
-        if not channel.enabled:
+        if not (preparer := DELIVERY_PREPARERS.get(channel.target)):
+            logging.error(f"Unknown notification target on channel: {channel=}")
             continue
 
-        if channel.target == NotificationChannelTarget.DISCORD_WEBHOOK:
-            if not (content := payload.get_discord_text()):
-                logging.warning(f"Tried to notify Discord with a payload that does not return Markdown: {payload=}")
-                continue
-
-            discord_webhook_url = channel.configuration.get("url")
-            if discord_webhook_url is None:
-                logging.warning(f"Tried to notify Discord without a webhook URL on channel: {channel=}")
-                continue
-
-            r = requests.post(discord_webhook_url, json={"content": content}, timeout=10)
-            if not r.ok:
-                logging.warning(f"Discord request returned {r.status_code}: {r.text}")
-
-        elif channel.target == NotificationChannelTarget.TELEGRAM_MESSAGE:
-            if not (content := payload.get_telegram_text()):
-                logging.warning(f"Tried to notify Telegram with a payload that does not return Markdown: {payload=}")
-                continue
-
-            token = channel.configuration.get("token")
-            chat_id = channel.configuration.get("chat_id")
-            if not token or not chat_id:
-                logging.warning("Tried to notify Telegram with invalid configuration (missing token or chat_id).")
-                continue
-
-            url = TELEGRAM_BOT_ENDPOINT.format(token=token, method="sendMessage")
-            r = requests.post(
-                url,
-                json={
-                    "chat_id": chat_id,
-                    "text": content,
-                    "parse_mode": "MarkdownV2",
-                    "disable_notification": True,
-                },
-                timeout=10,
-            )
-
-            if not r.ok:
-                logging.warning(f"Telegram request returned {r.status_code}: {r.text}")
-
-        else:
-            logging.error(f"Unknown notification target on channel: {channel=}")
+        if delivery := preparer(channel, payload):
+            deliveries.append(delivery)
+
+    if not deliveries:
+        return
+
+    # Fan out to all targets at once, so that a single slow webhook does
+    # not delay the others (or block this worker for N x the timeout):
+    with ThreadPoolExecutor(max_workers=min(len(deliveries), NOTIFICATION_MAX_WORKERS)) as pool:
+        for future in [pool.submit(delivery.send) for delivery in deliveries]:
+            future.result()
@@ -0,0 +1,171 @@
+import datetime
+import logging
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import batched
+
+import dramatiq
+from django.db import transaction
+from django.db.models import Q
+from dramatiq_crontab import cron
+from payments import PaymentStatus
+from payments.core import provider_factory
+
+from events.metrics import (
+    PAYMENT_RECONCILIATIONS,
+    PAYMENT_RECONCILIATION_SECONDS,
+    PAYMENT_WEBHOOKS,
+    PAYMENT_WEBHOOK_TO_PAID_SECONDS,
+)
+from events.models import Payment, PaymentWebhook
+
+logger = logging.getLogger(__name__)
+
+# Waiting payments are checked with the gateway once they are this old
+# (giving the webhook a chance to arrive first)...
+RECONCILE_AFTER = datetime.timedelta(minutes=10)
+
+# ...and until they are this old, after which they are left alone.
+RECONCILE_WINDOW = datetime.timedelta(days=3)
+
+RECONCILE_BATCH_SIZE = 100
+
+# Payments the gateway knows about. The gateway URL is only stored since
+# migration 0087 - older payments are recognised by what the providers
+# saved on registration (e.g. Tpay's transaction ID).
+REGISTERED_WITH_GATEWAY = ~Q(gateway_url="") | ~Q(transaction_id="") | ~Q(extra_data="")
+
+# Webhooks claimed for processing longer ago than this (i.e. by a worker
+# that died meanwhile) can be claimed again. Longer than the time limit.
+WEBHOOK_PROCESSING_TIMEOUT = datetime.timedelta(minutes=5)
+
+# Gateway requests in flight at once. The executor threads live as long as
+# the worker process, so their pooled provider sessions stay warm.
+RECONCILE_CONCURRENCY = 8
+reconcile_executor = ThreadPoolExecutor(max_workers=RECONCILE_CONCURRENCY, thread_name_prefix="reconcile")
+
+
+@dramatiq.actor(max_retries=5, time_limit=2 * 60 * 1000, on_retry_exhausted="fail_payment_webhook")
+def process_payment_webhook(webhook_id: str):
+    """Runs the slow part of a webhook: verification with the gateway and
+    the payment status change (which updates the ticket). The webhook is
+    claimed first, so redeliveries cannot process it twice, but no rows
+    are locked while waiting for the gateway."""
+    now = datetime.datetime.now()
+    claimable = Q(state=PaymentWebhook.State.QUEUED) | Q(
+        state=PaymentWebhook.State.PROCESSING, updated__lt=now - WEBHOOK_PROCESSING_TIMEOUT
+    )
+    if not PaymentWebhook.objects.filter(claimable, id=webhook_id).update(
+        state=PaymentWebhook.State.PROCESSING, updated=now
+    ):
+        return  # Redelivered after it was processed (or while it still is).
+
+    webhook = PaymentWebhook.objects.select_related("payment").get(id=webhook_id)
+    provider = provider_factory(webhook.payment.variant, webhook.payment)
+
+    try:
+        verified_data = provider.verify_webhook(webhook.payment, webhook.data)
+
+        with transaction.atomic():
+            payment = (
+                Payment.objects.select_for_update(of=("self",)).select_related("ticket").get(id=webhook.payment_id)
+            )
+            was_paid = payment.ticket.paid
+            provider.apply_webhook(payment, verified_data)
+
+            webhook.state = PaymentWebhook.State.DONE
+            webhook.processed = datetime.datetime.now()
+            webhook.error = ""
+            webhook.save(update_fields=["state", "processed", "error", "updated"])
+    except Exception as ex:
+        # Give it back to the retries (or to fail_payment_webhook):
+        PAYMENT_WEBHOOKS.labels(webhook.provider, "error").inc()
+        PaymentWebhook.objects.filter(id=webhook_id).update(
+            state=PaymentWebhook.State.QUEUED, error=str(ex), updated=datetime.datetime.now()
+        )
+        raise
+
+    PAYMENT_WEBHOOKS.labels(webhook.provider, "processed").inc()
+    if not was_paid and payment.ticket.paid:
+        PAYMENT_WEBHOOK_TO_PAID_SECONDS.labels(webhook.provider).observe(
+            (webhook.processed - webhook.created).total_seconds()
+        )
+
+
+@dramatiq.actor
+def fail_payment_webhook(message_data: dict, retry_info: dict):
+    """Called once process_payment_webhook runs out of retries."""
+    webhook_id = message_data["args"][0]
+    failed = PaymentWebhook.objects.filter(id=webhook_id, state=PaymentWebhook.State.QUEUED).update(
+        state=PaymentWebhook.State.FAILED, updated=datetime.datetime.now()
+    )
+
+    if failed:
+        provider = PaymentWebhook.objects.values_list("provider", flat=True).get(id=webhook_id)
+        PAYMENT_WEBHOOKS.labels(provider, "failed").inc()
+        logger.error(f"Giving up on payment webhook {webhook_id} after {retry_info['retries']} retries.")
+
+
+def get_reconcilable_payments():
+    now = datetime.datetime.now()
+    return Payment.objects.filter(
+        status__in=(PaymentStatus.WAITING, PaymentStatus.INPUT),
+        created__lt=now - RECONCILE_AFTER,
+        created__gt=now - RECONCILE_WINDOW,
+    ).filter(REGISTERED_WITH_GATEWAY)
+
+
+def reconcile_payments(payments: Iterable[Payment]) -> list[PaymentWebhook]:
+    """Asks the gateways about the given payments, a few at a time, and
+    queues the paid ones through the same idempotent path as webhooks.
+    Providers without a reconcile() method are skipped."""
+    providers = {}
+    checks = []
+
+    for payment in payments:
+        if payment.variant not in providers:
+            provider = provider_factory(payment.variant, payment)
+            providers[payment.variant] = provider if hasattr(provider, "reconcile") else None
+
+        if provider := providers[payment.variant]:
+            checks.append((provider, payment))
+
+    def check(job):
+        provider, payment = job
+        try:
+            return provider.reconcile(payment), None
+        except Exception as ex:  # noqa
+            return None, ex
+
+    webhooks = []
+    results = reconcile_executor.map(check, checks)
+    for (_provider, payment), (result, error) in zip(checks, results, strict=True):
+        if error is not None:
+            logger.warning(f"Could not reconcile payment {payment.id} ({payment.variant}): {error}")
+            PAYMENT_RECONCILIATIONS.labels(payment.variant, "error").inc()
+        elif result is None:
+            PAYMENT_RECONCILIATIONS.labels(payment.variant, "pending").inc()
+        else:
+            transaction_id, status, data = result
+            webhooks.append(PaymentWebhook.enqueue(payment, transaction_id, status, data, retry_failed=True))
+            PAYMENT_RECONCILIATIONS.labels(payment.variant, "confirmed").inc()
+
+    return webhooks
+
+
+@cron("10,25,40,55 * * * *")  # Every 15mins, a few minutes before the dead tickets sweep
+@dramatiq.actor(time_limit=10 * 60 * 1000)
+def reconcile_stale_payments():
+    started = time.monotonic()
+    payment_ids = list(get_reconcilable_payments().order_by("created").values_list("id", flat=True))
+
+    confirmed = 0
+    for batch in batched(payment_ids, RECONCILE_BATCH_SIZE):
+        with PAYMENT_RECONCILIATION_SECONDS.time():
+            confirmed += len(reconcile_payments(Payment.objects.filter(id__in=batch)))
+
+    reconcile_stale_payments.logger.info(
+        f"Checked {len(payment_ids)} waiting payment(s), found {confirmed} paid, "
+        f"took {time.monotonic() - started:.1f}s."
+    )
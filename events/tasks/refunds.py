@@ -1,20 +1,94 @@
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import dramatiq
+from django.db import connections
 
+from events.metrics import REFUNDS, REFUNDS_PENDING, REFUND_SECONDS
 from events.models import RefundRequest
 
+# Refunds sent to the gateway at once, and the minimum spacing between
+# them - mass refunds (e.g. after an event is cancelled) must not trip
+# the gateway rate limits.
+REFUND_CONCURRENCY = 4
+REFUND_MIN_INTERVAL = 0.25
 
-@dramatiq.actor
+# Refunds handled by a single execute_refunds run - the rest is picked
+# up by the next run, queued right after this one finishes.
+REFUND_BATCH_SIZE = 500
+
+
+class Throttle:
+    """Spaces out calls made from multiple threads by a minimum interval."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = max(0.0, self.next_at - now)
+            self.next_at = max(now, self.next_at) + self.min_interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_pending_refunds():
+    return RefundRequest.objects.filter(approved=True, state=RefundRequest.State.PENDING, executed=None)
+
+
+def run_refund(refund: RefundRequest, before_submit=None) -> bool:
+    variant = refund.payment.variant
+    started = time.perf_counter()
+
+    try:
+        refund.execute(before_submit=before_submit)
+    except Exception:
+        logging.exception("Refund %s failed.", refund.id)
+        REFUNDS.labels(variant, "failed").inc()
+        return False
+    finally:
+        REFUND_SECONDS.labels(variant).observe(time.perf_counter() - started)
+
+    REFUNDS.labels(variant, "done").inc()
+    return True
+
+
+@dramatiq.actor(max_retries=0)
 def execute_single_refund(refund_id: str):
-    refund = RefundRequest.objects.get(id=refund_id)
-    refund.execute()
+    refund = RefundRequest.objects.select_related("payment").get(id=refund_id)
+    run_refund(refund)
 
 
-@dramatiq.actor
+@dramatiq.actor(max_retries=0, time_limit=60 * 60 * 1000)
 def execute_refunds():
-    refunds = RefundRequest.objects.filter(approved=True, executed=None)
-    logging.info("Scheduling %d refunds...", refunds.count())
+    refunds = list(get_pending_refunds().select_related("payment").order_by("created")[:REFUND_BATCH_SIZE])
+    logging.info("Executing %d refunds...", len(refunds))
+
+    throttle = Throttle(REFUND_MIN_INTERVAL)
+    remaining = len(refunds)
+    REFUNDS_PENDING.set(remaining)
+
+    def execute(refund: RefundRequest) -> bool:
+        try:
+            return run_refund(refund, before_submit=throttle.wait)
+        finally:
+            # Every pool thread gets its own database connection:
+            connections.close_all()
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=REFUND_CONCURRENCY, thread_name_prefix="refunds") as executor:
+        for succeeded in executor.map(execute, refunds):
+            done += succeeded
+            remaining -= 1
+            REFUNDS_PENDING.set(remaining)
+
+    logging.info("Refunds executed: %d done, %d failed.", done, len(refunds) - done)
 
-    for refund in refunds:
-        execute_single_refund.send(str(refund.id))
+    if len(refunds) == REFUND_BATCH_SIZE and get_pending_refunds().exists():
+        execute_refunds.send()
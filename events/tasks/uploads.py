@@ -0,0 +1,212 @@
+import datetime
+import hashlib
+import logging
+import os
+
+import dramatiq
+from django.core.files.storage import storages
+from django.core.mail import EmailMessage
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.translation import gettext as _
+from dramatiq_crontab import cron
+
+from events.dynaforms.answers import ComplexAnswerFileUpload, ComplexAnswerStagedUpload
+from events.dynaforms.fields import FileField as DynaFileField
+from events.dynaforms.utils import get_pretty_answers
+from events.models import Application, AgePublicKey, StagedUpload
+from events.utils import save_encrypted_file
+
+# Staged uploads are moved or encrypted in their final place by the task
+# below. Files in this directory are never referenced by finished answers.
+UPLOAD_STAGING_DIR = "staging"
+
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+# Resumable uploads not submitted with an application by then are removed:
+STAGED_UPLOAD_EXPIRY = datetime.timedelta(days=1)
+
+# Submissions that failed are kept as they were for this long, so that an
+# admin can fix the cause (e.g. a missing public key) and reprocess them.
+# After that, uploads meant to be encrypted are removed from the staging area.
+FAILED_SUBMISSION_RETENTION = datetime.timedelta(days=14)
+
+
+def get_staged_upload_name(event_slug: str, file_id: str, extension: str) -> str:
+    return f"{UPLOAD_STAGING_DIR}/{event_slug}/{file_id}.{extension}"
+
+
+def get_final_upload_name(application: Application, upload_name: str, field_config: DynaFileField, staged_name: str):
+    # Derived from the staged name, so that retries end up in the same place:
+    basename = os.path.basename(staged_name)
+    if field_config.encrypt:
+        basename = f"{basename}.age"
+
+    return f"{application.event.slug}/{field_config.upload_prefix or upload_name}/{basename}"
+
+
+def get_file_sha256(path: str) -> str:
+    checksum = hashlib.sha256()
+    with open(path, "rb") as handle:
+        while chunk := handle.read(CHECKSUM_CHUNK_SIZE):
+            checksum.update(chunk)
+
+    return checksum.hexdigest()
+
+
+def process_staged_upload(application: Application, upload_name: str, field_config: DynaFileField, staged_name: str):
+    """Encrypts or moves a single staged upload into its final place.
+    Safe to call again for the same file if a previous attempt failed."""
+    storage = storages["private"]
+    final_name = get_final_upload_name(application, upload_name, field_config, staged_name)
+
+    # Final files are only ever created by an atomic rename, so if it's
+    # there, a previous attempt got this far and we can skip the write:
+    if not storage.exists(final_name):
+        if field_config.encrypt:
+            recipients, errors = AgePublicKey.resolve_pubkeys(application.event, field_config.pubkeys)
+            for key, exc in errors.items():
+                logging.warning(f"Could not use the public key '{key}' for application {application.id}: {exc}")
+
+            if not recipients:
+                raise ValueError(f"No public keys found for the '{upload_name}' upload field.")
+
+            with storage.open(staged_name, "rb") as source:
+                save_encrypted_file(storage, final_name, source, recipients)
+        else:
+            final_path = storage.path(final_name)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(storage.path(staged_name), final_path)
+
+    return ComplexAnswerFileUpload(
+        filename=final_name,
+        encrypted=field_config.encrypt,
+        sha256=get_file_sha256(storage.path(final_name)),
+    )
+
+
+def process_staged_uploads(application: Application):
+    storage = storages["private"]
+    dynaform = application.type.get_dynaform()
+
+    for upload_name, answer in list(application.answers.items()):
+        if not (isinstance(answer, dict) and answer.get("kind") == "staged_upload"):
+            continue
+
+        staged = ComplexAnswerStagedUpload.model_validate(answer)
+        field_config: DynaFileField = dynaform.fields[upload_name]
+
+        application.answers[upload_name] = process_staged_upload(
+            application, upload_name, field_config, staged.filename
+        ).model_dump()
+        application.save(update_fields=["answers"])
+
+        if storage.exists(staged.filename):
+            storage.delete(staged.filename)
+
+
+def send_new_application_email(application: Application):
+    pretty_answers = {}
+    if application.answers:
+        pretty_answers = get_pretty_answers(dict(application.answers), application.type.get_dynaform().get_fields())
+
+    EmailMessage(
+        subject=_("%(event)s: Application '%(name)s'") % {"event": application.event.name, "name": application.name},
+        body=render_to_string(
+            "events/emails/new_application.html",
+            {
+                "event": application.event,
+                "application": application,
+                "answers": pretty_answers,
+            },
+        ).strip(),
+        to=application.get_notification_emails(),
+        reply_to=application.get_notification_emails(),
+    ).send()
+
+
+def discard_staged_plaintext(application: Application) -> int:
+    """Removes staged uploads that were supposed to be stored encrypted, so
+    that they do not sit on the disk in plaintext once the failed submission
+    is past its retention. Their answers are cleared, so "reprocess" can
+    still handle the rest. Returns the number of discarded uploads."""
+    storage = storages["private"]
+    dynaform = application.type.get_dynaform()
+
+    discarded = 0
+    for upload_name, answer in list(application.answers.items()):
+        if not (isinstance(answer, dict) and answer.get("kind") == "staged_upload"):
+            continue
+
+        field_config: DynaFileField = dynaform.fields[upload_name]
+        if not field_config.encrypt:
+            continue
+
+        staged = ComplexAnswerStagedUpload.model_validate(answer)
+        if storage.exists(staged.filename):
+            storage.delete(staged.filename)
+
+        logging.error(f"Discarded the unencrypted '{upload_name}' upload of application {application.id}.")
+        application.answers[upload_name] = None
+        discarded += 1
+
+    if discarded:
+        application.save(update_fields=["answers"])
+
+    return discarded
+
+
+@dramatiq.actor
+def fail_application_submission(message_data: dict, retry_info: dict):
+    """Called once process_application_submission runs out of retries. The
+    staged uploads are kept, so "reprocess" can finish the job once the
+    cause is fixed (see collect_failed_submissions)."""
+    Application.objects.filter(id=message_data["args"][0]).update(
+        attachments_state=Application.AttachmentsState.FAILED, updated=datetime.datetime.now()
+    )
+
+
+@dramatiq.actor(max_retries=5, min_backoff=15_000, on_retry_exhausted="fail_application_submission")
+def process_application_submission(application_id: str, language: str):
+    """Finishes the submission: moves the staged uploads into place and
+    sends the notification email, in the applicant's language."""
+    application = Application.objects.select_related("event", "type").get(id=application_id)
+
+    with translation.override(language):
+        if application.attachments_state != Application.AttachmentsState.READY:
+            process_staged_uploads(application)
+            application.attachments_state = Application.AttachmentsState.READY
+            application.save(update_fields=["attachments_state"])
+
+        send_new_application_email(application)
+
+
+@cron("23 * * * *")  # Every hour
+@dramatiq.actor
+def collect_stale_uploads():
+    storage = storages["private"]
+    stale_uploads = StagedUpload.objects.filter(updated__lt=datetime.datetime.now() - STAGED_UPLOAD_EXPIRY)
+
+    removed_uploads = 0
+    for upload in stale_uploads:
+        storage.delete(upload.storage_name)
+        upload.delete()
+        removed_uploads += 1
+
+    collect_stale_uploads.logger.info(f"Removed {removed_uploads} stale upload(s).")
+
+
+@cron("53 3 * * *")  # Every day
+@dramatiq.actor
+def collect_failed_submissions():
+    failed_applications = Application.objects.filter(
+        attachments_state=Application.AttachmentsState.FAILED,
+        updated__lt=datetime.datetime.now() - FAILED_SUBMISSION_RETENTION,
+    ).select_related("type")
+
+    purged_applications = 0
+    for application in failed_applications:
+        if discard_staged_plaintext(application):
+            purged_applications += 1
+
+    collect_failed_submissions.logger.info(f"Purged the staged uploads of {purged_applications} failed submission(s).")
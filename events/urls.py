@@ -11,6 +11,7 @@ from events.views.crew.mod_queue import (
     TicketModQueueListView,
     TicketModQueueDepersonalizeFormView,
     mod_queue_approve_selected,
+    mod_queue_approve_all,
 )
 from events.views.crew.orgs import (
     CrewEventOrgListView,
@@ -27,6 +28,8 @@ from events.views.misc import (
     event_index,
     event_page,
     ticket_picker,
+    ticket_availability,
+    ticket_availability_stream,
     ticket_details,
     ticket_payment,
     ticket_payment_finalize,
@@ -38,8 +41,9 @@ from events.views.orgs import (
     EventOrgTicketCreateView,
     download_invoice,
 )
-from events.views.prometheus import prometheus_status
+from events.views.prometheus import prometheus_process_metrics, prometheus_status
 from events.views.registrations import RegistrationView, CancelRegistrationView, UpdateTicketView
+from events.views.uploads import staged_upload_create, staged_upload
 
 # Note: Only the event/<slug:slug>/ path should end with a slash.
 # All the others should not, if possible.
@@ -55,6 +59,11 @@ urlpatterns = [
         prometheus_status,
         name="prom_stats",
     ),
+    path(
+        "prometheus/<str:key>",
+        prometheus_process_metrics,
+        name="prom_process_metrics",
+    ),
     path(
         "event/<slug:slug>/page/<slug:page_slug>",
         event_page,
@@ -65,6 +74,16 @@ urlpatterns = [
         ticket_picker,
         name="ticket_picker",
     ),
+    path(
+        "event/<slug:slug>/ticket/availability",
+        ticket_availability,
+        name="ticket_availability",
+    ),
+    path(
+        "event/<slug:slug>/ticket/availability/stream",
+        ticket_availability_stream,
+        name="ticket_availability_stream",
+    ),
     path(
         "event/<slug:slug>/ticket/new/<int:id>",
         RegistrationView.as_view(),
@@ -105,6 +124,16 @@ urlpatterns = [
         ApplicationSubmissionView.as_view(),
         name="application_form",
     ),
+    path(
+        "event/<slug:slug>/application/new/<int:id>/upload",
+        staged_upload_create,
+        name="staged_upload_create",
+    ),
+    path(
+        "event/<slug:slug>/upload/<uuid:upload_id>",
+        staged_upload,
+        name="staged_upload",
+    ),
     path(
         "event/<slug:slug>/application/<uuid:app_id>",
         application_details,
@@ -192,6 +221,11 @@ urlpatterns = [
         mod_queue_approve_selected,
         name="mod_queue_approve",
     ),
+    path(
+        "event/<slug:slug>/mod_queue/approve_all",
+        mod_queue_approve_all,
+        name="mod_queue_approve_all",
+    ),
     path(
         "event/<slug:slug>/mod_queue/<uuid:ticket_id>/depersonalize",
         TicketModQueueDepersonalizeFormView.as_view(),
@@ -2,13 +2,14 @@ import hashlib
 import logging
 import os
 import random
-from decimal import Decimal
+import tempfile
 
+import pyrage
 from PIL import Image
 from django.conf import settings
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
-from django.core.files.storage import default_storage
+from django.core.files.storage import default_storage, FileSystemStorage
 from django.core.files.uploadedfile import UploadedFile
 from django.core.validators import validate_email
 from django.http.request import HttpRequest
@@ -36,19 +37,45 @@ def validate_multiple_emails(value: str):
         validate_email(mail.strip())
 
 
-def generate_ticket_codes(event: "events.model.Event", how_many: int) -> list[int]:
+def generate_ticket_codes(
+    event: "events.model.Event",
+    how_many: int,
+    exclude: set[int] | None = None,
+) -> list[int]:
+    """Returns `how_many` distinct random ticket codes not yet used within
+    the given event. Codes listed in `exclude` are treated as taken too."""
     from events.models import Ticket
 
-    # Now for the nasty part: Get ALL the ticket numbers we already
-    # have in the database and generate a new one that does not
-    # conflict with any existing ones.
     maximum_tickets = 10 ** event.ticket_code_length
-    existing_codes = set(Ticket.objects.filter(event_id=event.id).values_list("code", flat=True))
+    exclude = exclude or set()
+    tickets = Ticket.objects.filter(event_id=event.id)
+    taken_count = tickets.count() + len(exclude)
 
-    if len(existing_codes) >= maximum_tickets:
+    if taken_count + how_many > maximum_tickets - 1:
         # Yeah, we're not even gonna try.
         raise ValueError(_("MAXIMUM TICKET CODES REACHED! Contact event organizers with this message."))
 
+    if (taken_count + how_many) * 2 < maximum_tickets:
+        # The code space is mostly empty: draw random candidates and only
+        # ask the database about those instead of loading every code.
+        codes: set[int] = set()
+        for _attempt in range(16):
+            wanted = how_many - len(codes)
+            candidates = {random.randrange(maximum_tickets - 1) for _i in range(wanted * 2)}  # noqa: S311
+            candidates -= codes | exclude
+            candidates -= set(tickets.filter(code__in=candidates).values_list("code", flat=True))
+            codes.update(list(candidates)[:wanted])
+
+            if len(codes) == how_many:
+                result = list(codes)
+                random.shuffle(result)
+                return result
+
+    # Now for the nasty part: Get ALL the ticket numbers we already
+    # have in the database and generate a new one that does not
+    # conflict with any existing ones.
+    existing_codes = set(tickets.values_list("code", flat=True)) | exclude
+
     # Okay, do it the hard way. This is VERY slow with long codes.
     possible_numbers = set(range(maximum_tickets - 1)) - existing_codes
     if len(possible_numbers) < how_many:
@@ -156,70 +183,40 @@ def save_ticket_image(request: HttpRequest, instance: "events.models.Ticket", im
     instance.save()
 
 
-def generate_bulk_refunds(
-        event: "events.models.Event",
-        ticket_types: "tuple[events.models.TicketType | int]",
-        statuses: tuple[str] = ("OKNP", "USED"),
-        target_refund_amount: Decimal | None = None,
-        title: str | None = None,
-):
-    from events.models import Ticket, RefundRequest
-
-    tickets = Ticket.objects.filter(
-        event=event,
-        type_id__in=set(i if isinstance(i, int) else i.id for i in ticket_types),
-        status__in=statuses,
-        contributed_value__gt=0
-    ).prefetch_related("payment_set")
-
-    print(f"Tickets to refund: {len(tickets)}")
-    created_refunds = []
-    faulty_tickets = []
-
-    for ticket in tickets:
-        # Determine the best payment for a ticket:
-        best_payment = None
-        for payment in ticket.payment_set.all():
-            if payment.status != 'confirmed':
-                continue
-
-            if best_payment is None:
-                best_payment = payment
-
-            if payment.captured_amount > best_payment.captured_amount:
-                best_payment = payment
-
-        if best_payment is None:
-            logging.error(f"[{ticket.id}] Ticket is missing a valid target payment to refund!")
-            faulty_tickets.append(ticket)
-            continue
-
-        refund_amount = target_refund_amount
-        if refund_amount is None:
-            refund_amount = ticket.contributed_value.amount
-
-        if refund_amount > ticket.contributed_value.amount:
-            logging.error(f"[{ticket.id}] Ticket has lower total contributed value than the requested refund!")
-            faulty_tickets.append(ticket)
-            continue
-
-        if refund_amount > best_payment.captured_amount:
-            logging.error(f"[{ticket.id}] Determined best payment {best_payment.id} has lower captured amount than the requested refund!")
-            faulty_tickets.append(ticket)
-            continue
-
-        rr = RefundRequest(
-            approved=True,
-            payment=best_payment,
-            amount=refund_amount,
-            title=title,
-        )
+def get_safe_extension(filename: str) -> str:
+    """Returns a lowercase alphanumeric extension of a user-provided filename."""
+    _name, extension = os.path.splitext(filename)
+    extension = extension.strip().strip(".").lower()
+    if not (len(extension) > 0 and extension.isalnum()):
+        extension = "unknown"
 
-        created_refunds.append(rr)
+    return extension
 
-    print(f"About to create {len(created_refunds)} refunds...")
-    RefundRequest.objects.bulk_create(created_refunds)
 
-    print(f"Faulty tickets:")
-    for t in faulty_tickets:
-        print(f"{t.id};{t.get_code()};{t.name};{t.contributed_value}")
+def save_encrypted_file(storage: FileSystemStorage, name: str, source, recipients: list) -> str:
+    """Encrypts `source` for the given age recipients and saves it in the
+    storage, returning the final name. The ciphertext is streamed into a
+    temporary file in the target directory and then moved in place, so
+    memory use does not depend on the file size and readers never see
+    partially written files."""
+    name = storage.get_available_name(name)
+    path = storage.path(name)
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    source.seek(0)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=".upload-", suffix=".tmp", delete=False) as output:
+        try:
+            pyrage.encrypt_io(source, output, recipients=recipients)
+            output.flush()
+            os.fsync(output.fileno())
+        except BaseException:
+            os.unlink(output.name)
+            raise
+
+    if storage.file_permissions_mode is not None:
+        os.chmod(output.name, storage.file_permissions_mode)
+
+    os.replace(output.name, path)
+    return name
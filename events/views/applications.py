@@ -1,33 +1,29 @@
 import datetime
-import os
 import uuid
 
-import pyrage
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.files.base import ContentFile
+from django.db import transaction
 from django.core.files.storage import storages
 from django.core.files.uploadedfile import UploadedFile
 from django.http import Http404
-from django.core.mail import EmailMessage
 from django.shortcuts import get_object_or_404, redirect
 from django.shortcuts import render
-from django.template.loader import render_to_string
 from django.utils.decorators import method_decorator
-from django.utils.translation import gettext as _
+from django.utils.translation import gettext as _, get_language
 from django.views.generic import FormView
-from sentry_sdk import capture_exception
 
-from events.dynaforms.answers import ComplexAnswerFileUpload
-from events.dynaforms.fields import FileField as DynaFileField
-from events.dynaforms.utils import get_pretty_answers
+from events.cache import get_event_or_404
+from events.dynaforms.answers import ComplexAnswerStagedUpload
 from events.forms.applications import ApplicationDynaform, ApplicationStatusSelfServiceForm
-from events.models import Event, ApplicationType, Application, Ticket, AgePublicKey
+from events.models import Event, ApplicationType, Application, Ticket, StagedUpload
+from events.tasks.uploads import get_staged_upload_name, process_application_submission
 from events.templatetags.events import render_markdown
+from events.utils import get_safe_extension
 
 
 def get_event_app_by_id(request, event_slug, app_id, wanted_perm='events.view_application'):
-    event = get_object_or_404(Event, slug=event_slug)
+    event = get_event_or_404(event_slug)
     application = get_object_or_404(Application, id=app_id, event=event)
 
     user_is_submitter = application.user_id == request.user.id
@@ -39,6 +35,46 @@ def get_event_app_by_id(request, event_slug, app_id, wanted_perm='events.view_ap
     return event, application
 
 
+def check_application_submission(
+    application_type: ApplicationType, user, key: str | None
+) -> tuple[str | None, str | None]:
+    """Checks whenever the user can submit an application of this type now.
+    Returns the error message (None if allowed) and the key, if it matched
+    one of the secret keys (which ignore all the other requirements)."""
+    if key:
+        target_keys = [x.strip() for x in application_type.secret_keys.splitlines()]
+        for maybe_key in target_keys:
+            if not maybe_key or maybe_key.startswith("#"):
+                continue
+
+            if key == maybe_key:
+                # Ignore all requirements and just...
+                return None, key
+
+        # If the key is set but did not match any secret keys, unset it:
+        key = None
+
+    if (
+        application_type.requires_valid_ticket
+        and Ticket.objects.filter(event_id=application_type.event_id, user=user)
+        .valid_statuses_only()
+        .not_onsite()
+        .count()
+        < 1
+    ):
+        return _("You must buy a ticket for this event before submitting an application."), key
+
+    now = datetime.datetime.now()
+
+    if not application_type.registration_from < now:
+        return _("This application is not yet open. Come back later."), key
+
+    if not now < application_type.registration_to:
+        return _("This application submission period has ended."), key
+
+    return None, key
+
+
 class ApplicationSubmissionView(FormView):
     event: Event
     type: ApplicationType
@@ -49,7 +85,7 @@ class ApplicationSubmissionView(FormView):
 
     @method_decorator(login_required)
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         self.type = get_object_or_404(ApplicationType, event=self.event, id=self.kwargs["id"])
         self.key = self.request.GET.get("key")
 
@@ -65,38 +101,8 @@ class ApplicationSubmissionView(FormView):
         if self.type.event_id != self.event.id:
             return False, _("This application cannot be submitted for this event!")
 
-        if self.key:
-            target_keys = [x.strip() for x in self.type.secret_keys.splitlines()]
-            for maybe_key in target_keys:
-                if not maybe_key or maybe_key.startswith("#"):
-                    continue
-
-                if self.key == maybe_key:
-                    # Ignore all requirements and just...
-                    return True, None
-
-            # If the key is set but did not match any secret keys, unset it:
-            self.key = None
-
-        if (
-            self.type.requires_valid_ticket
-            and Ticket.objects.filter(event=self.event, user=self.request.user)
-            .valid_statuses_only()
-            .not_onsite()
-            .count()
-            < 1
-        ):
-            return False, _("You must buy a ticket for this event before submitting an application.")
-
-        now = datetime.datetime.now()
-
-        if not self.type.registration_from < now:
-            return False, _("This application is not yet open. Come back later.")
-
-        if not now < self.type.registration_to:
-            return False, _("This application submission period has ended.")
-
-        return True, None
+        error_msg, self.key = check_application_submission(self.type, self.request.user, self.key)
+        return error_msg is None, error_msg
 
     def get_cloned_initial_data(self, application_id: str) -> dict:
         initial = {}
@@ -154,7 +160,7 @@ class ApplicationSubmissionView(FormView):
             {
                 "event": self.event,
                 "application_type": self.type,
-                "template": self.type.template,
+                "user": self.request.user,
             }
         )
         return kwargs
@@ -174,89 +180,66 @@ class ApplicationSubmissionView(FormView):
         prefix = form.dynaform.get_prefix()
         answers = {key.removeprefix(prefix): data for key, data in prefixed_answers.items()}
 
-        # Process file uploads
-        for upload_name, uploaded_file in answers.items():
-            if not isinstance(uploaded_file, UploadedFile):
-                continue
+        # Stage file uploads - these are just moved into the private storage
+        # here, encryption and final placement happen in the background:
+        private_storage = storages["private"]
+        staged_files: list[str] = []
+        resumable_upload_ids: list[str] = []
 
-            field_config: DynaFileField = form.dynaform.fields[upload_name]
-            uploaded_file: UploadedFile
-
-            _name, extension = os.path.splitext(uploaded_file.name)
-            extension = extension.strip().strip(".").lower()
-            if not (len(extension) > 0 and extension.isalnum()):
-                extension = "unknown"
-
-            if field_config.encrypt:
-                recipients, errors = AgePublicKey.resolve_pubkeys(self.event, field_config.pubkeys)
-                for key, exc in errors.items():
-                    if isinstance(exc, AgePublicKey.DoesNotExist):
-                        messages.error(
-                            self.request, _("Public key '%s' required for encryption was not found.") % (key,)
-                        )
-                    else:
-                        # Something went wrong, let Sentry handle this quietly until it happens...
-                        capture_exception(exc)
-
-                if not recipients:
-                    messages.error(
-                        self.request, _("Form template invalid: No public keys found for '%s'.") % (upload_name,)
-                    )
-
-                # TODO: Stream the output to a temporary file on disk, not ContentFile.
-                # While we limit the file upload size anyways, this has potential to break things...
-                encrypted_file = ContentFile(b"")
-                pyrage.encrypt_io(uploaded_file.file, encrypted_file, recipients=recipients)
-
-                extension = f"{extension}.age"
-                file_to_save = encrypted_file
-            else:
-                file_to_save = uploaded_file.file
-
-            filename = f"{self.event.slug}/{field_config.upload_prefix or upload_name}/{uuid.uuid4()}.{extension}"
-            real_filename = storages["private"].save(filename, file_to_save)
-
-            answers[upload_name] = ComplexAnswerFileUpload(
-                filename=real_filename,
-                encrypted=field_config.encrypt,
-            ).model_dump()
-            prefixed_answers[f"{prefix}{upload_name}"] = answers[upload_name]
-
-        form_notes = form.cleaned_data["notes"]
-        if self.key:
-            form_notes = _("[SYSTEM] Form submitted with key:") + f" {self.key}\n" + form_notes
-
-        application = Application(
-            user=self.request.user,
-            event=self.event,
-            type=self.type,
-            status=Application.ApplicationStatus.WAITING,
-            name=form.cleaned_data["name"],
-            email=form.cleaned_data["email"],
-            phone=form.cleaned_data["phone"],
-            notes=form_notes,
-            answers=answers,
-        )
+        try:
+            for upload_name, uploaded_file in answers.items():
+                if isinstance(uploaded_file, StagedUpload):
+                    # Uploaded in chunks before submitting the form, take over the file:
+                    resumable_upload_ids.append(uploaded_file.id)
+                    answers[upload_name] = ComplexAnswerStagedUpload(filename=uploaded_file.storage_name).model_dump()
+                    continue
+
+                if not isinstance(uploaded_file, UploadedFile):
+                    continue
 
-        application.save()
-
-        pretty_answers = {}
-        if application.answers:
-            pretty_answers = get_pretty_answers(prefixed_answers, form.dynamic_fields)
-
-        EmailMessage(
-            subject=_("%(event)s: Application '%(name)s'") % {"event": self.event.name, "name": application.name},
-            body=render_to_string(
-                "events/emails/new_application.html",
-                {
-                    "event": self.event,
-                    "application": application,
-                    "answers": pretty_answers,
-                },
-            ).strip(),
-            to=application.get_notification_emails(),
-            reply_to=application.get_notification_emails(),
-        ).send()
+                uploaded_file: UploadedFile
+
+                extension = get_safe_extension(uploaded_file.name)
+                staged_name = get_staged_upload_name(self.event.slug, str(uuid.uuid4()), extension)
+
+                # Passing the UploadedFile lets the storage move large temporary uploads in place:
+                staged_files.append(private_storage.save(staged_name, uploaded_file))
+                answers[upload_name] = ComplexAnswerStagedUpload(filename=staged_files[-1]).model_dump()
+
+            form_notes = form.cleaned_data["notes"]
+            if self.key:
+                form_notes = _("[SYSTEM] Form submitted with key:") + f" {self.key}\n" + form_notes
+
+            application = Application(
+                user=self.request.user,
+                event=self.event,
+                type=self.type,
+                status=Application.ApplicationStatus.WAITING,
+                name=form.cleaned_data["name"],
+                email=form.cleaned_data["email"],
+                phone=form.cleaned_data["phone"],
+                notes=form_notes,
+                answers=answers,
+            )
+
+            if staged_files or resumable_upload_ids:
+                application.attachments_state = Application.AttachmentsState.PROCESSING
+
+            with transaction.atomic():
+                # Make sure nobody else managed to submit the same uploads in the meantime:
+                claimed, _rows = StagedUpload.objects.filter(id__in=resumable_upload_ids).delete()
+                if claimed != len(resumable_upload_ids):
+                    raise StagedUpload.DoesNotExist("Some of the staged uploads were already used.")
+
+                application.save()
+        except Exception:
+            # Don't leave orphaned files behind if the submission failed:
+            for staged_file in staged_files:
+                private_storage.delete(staged_file)
+            raise
+
+        language = get_language()
+        transaction.on_commit(lambda: process_application_submission.send(str(application.id), language))
 
         if self.type.submission_message:
             notify_msg = render_markdown(self.type.submission_message, strip_wrapper=True)
@@ -323,11 +306,10 @@ class ApplicationStatusSelfServiceView(FormView):
 
 @login_required
 def application_details(request, slug, app_id):
-    from events.dynaforms.fields import Dynaform
     from events.dynaforms.utils import get_pretty_answers
 
     event, application = get_event_app_by_id(request, slug, app_id, 'events.view_application')
-    dynaform = Dynaform.build(None, application.type.template)
+    dynaform = application.type.get_dynaform()
 
     pretty_answers = {}
     if application.answers:
@@ -1,14 +1,16 @@
 from django.contrib import messages
-from django.db.models import Q, F
+from django.db.models import Q
 from django.shortcuts import render, redirect, reverse, get_object_or_404
 from django.utils.translation import gettext as _
 from django.views.generic import FormView, TemplateView
 
+from events.cache import get_event_or_404
 from events.forms.crew import CrewNewTicketForm, CrewFindTicketForm, CrewUseTicketForm
 from events.models import Event, Ticket, TicketType, TicketStatus, TicketSource
 from events.models.notifications import NotificationChannelSource
 from events.tasks.notifications import notify_channel
-from events.utils import generate_ticket_code, generate_ticket_codes, check_event_perms
+from events.issuance import issue_tickets, MAX_TICKETS_PER_ISSUE
+from events.utils import check_event_perms
 
 
 class CrewIndexNewView(FormView):
@@ -18,7 +20,7 @@ class CrewIndexNewView(FormView):
     template_name = "events/crew/index.html"
 
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         check_event_perms(self.request, self.event, ["events.crew_accreditation"])
 
         return super().dispatch(*args, **kwargs)
@@ -46,36 +48,28 @@ class CrewIndexNewView(FormView):
         ticket_type = TicketType.objects.get(id=int(type_id))
 
         how_many = int(form.cleaned_data["how_many"])
-        if not 1 <= form.cleaned_data["how_many"] <= 100:
+        if not 1 <= how_many <= MAX_TICKETS_PER_ISSUE:
             messages.error(self.request, _("Invalid ticket quantity."))
             return redirect("crew_index", self.event.slug)
 
-        if ticket_type.tickets_remaining <= 0:
-            messages.error(self.request, _("We ran out of these tickets."))
-            return redirect("crew_index", self.event.slug)
-
-        codes = generate_ticket_codes(self.event, how_many)
-        tickets = []
-
-        for i in range(how_many):
-            tickets.append(Ticket(
+        try:
+            created_tickets = issue_tickets(
+                self.event,
+                ticket_type,
+                how_many,
                 user=self.request.user,
-                event=self.event,
-                type=ticket_type,
                 name=_("Generated Ticket"),
                 status=TicketStatus.USED,
                 source=TicketSource.ONSITE,
                 payment_method=form.cleaned_data["payment_method"],
                 age_gate=form.cleaned_data["age_gate"],
-                code=codes[i],
-            ))
+            )
+        except ValueError as ex:
+            messages.error(self.request, str(ex))
+            return redirect("crew_index", self.event.slug)
 
-        created_tickets = Ticket.objects.bulk_create(tickets)
         ticket_ids = ",".join(str(t.id) for t in created_tickets)
 
-        ticket_type.tickets_remaining = F("tickets_remaining") - how_many
-        ticket_type.save()
-
         #messages.success(self.request, _("Success - ticket created: ") + t.get_code())
         return redirect(reverse("crew_created_ticket", args=(self.event.slug, ), query={"ticket_ids": ticket_ids}))
 
@@ -87,7 +81,7 @@ class CrewFindTicketView(FormView):
     template_name = "events/crew/list.html"
 
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         check_event_perms(self.request, self.event, ["events.crew_accreditation"])
 
         return super().dispatch(*args, **kwargs)
@@ -156,7 +150,7 @@ class CrewExistingTicketView(FormView):
     template_name = "events/crew/ticket.html"
 
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         check_event_perms(self.request, self.event, ["events.crew_accreditation"])
 
         self.ticket = get_object_or_404(Ticket, id=self.kwargs["ticket_id"])
@@ -225,7 +219,7 @@ class CrewTicketCreatedView(TemplateView):
     template_name = "events/crew/created.html"
 
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         check_event_perms(self.request, self.event, ["events.crew_accreditation"])
 
         ticket_ids = self.request.GET.get("ticket_ids").split(",")
@@ -8,12 +8,22 @@ from django.shortcuts import get_object_or_404, redirect
 from django.utils.translation import gettext as _
 from django.views.generic import FormView, ListView
 
+from events.cache import get_event_or_404
 from events.forms.mod_queue import TicketModQueueDepersonalizeForm
 from events.models import Event, Ticket, TicketStatus
 from events.tasks.ticket_renderer import render_ticket_variants
 from events.utils import delete_ticket_image, check_event_perms
 
 
+def get_mod_queue_tickets(event: Event):
+    """Returns all tickets with customizations that need a moderator's look."""
+    return Ticket.objects.filter(
+        ~Q(nickname="") | ~Q(image=""),
+        event=event,
+        status__in=(TicketStatus.READY, TicketStatus.WAITING_FOR_PAYMENT),
+    )
+
+
 class TicketModQueueListView(ListView):
     event: Event
 
@@ -23,28 +33,25 @@ class TicketModQueueListView(ListView):
     template_name = "events/mod_queue/list.html"
 
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         check_event_perms(self.request, self.event, ["events.crew_mod_queue"])
 
         self.show_all_tickets = self.request.GET.get("all") == "1"
         return super().dispatch(*args, **kwargs)
 
     def get_queryset(self):
-        tickets = Ticket.objects.filter(
-            ~Q(nickname="") | ~Q(image=""),
-            event=self.event,
-            status__in=(TicketStatus.READY, TicketStatus.WAITING_FOR_PAYMENT),
-        )
+        tickets = get_mod_queue_tickets(self.event)
 
         if not self.show_all_tickets:
             tickets = tickets.filter(customization_approved_by=None)
 
-        return tickets.order_by("created")
+        return tickets.select_related("customization_approved_by").order_by("created")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["event"] = self.event
         context["show_all_tickets"] = int(self.show_all_tickets)
+        context["queue_cutoff"] = datetime.datetime.now().isoformat()
         return context
 
 
@@ -56,7 +63,7 @@ class TicketModQueueDepersonalizeFormView(FormView):
     template_name = "events/mod_queue/depersonalize.html"
 
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         check_event_perms(self.request, self.event, ["events.crew_mod_queue"])
 
         self.ticket = get_object_or_404(Ticket, event=self.event, id=self.kwargs["ticket_id"])
@@ -101,7 +108,7 @@ def mod_queue_approve_selected(request, slug, *args, **kwargs):
         messages.error(request, _("This form accepts POST requests only."))
         return redirect("mod_queue_list", slug=slug)
 
-    event = get_object_or_404(Event, slug=slug)
+    event = get_event_or_404(slug)
     check_event_perms(request, event, ["events.crew_mod_queue"])
 
     approval_ids = []
@@ -111,11 +118,49 @@ def mod_queue_approve_selected(request, slug, *args, **kwargs):
 
         approval_ids.append(value)
 
-    tickets = Ticket.objects.filter(event=event, id__in=approval_ids)
-    for ticket in tickets:
-        ticket.customization_approved_by = request.user
-        ticket.customization_approved_on = datetime.datetime.now()
-        ticket.save()
+    now = datetime.datetime.now()
+    Ticket.objects.filter(event=event, id__in=approval_ids).update(
+        customization_approved_by=request.user,
+        customization_approved_on=now,
+        updated=now,
+    )
+
+    return redirect_to_mod_queue(request, event)
+
+
+@transaction.atomic
+def mod_queue_approve_all(request, slug, *args, **kwargs):
+    """Approves every unreviewed ticket in the queue, including the pages
+    the moderator did not open. The cutoff only guarantees that tickets
+    changed after the moderator loaded the queue are left for review."""
+    if request.method != "POST":
+        messages.error(request, _("This form accepts POST requests only."))
+        return redirect("mod_queue_list", slug=slug)
+
+    event = get_event_or_404(slug)
+    check_event_perms(request, event, ["events.crew_mod_queue"])
+
+    try:
+        cutoff = datetime.datetime.fromisoformat(request.POST["queue_cutoff"])
+    except (KeyError, ValueError):
+        messages.error(request, _("Something went wrong... try again?"))
+        return redirect_to_mod_queue(request, event)
+
+    now = datetime.datetime.now()
+    approved = (
+        get_mod_queue_tickets(event)
+        .filter(customization_approved_by=None, updated__lte=cutoff)
+        .update(
+            customization_approved_by=request.user,
+            customization_approved_on=now,
+            updated=now,
+        )
+    )
+
+    messages.success(request, _("Tickets approved: %(count)d") % {"count": approved})
+    return redirect_to_mod_queue(request, event)
+
 
+def redirect_to_mod_queue(request, event: Event):
     base_url = reverse("mod_queue_list", kwargs={"slug": event.slug})
     return redirect(f"{base_url}?page={request.GET.get("page") or 1}&all={request.GET.get("all") or 0}")
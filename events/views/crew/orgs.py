@@ -1,16 +1,20 @@
+import datetime
 import re
+import uuid
+from urllib.parse import urlencode
 
 from django.shortcuts import get_object_or_404, render
 from django.views.generic import ListView, DetailView, FormView
-from django.db import models
-from django.db.models import F, Q, Prefetch
+from django.db.models import Q, Prefetch
 from django.contrib import messages
 from django.db import transaction
 from django.shortcuts import redirect
 from django.utils.translation import gettext as _
 
+from events.cache import get_event_or_404
 from events.models import EventOrg, Event, Ticket, TicketType, TicketStatus, TicketSource, TicketPaymentMethod
-from events.utils import generate_ticket_code, check_event_perms
+from events.issuance import issue_tickets, MAX_TICKETS_PER_ISSUE
+from events.utils import check_event_perms
 from events.models import EventOrgTask
 from events.forms.orgs import OrgAttachTicketForm
 
@@ -18,27 +22,46 @@ from events.forms.orgs import OrgAttachTicketForm
 class CrewEventOrgListView(ListView):
     model = EventOrg
     template_name = "events/crew/orgs/list.html"
+    page_size = 200
 
     event: Event
+    next_page_query: str | None = None
 
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         check_event_perms(self.request, self.event, ["events.crew_orgs"])
 
         return super().dispatch(*args, **kwargs)
 
     def get_queryset(self):
-        return (
+        orgs = (
             EventOrg.objects.filter(event=self.event)
             .select_related("owner", "target_ticket_type")
-            .prefetch_related("task_set", "ticket_set", "billing_details_set")
-            .annotate(tasks_done_count=models.Count("task_set", filter=Q(task_set__done=True)))
-            .order_by("name")
+            .with_stats()
+            .order_by("name", "id")
         )
 
+        # Keyset pagination: continue right after the last (name, id) seen.
+        after_name = self.request.GET.get("after_name")
+        after_id = self.request.GET.get("after_id")
+        if after_name is not None and after_id:
+            try:
+                orgs = orgs.filter(Q(name__gt=after_name) | Q(name=after_name, id__gt=uuid.UUID(after_id)))
+            except ValueError:
+                pass
+
+        orgs = list(orgs[: self.page_size + 1])
+        if len(orgs) > self.page_size:
+            orgs = orgs[: self.page_size]
+            self.next_page_query = urlencode({"after_name": orgs[-1].name, "after_id": str(orgs[-1].id)})
+
+        return orgs
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["event"] = self.event
+        context["next_page_query"] = self.next_page_query
+        context["is_first_page"] = "after_id" not in self.request.GET
         return context
 
 
@@ -50,16 +73,16 @@ class CrewEventOrgDetailView(DetailView):
     org: EventOrg
 
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         check_event_perms(self.request, self.event, ["events.crew_orgs"])
 
-        event_orgs = self.event.eventorg_set.prefetch_related(
-            Prefetch("task_set", queryset=EventOrgTask.objects.order_by("created")),
-            Prefetch("ticket_set", queryset=Ticket.objects.order_by("created")),
-            "invoice_set",
-            "billing_details_set",
-        ).annotate(
-            tasks_done_count=models.Count("task_set", filter=Q(task_set__done=True))
+        event_orgs = (
+            self.event.eventorg_set.select_related("owner", "target_ticket_type")
+            .prefetch_related(
+                Prefetch("task_set", queryset=EventOrgTask.objects.order_by("created")),
+                Prefetch("ticket_set", queryset=Ticket.objects.select_related("type").order_by("created")),
+            )
+            .with_stats()
         )
 
         self.org = get_object_or_404(event_orgs, id=self.kwargs["org_id"])
@@ -73,6 +96,7 @@ class CrewEventOrgDetailView(DetailView):
         context["event"] = self.event
         context["org"] = self.org
         context["is_owner"] = self.org.owner == self.request.user
+        context["max_tickets_per_issue"] = MAX_TICKETS_PER_ISSUE
         return context
 
 
@@ -83,7 +107,7 @@ class CrewAttachTicketsSearchView(FormView):
     template_name = "events/crew/orgs/attach.html"
 
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         check_event_perms(self.request, self.event, ["events.crew_accreditation", "events.change_ticket"])
 
         self.org = get_object_or_404(EventOrg, id=self.kwargs["org_id"])
@@ -123,29 +147,37 @@ def crew_attach_existing_tickets(request, slug, org_id: str, *args, **kwargs):
         messages.error(request, _("This form accepts POST requests only."))
         return redirect("event_index", slug=slug)
 
-    event = get_object_or_404(Event, slug=slug)
+    event = get_event_or_404(slug)
     org = get_object_or_404(EventOrg, id=org_id)
     check_event_perms(request, event, ["events.crew_accreditation", "events.change_ticket"])
 
     ticket_ids = [v for k, v in request.POST.items() if k.startswith("attach-")]
-    tickets: list[Ticket] = (
+    tickets: list[Ticket] = list(
         Ticket.objects
         .filter(event__slug=slug, id__in=ticket_ids)
-        .prefetch_related("event", "type", "type__event")
+        .select_related("event", "type", "type__event")
     )
 
+    now = datetime.datetime.now()
+    status_changed = []
+
     for t in tickets:
         t.original_type = t.type
         t.type = org.target_ticket_type
         t.org = org
+        t.updated = now
 
-        if t.status in ('WAIT', 'WPAY'):
-            t.status = 'OKNP'
+        if t.status in (TicketStatus.WAITING, TicketStatus.WAITING_FOR_PAYMENT):
+            t.status = TicketStatus.READY
+            status_changed.append(t)
 
         if t.contributed_value <= t.get_price():
             t.paid = True
 
-        t.save()
+    Ticket.objects.bulk_update(tickets, ["original_type", "type", "org", "status", "paid", "updated"])
+
+    # Don't keep the rows locked while talking to the mail server:
+    transaction.on_commit(lambda: Ticket.send_status_change_emails(status_changed))
 
     messages.info(request, _("Tickets attached."))
     return redirect("crew_orgs_details", slug, org_id)
@@ -157,7 +189,7 @@ def crew_event_org_generate_tickets(request, slug, org_id: str, *args, **kwargs)
         messages.error(request, _("This form accepts POST requests only."))
         return redirect("event_index", slug=slug)
 
-    event = get_object_or_404(Event, slug=slug)
+    event = get_event_or_404(slug)
     check_event_perms(request, event, ["events.crew_accreditation"])
 
     count = int(request.POST["count"])
@@ -166,7 +198,7 @@ def crew_event_org_generate_tickets(request, slug, org_id: str, *args, **kwargs)
         messages.error(request, _("How many tickets do you want to generate?"))
         return redirect("crew_orgs_details", slug, org_id)
 
-    if count > 20:
+    if count > MAX_TICKETS_PER_ISSUE:
         messages.error(request, _("You're overdoing it!"))
         return redirect("crew_orgs_details", slug, org_id)
 
@@ -178,32 +210,26 @@ def crew_event_org_generate_tickets(request, slug, org_id: str, *args, **kwargs)
         messages.error(request, _("Ticket type not found, or not valid for this event on-site!"))
         return redirect("crew_orgs_details", slug, org_id)
 
-    if ttype.tickets_remaining < count:
-        messages.error(request, _("We ran out of these tickets."))
-        return redirect("crew_orgs_details", slug, org_id)
-
     is_of_age = request.POST.get("is_of_age") == "1"
 
-    codes = []
-    for _ticket_no in range(count):
-        t = Ticket(
+    try:
+        tickets = issue_tickets(
+            event,
+            ttype,
+            count,
             user=request.user,
-            event=event,
-            type=ttype,
             org_id=org_id,
             name=_("Generated Ticket"),
             status=TicketStatus.USED,
             source=TicketSource.ONSITE,
             payment_method=TicketPaymentMethod.OTHER,
             age_gate=is_of_age,
-            code=generate_ticket_code(event),
         )
+    except ValueError as ex:
+        messages.error(request, str(ex))
+        return redirect("crew_orgs_details", slug, org_id)
 
-        t.save()
-        codes.append(t.get_code())
-
-    ttype.tickets_remaining = F("tickets_remaining") - 1
-    ttype.save()
+    codes = [t.get_code() for t in tickets]
 
     messages.success(request, _("Success - tickets created: ") + ", ".join(codes))
     return redirect("crew_orgs_details", slug, org_id)
@@ -215,7 +241,7 @@ def crew_event_org_add_task(request, slug, org_id: str, *args, **kwargs):
         messages.error(request, _("This form accepts POST requests only."))
         return redirect("event_index", slug=slug)
 
-    event = get_object_or_404(Event, slug=slug)
+    event = get_event_or_404(slug)
     check_event_perms(request, event, ["events.crew_orgs_view_tasks"])
 
     content = request.POST["name"].strip()
@@ -241,7 +267,7 @@ def crew_event_org_update_task(request, slug, org_id: str, task_id: str, *args,
         messages.error(request, _("This form accepts POST requests only."))
         return redirect("event_index", slug=slug)
 
-    event = get_object_or_404(Event, slug=slug)
+    event = get_event_or_404(slug)
     check_event_perms(request, event, ["events.crew_orgs_view_tasks"])
 
     task = EventOrgTask.objects.get(id=task_id, event_org_id=org_id)
@@ -261,14 +287,14 @@ class CrewEventOrgTicketListView(ListView):
     org: EventOrg
 
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         check_event_perms(self.request, self.event, ["events.crew_orgs", "events.crew_accreditation"])
 
         self.org = get_object_or_404(EventOrg, id=self.kwargs["org_id"])
         return super().dispatch(*args, **kwargs)
 
     def get_queryset(self):
-        return self.org.ticket_set.all()
+        return self.org.ticket_set.select_related("type")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -5,15 +5,18 @@ from crispy_forms.layout import Submit
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import Http404
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404, reverse
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _
 from payments import RedirectNeeded, PaymentStatus
 
+from events.availability import AvailabilityStream, availability_streams, get_event_availability
+from events.cache import get_event_or_404, get_event_page_or_404, get_event_public_fragments
 from events.forms.registration import UpdateTicketForm
-from events.models import Event, EventPage, Application, ApplicationType, Payment
+from events.models import Event, Application, Payment
 from events.models.orgs import EventOrg
 from events.models.tickets import Ticket, TicketType, TicketStatus
 
@@ -28,92 +31,55 @@ def index(request):
 
 
 def event_index(request, slug):
-    event = get_object_or_404(Event, slug=slug)
-
-    now = datetime.datetime.now()
-    context = {"event": event}
+    event = get_event_or_404(slug)
+    context = {"event": event, "event_public": get_event_public_fragments(event)}
 
     if request.user.is_authenticated:
         # fmt: off
         # Black makes all this difficult to read :(
 
-        user_tickets = (
+        user_tickets = list(
             Ticket.objects.filter(event=event, user=request.user)
             .not_onsite()
-            .prefetch_related("event", "type", "type__event", "org")
+            .select_related("type", "org")
             .order_by('id')
         )
 
+        for ticket in user_tickets:
+            ticket.event = event
+
         context["tickets"] = user_tickets
-        context["valid_tickets"] = user_tickets.valid_statuses_only()
+        context["valid_tickets"] = [t for t in user_tickets if t.status in (TicketStatus.READY, TicketStatus.USED)]
 
         context["applications"] = (
             Application.objects.filter(event=event)
             .filter(user=request.user)
-            .prefetch_related("event", "type", "type__event")
+            .select_related("type")
             .order_by("id")
         )
 
         context["orgs"] = (
             EventOrg.objects.filter(event=event)
             .filter(owner=request.user)
-            .prefetch_related(
-                "ticket_set",
-                "ticket_set__type",
-                "ticket_set__event",
-                "ticket_set__type__event",
-                "target_ticket_type"
-            )
+            .select_related("target_ticket_type")
+            .prefetch_related(Prefetch("ticket_set", queryset=Ticket.objects.select_related("type")))
             .order_by("name")
         )
-
-        ticket_types = (
-            TicketType.objects.filter(event=event)
-            .filter(self_registration=True)
-            .filter(tickets_remaining__gt=0)
-        )
-
-        purchasable_ticket_types = (
-            ticket_types.filter(registration_to__gte=now)
-            .filter(registration_from__lte=now)
-            .count()
-        )
-
-        purchasable_in_future = (
-            ticket_types.filter(registration_from__gt=now)
-            .count()
-        )
-
-        context["can_purchase_tickets"] = purchasable_ticket_types > 0
-        context["can_purchase_in_future"] = purchasable_in_future > 0
-
-        context["new_application_types"] = (
-            ApplicationType.objects.filter(event=event)
-            .filter(registration_to__gte=now)
-            .filter(registration_from__lte=now)
-            .order_by("slug")
-        )
         # fmt: on
 
     return render(request, "events/index.html", context)
 
 
 def event_page(request, slug, page_slug):
-    event = get_object_or_404(Event, slug=slug)
-    try:
-        page = EventPage.objects.get(event=event, slug=page_slug)
-    except EventPage.DoesNotExist:
-        try:
-            page = EventPage.objects.get(event=None, slug=page_slug)
-        except EventPage.DoesNotExist:
-            raise Http404("Page not found.") from None
+    event = get_event_or_404(slug)
+    page = get_event_page_or_404(event, page_slug)
 
     return render(request, "events/events/page.html", context={"event": event, "event_page": page})
 
 
 @login_required
 def ticket_picker(request, slug):
-    event = get_object_or_404(Event, slug=slug)
+    event = get_event_or_404(slug)
     now = datetime.datetime.now()
 
     types = (
@@ -144,8 +110,29 @@ def ticket_picker(request, slug):
     )
 
 
+def ticket_availability(request, slug):
+    event = get_event_or_404(slug)
+    response = JsonResponse(get_event_availability(event))
+    response["Cache-Control"] = "max-age=2"
+    return response
+
+
+def ticket_availability_stream(request, slug):
+    event = get_event_or_404(slug)
+
+    # Every stream holds a worker thread - if we're out of slots, clients
+    # will notice the error and fall back to polling the JSON endpoint:
+    if not availability_streams.acquire(blocking=False):
+        return JsonResponse({"error": "Too many availability streams, poll instead."}, status=503)
+
+    response = StreamingHttpResponse(AvailabilityStream(event), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 def get_event_and_ticket(slug, ticket_id) -> tuple[Event, Ticket]:
-    event = get_object_or_404(Event, slug=slug)
+    event = get_event_or_404(slug)
     ticket = get_object_or_404(Ticket, id=ticket_id, event=event)
     return event, ticket
 
@@ -181,23 +168,12 @@ def ticket_details(request, slug, ticket_id):
 
 def ticket_post_registration(request, slug, ticket_id):
     event, ticket = get_event_and_ticket(slug, ticket_id)
-    now = datetime.datetime.now()
     context = {
         "event": event,
         "ticket": ticket,
+        "can_purchase_tickets": get_event_public_fragments(event).can_purchase_tickets,
     }
 
-    purchasables = (
-        TicketType.objects.filter(event=event)
-        .filter(self_registration=True)
-        .filter(tickets_remaining__gt=0)
-        .filter(registration_to__gte=now)
-        .filter(registration_from__lte=now)
-        .count()
-    )
-
-    context["can_purchase_tickets"] = purchasables > 0
-
     return render(request, "events/tickets/post_registration.html", context)
 
 
@@ -267,11 +243,13 @@ def ticket_payment(request, slug, ticket_id):
             messages.success(request, _("This ticket was already paid for. Thank you!"))
             return redirect("event_index", event.slug)
 
-        # Can we restore any payment in progress?
+        # Can we restore any payment in progress? Once the transaction
+        # registered with the gateway expires, start a new payment instead.
         if (
             payment is None
             and can_restore_payment_in_progress
             and existing_payment.status in (PaymentStatus.WAITING, PaymentStatus.INPUT)
+            and not existing_payment.is_gateway_url_expired()
         ):
             # If multiple payments are eligible for resuming,
             # just use the last one on the list.
@@ -11,16 +11,16 @@ from django.views.generic.edit import FormView
 from django.views.generic.detail import DetailView
 from django.http import FileResponse
 
+from events.cache import get_event_or_404
 from events.forms.orgs import BillingDetailsForm
 from events.forms.registration import EventOrgTicketRegistrationForm
 from events.models import Event, EventOrg, EventOrgInvoice, EventOrgBillingDetails, User
-from events.models.tickets import Ticket, TicketStatus, TicketSource, TicketPaymentMethod
-from events.tasks.ticket_renderer import render_ticket_variants
-from events.utils import generate_ticket_code
+from events.issuance import issue_tickets
+from events.models.tickets import TicketStatus, TicketSource, TicketPaymentMethod
 
 
 def get_event_and_org(slug, org_id) -> tuple[Event, EventOrg]:
-    event = get_object_or_404(Event, slug=slug)
+    event = get_event_or_404(slug)
     org = get_object_or_404(EventOrg, event=event, id=org_id)
     return event, org
 
@@ -178,36 +178,30 @@ class EventOrgTicketCreateView(FormView):
         return context
 
     def form_valid(self, form):
-        ticket = Ticket(
-            user=self.request.user,
-            event=self.event,
-            type=self.org.target_ticket_type,
-            org=self.org,
-            status=TicketStatus.READY,
-            source=TicketSource.ONLINE,
-            payment_method=TicketPaymentMethod.OTHER,
-            name=form.cleaned_data["name"],
-            email=form.cleaned_data["email"],
-            phone=form.cleaned_data["phone"],
-            city=form.cleaned_data["city"],
-            age_gate=form.cleaned_data["age_gate"],
-            notes=form.cleaned_data.get("notes"),
-        )
-
         try:
-            ticket.code = generate_ticket_code(self.event)
+            # Org tickets come from the org's own allocation
+            # (target_ticket_count), not from the public ticket pool.
+            issue_tickets(
+                self.event,
+                self.org.target_ticket_type,
+                1,
+                reserve_inventory=False,
+                user=self.request.user,
+                org=self.org,
+                status=TicketStatus.READY,
+                source=TicketSource.ONLINE,
+                payment_method=TicketPaymentMethod.OTHER,
+                name=form.cleaned_data["name"],
+                email=form.cleaned_data["email"],
+                phone=form.cleaned_data["phone"],
+                city=form.cleaned_data["city"],
+                age_gate=form.cleaned_data["age_gate"],
+                notes=form.cleaned_data.get("notes"),
+            )
         except ValueError as ex:
             messages.error(self.request, str(ex))
             return redirect("event_index", self.event.slug)
 
-        try:
-            ticket.save()
-        except Exception as ex:  # noqa
-            return redirect("event_index", self.event.slug)
-
-        if ticket.type.can_personalize:
-            render_ticket_variants.send(str(ticket.id))
-
         messages.success(
             self.request,
             _("Thank you for your registration! You can see your ticket details below."),
@@ -2,10 +2,12 @@ from abc import ABC, abstractmethod
 from collections.abc import Callable
 
 import django.http
+from django.conf import settings
 from django.db.models import Q
-from django.shortcuts import get_object_or_404
 
-from events.models import Event, TicketStatus, Ticket
+from events.cache import get_event_or_404
+from events.metrics import get_process_metrics_output
+from events.models import TicketStatus, Ticket
 
 
 class Counter(ABC):
@@ -71,7 +73,7 @@ class FloatGaugeCounter(GaugeCounter):
 
 
 def prometheus_status(request, slug, key):
-    event = get_object_or_404(Event, slug=slug)
+    event = get_event_or_404(slug)
     if not event.prometheus_key or key != event.prometheus_key:
         return django.http.response.HttpResponseForbidden("yeet the ayyyys")
 
@@ -122,3 +124,12 @@ def prometheus_status(request, slug, key):
 
     output_metrics.append("")  # Some tools dislike the final missing \n
     return django.http.response.HttpResponse("\n".join(output_metrics))
+
+
+def prometheus_process_metrics(request, key):
+    """Process-global metrics, shared by all events - these have no event
+    label, so they are exposed once here instead of on every event."""
+    if not settings.PROMETHEUS_METRICS_KEY or key != settings.PROMETHEUS_METRICS_KEY:
+        return django.http.response.HttpResponseForbidden("yeet the ayyyys")
+
+    return django.http.response.HttpResponse(get_process_metrics_output())
@@ -1,14 +1,12 @@
 import logging
 from datetime import datetime, timedelta
 
-import django.db.utils
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.humanize.templatetags.humanize import naturaltime
 from django.core.cache import caches
 from django.core.mail import EmailMessage
-from django.db.models import F
 from django.shortcuts import get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.utils.decorators import method_decorator
@@ -16,7 +14,9 @@ from django.utils.html import mark_safe
 from django.utils.translation import gettext as _
 from django.views.generic import FormView
 
+from events.cache import get_event_or_404, get_ticket_type_or_404
 from events.forms.registration import RegistrationForm, CancelRegistrationForm, UpdateTicketForm
+from events.issuance import reserve_tickets, release_tickets
 from events.models.events import Event
 from events.models.tickets import Ticket, TicketType, OnlinePaymentPolicy, TicketStatus, TicketSource, TicketPaymentMethod
 from events.tasks.ticket_renderer import render_ticket_variants
@@ -37,8 +37,8 @@ class RegistrationView(FormView):
 
     @method_decorator(login_required)
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
-        self.type = get_object_or_404(TicketType, event=self.event, id=self.kwargs["id"])
+        self.event = get_event_or_404(self.kwargs["slug"])
+        self.type = get_ticket_type_or_404(self.event, self.kwargs["id"])
 
         if not self.validate_ticket_type():
             return redirect("event_index", self.event.slug)
@@ -149,18 +149,16 @@ class RegistrationView(FormView):
                 ticket.status_deadline = datetime.now() + timedelta(minutes=self.type.online_payment_window)
 
         try:
-            self.type.tickets_remaining = F("tickets_remaining") - 1
-            self.type.save()
-        except django.db.utils.IntegrityError:
-            messages.error(self.request, _("We ran out of these tickets."))
+            reserve_tickets(self.type, 1)
+        except ValueError as ex:
+            messages.error(self.request, str(ex))
             return redirect("event_index", self.event.slug)
 
         try:
             ticket.save()
         except Exception as ex:  # noqa
             logging.exception("Could not save a new ticket, bumping back the remaining tickets counter...")
-            self.type.tickets_remaining = F("tickets_remaining") + 1
-            self.type.save()
+            release_tickets(self.type, 1)
 
             messages.error(
                 self.request,
@@ -222,7 +220,7 @@ class CancelRegistrationView(FormView):
 
     @method_decorator(login_required)
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         self.ticket = get_object_or_404(Ticket, event=self.event, id=self.kwargs["ticket_id"])
 
         if self.request.user.id != self.ticket.user_id:
@@ -269,9 +267,7 @@ class CancelRegistrationView(FormView):
         self.ticket.status = TicketStatus.CANCELLED
         self.ticket.save()
 
-        ticket_type = TicketType.objects.get(id=self.ticket.type_id)
-        ticket_type.tickets_remaining += 1
-        ticket_type.save()
+        release_tickets(self.ticket.type, 1)
 
         messages.info(self.request, _("Ticket cancelled."))
         return redirect("event_index", self.event.slug)
@@ -286,7 +282,7 @@ class UpdateTicketView(FormView):
 
     @method_decorator(login_required)
     def dispatch(self, *args, **kwargs):
-        self.event = get_object_or_404(Event, slug=self.kwargs["slug"])
+        self.event = get_event_or_404(self.kwargs["slug"])
         self.ticket = get_object_or_404(Ticket, event=self.event, id=self.kwargs["ticket_id"])
 
         if self.request.user.id != self.ticket.user_id:
@@ -0,0 +1,211 @@
+import base64
+import binascii
+import datetime
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.files.storage import storages
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.shortcuts import get_object_or_404, reverse
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
+
+from events.cache import get_event_or_404
+from events.dynaforms.fields import FileField as DynaFileField
+from events.models import ApplicationType, StagedUpload, User
+from events.tasks.uploads import get_staged_upload_name
+from events.views.applications import check_application_submission
+from events.utils import get_safe_extension
+
+# A minimal subset of the tus protocol (https://tus.io/protocols/resumable-upload):
+# creation, offset lookups via HEAD, PATCH appends and sha256 chunk checksums.
+TUS_VERSION = "1.0.0"
+TUS_CHECKSUM_MISMATCH = 460
+
+UPLOAD_READ_SIZE = 64 * 1024
+
+
+def tus_response(status: int, headers: dict | None = None) -> HttpResponse:
+    response = HttpResponse(status=status)
+    response["Tus-Resumable"] = TUS_VERSION
+    response["Cache-Control"] = "no-store"
+
+    for key, value in (headers or {}).items():
+        response[key] = str(value)
+
+    return response
+
+
+def parse_upload_metadata(header: str) -> dict[str, str]:
+    """Parses the tus Upload-Metadata header: comma-separated pairs of
+    keys and base64-encoded values."""
+    metadata = {}
+    for pair in header.split(","):
+        key, _sep, value = pair.strip().partition(" ")
+        if key:
+            metadata[key] = base64.b64decode(value, validate=True).decode() if value else ""
+
+    return metadata
+
+
+def parse_upload_checksum(header: str | None) -> bytes | None:
+    if not header:
+        return None
+
+    algorithm, _sep, value = header.partition(" ")
+    if algorithm != "sha256":
+        raise ValueError(f"Unsupported checksum algorithm: {algorithm}")
+
+    return base64.b64decode(value, validate=True)
+
+
+def can_upload_for(request, application_type: ApplicationType) -> bool:
+    """Same requirements as submitting the application itself. Secret keys
+    are passed in the query string, same as on the application form."""
+    error_msg, _key = check_application_submission(application_type, request.user, request.GET.get("key"))
+    return error_msg is None
+
+
+@require_POST
+@login_required
+def staged_upload_create(request, slug, id):
+    event = get_event_or_404(slug)
+    application_type = get_object_or_404(ApplicationType, event=event, id=id)
+
+    if not can_upload_for(request, application_type):
+        return tus_response(403)
+
+    try:
+        metadata = parse_upload_metadata(request.headers.get("Upload-Metadata", ""))
+        size = int(request.headers["Upload-Length"])
+    except (KeyError, ValueError, binascii.Error, UnicodeDecodeError):
+        return tus_response(400)
+
+    field_name = metadata.get("field", "")
+    if not isinstance(application_type.get_dynaform().fields.get(field_name), DynaFileField):
+        return tus_response(400)
+
+    if not 0 < size <= settings.RESUMABLE_UPLOAD_MAX_SIZE:
+        return tus_response(413)
+
+    filename = metadata.get("filename") or "upload"
+    upload = StagedUpload(
+        user=request.user,
+        event=event,
+        application_type=application_type,
+        field_name=field_name,
+        filename=filename[:256],
+        size=size,
+    )
+    upload.storage_name = get_staged_upload_name(event.slug, str(upload.id), get_safe_extension(filename))
+
+    with transaction.atomic():
+        # Serializes the quota checks of concurrent creations by the same user:
+        User.objects.select_for_update().get(id=request.user.id)
+
+        pending = StagedUpload.objects.filter(user=request.user, application_type=application_type).aggregate(
+            count=Count("id"), size=Sum("size", default=0)
+        )
+        if (
+            pending["count"] >= settings.RESUMABLE_UPLOAD_MAX_PENDING
+            or pending["size"] + size > settings.RESUMABLE_UPLOAD_MAX_PENDING_SIZE
+        ):
+            return tus_response(413)
+
+        path = storages["private"].path(upload.storage_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "xb").close()
+
+        upload.save()
+
+    location = reverse("staged_upload", kwargs={"slug": event.slug, "upload_id": upload.id})
+    if key := request.GET.get("key"):
+        location = f"{location}?{urlencode({'key': key})}"
+
+    return tus_response(201, {"Location": location})
+
+
+@login_required
+def staged_upload(request, slug, upload_id):
+    event = get_event_or_404(slug)
+    upload = get_object_or_404(
+        StagedUpload.objects.select_related("application_type"), id=upload_id, event=event, user=request.user
+    )
+
+    if request.method == "HEAD":
+        return tus_response(200, {"Upload-Offset": upload.offset, "Upload-Length": upload.size})
+    elif request.method == "PATCH":
+        if not can_upload_for(request, upload.application_type):
+            return tus_response(403)
+
+        return append_staged_upload_chunk(request, upload)
+    else:
+        return HttpResponseNotAllowed(["HEAD", "PATCH"])
+
+
+def append_staged_upload_chunk(request, upload: StagedUpload) -> HttpResponse:
+    if request.content_type != "application/offset+octet-stream":
+        return tus_response(415)
+
+    try:
+        offset = int(request.headers["Upload-Offset"])
+        length = int(request.headers["Content-Length"])
+        expected_checksum = parse_upload_checksum(request.headers.get("Upload-Checksum"))
+    except (KeyError, ValueError, binascii.Error):
+        return tus_response(400)
+
+    if upload.completed is not None or offset != upload.offset:
+        return tus_response(409, {"Upload-Offset": upload.offset})
+
+    if offset + length > upload.size:
+        return tus_response(413)
+
+    storage_path = storages["private"].path(upload.storage_name)
+    checksum = hashlib.sha256()
+    remaining = length
+
+    # Receive the chunk before taking any locks - slow clients would hold
+    # them for as long as the upload takes. Read the body straight from the
+    # stream, request.body would load it into memory (and trip
+    # DATA_UPLOAD_MAX_MEMORY_SIZE):
+    with tempfile.TemporaryFile(dir=os.path.dirname(storage_path)) as received:
+        while remaining > 0 and (chunk := request.read(min(UPLOAD_READ_SIZE, remaining))):
+            received.write(chunk)
+            checksum.update(chunk)
+            remaining -= len(chunk)
+
+        if expected_checksum is not None and (remaining or checksum.digest() != expected_checksum):
+            # Drop the whole chunk, the client will send it again:
+            return tus_response(TUS_CHECKSUM_MISMATCH, {"Upload-Offset": offset})
+
+        received.seek(0)
+
+        with transaction.atomic():
+            # Serializes concurrent PATCHes to the same upload (e.g. a retry
+            # racing the original request), so offsets stay consistent:
+            upload = StagedUpload.objects.select_for_update().get(id=upload.id)
+
+            if upload.completed is not None or offset != upload.offset:
+                return tus_response(409, {"Upload-Offset": upload.offset})
+
+            with open(storage_path, "r+b") as handle:
+                handle.seek(offset)
+                handle.truncate()
+                shutil.copyfileobj(received, handle, UPLOAD_READ_SIZE)
+                handle.flush()
+                os.fsync(handle.fileno())
+
+            # Without a checksum, keep whatever arrived before a disconnect:
+            upload.offset = offset + length - remaining
+            if upload.offset == upload.size:
+                upload.completed = datetime.datetime.now()
+
+            upload.save(update_fields=["offset", "completed", "updated"])
+
+    return tus_response(204, {"Upload-Offset": upload.offset})
@@ -5,6 +5,7 @@ from dataclasses import asdict, dataclass
 
 import requests
 
+from events.http import GATEWAY_TIMEOUT, ThreadLocalSessions, create_gateway_session, observe_gateway_request
 from .config import Przelewy24Config
 
 logger = logging.getLogger(__name__)
@@ -19,6 +20,7 @@ class Transaction:
     email: str
     country: str
     language: str
+    timeLimit: int = 0  # Minutes to complete the payment, 0 for no limit
 
 
 @dataclass
@@ -35,6 +37,7 @@ class TransactionDTO:
     urlReturn: str
     urlStatus: str
     encoding: str
+    timeLimit: int
     sign: str
 
     # cart: List[ItemDTO]
@@ -61,6 +64,7 @@ class TransactionDTO:
             urlReturn=success_url,
             urlStatus=status_url,
             encoding="UTF-8",
+            timeLimit=transaction.timeLimit,
             sign=sign,
         )
 
@@ -98,16 +102,28 @@ class VerifyDTO:
 class Przelewy24API:
     def __init__(self, config: Przelewy24Config, session=None):
         self._config = config
+        self._session = session
+        self._sessions = ThreadLocalSessions(self._create_session)
         super().__init__()
 
-    def _do(self, method: str, endpoint: str, data=None):
-        response = requests.request(
-            method=method,
-            url=endpoint,
-            json=data,
-            auth=(str(self._config.pos_id), str(self._config.api_key)),
-            timeout=15,
-        )
+    def _create_session(self) -> requests.Session:
+        session = create_gateway_session()
+        session.auth = (str(self._config.pos_id), str(self._config.api_key))
+        return session
+
+    def _get_session(self) -> requests.Session:
+        return self._session or self._sessions.get()
+
+    def _do(self, method: str, endpoint: str, data=None, *, name: str):
+        with observe_gateway_request("przelewy24", name) as observation:
+            response = self._get_session().request(
+                method=method,
+                url=endpoint,
+                json=data,
+                timeout=GATEWAY_TIMEOUT,
+            )
+            observation.status = response.status_code
+
         logger.debug(
             "%s %s: status_code=%s content=%s",
             method,
@@ -123,7 +139,7 @@ class Przelewy24API:
         return hashlib.sha384(json.dumps(kwargs).replace(" ", "").encode("utf-8")).hexdigest()
 
     def testConnection(self) -> bool:
-        response = self._do("GET", self._config.endpoints.testConnection)
+        response = self._do("GET", self._config.endpoints.testConnection, name="test_connection")
         return response["data"]
 
     def register(self, *, transaction: Transaction, success_url: str, status_url: str) -> str:
@@ -136,7 +152,7 @@ class Przelewy24API:
 
         transaction = TransactionDTO.create_from(transaction, self._config, sign, success_url, status_url)
         payload = asdict(transaction)
-        response = self._do("POST", self._config.endpoints.transactionRegister, payload)
+        response = self._do("POST", self._config.endpoints.transactionRegister, payload, name="register")
         token = response["data"]["token"]
         return f"{self._config.endpoints.transactionRequest}/{token}"
 
@@ -149,8 +165,8 @@ class Przelewy24API:
         )
         verify = VerifyDTO.create_from(orderId=orderId, transaction=transaction, config=self._config, sign=sign)
         payload = asdict(verify)
-        response = self._do("PUT", self._config.endpoints.transactionVerify, payload)
+        response = self._do("PUT", self._config.endpoints.transactionVerify, payload, name="verify")
         return response["data"]["status"] == "success"
 
     def get_by_session_id(self, *, session_id: str) -> dict:
-        return self._do("GET", self._config.endpoints.transactionGetBySessionId + session_id)
+        return self._do("GET", self._config.endpoints.transactionGetBySessionId + session_id, name="get_by_session_id")
@@ -38,12 +38,21 @@ class Przelewy24Config:
     api_key: str
     endpoints: Endpoints
 
-    def __init__(self, pos_id: int, merchant_id: int, crc: str, api_key: str, sandbox: bool):
+    def __init__(
+        self,
+        pos_id: int,
+        merchant_id: int,
+        crc: str,
+        api_key: str,
+        sandbox: bool,
+        base_url: str | None = None,
+    ):
         self.pos_id = pos_id
         self.merchant_id = merchant_id
         self.crc = crc
         self.api_key = api_key
-        base_url = SANDBOX_URL if sandbox else PRODUCTION_URL
+        # An explicit base URL (e.g. a local stub gateway) wins over the sandbox switch:
+        base_url = base_url or (SANDBOX_URL if sandbox else PRODUCTION_URL)
 
         logger.info(
             f"Przelewy24 provider configured: base_url={base_url} pos_id={pos_id} merchant_id={merchant_id} crc={crc} api_key={api_key}"
@@ -70,4 +79,5 @@ class Przelewy24Config:
             crc=os.getenv(f"{prefix}P24_CRC", "provide P24 CRC"),
             api_key=os.getenv(f"{prefix}P24_API_KEY", "provide P24 API KEY"),
             sandbox=bool(int(os.getenv(f"{prefix}P24_SANDBOX", "1")) != 0),
+            base_url=os.getenv(f"{prefix}P24_BASE_URL") or None,
         )
@@ -2,6 +2,7 @@ import json
 import logging
 from uuid import uuid4
 from decimal import Decimal
+from datetime import timedelta
 
 import requests
 from django.core.exceptions import ImproperlyConfigured
@@ -12,12 +13,17 @@ from payments.core import BasicProvider
 from payments.models import BasePayment
 from sentry_sdk import capture_exception
 
+from events.models import PaymentWebhook
 from payments_przelewy24.api import Transaction
 from payments_przelewy24.forms import ProcessForm
 from .api import Przelewy24API, Przelewy24Config
 
 CENTS = Decimal("0.01")
 
+# Registered transactions are valid for this long (in minutes). The link is
+# reused a minute less, so the user has a moment to actually pay.
+TRANSACTION_TIME_LIMIT = 15
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,6 +36,7 @@ def _create_transaction_from_payment(payment: BasePayment):
         email=payment.billing_email,
         country=payment.billing_country_code,
         language="pl",  # TODO,
+        timeLimit=TRANSACTION_TIME_LIMIT,
     )
 
 
@@ -49,12 +56,16 @@ class Przelewy24Provider(BasicProvider):
             raise ImproperlyConfigured("Przelewy24 does not support pre-authorization.")
 
     def get_action(self, payment):
+        if url := payment.get_gateway_url():
+            return url
+
         url = self._api.register(
             transaction=_create_transaction_from_payment(payment),
             success_url=payment.get_success_url(),
             status_url=self.get_return_url(payment),
         )
         logger.debug(f"Transaction registered: url={url}")
+        payment.set_gateway_url(url, timedelta(minutes=TRANSACTION_TIME_LIMIT - 1))
         return url
 
     def get_form(self, payment, data=None):
@@ -71,22 +82,19 @@ class Przelewy24Provider(BasicProvider):
         return requests.post(self.endpoint, data=post, timeout=15)
 
     def process_data(self, payment, request):
+        """Checks the notification signature and queues the slow part (the
+        verification call and the status change) for the background worker,
+        so the gateway gets its answer right away."""
         logging.info("Process Przelewy24's notification: body={request.body}")
         try:
             data = json.loads(request.body.decode("utf-8"))
             form = ProcessForm(payment=payment, config=self._config, data=data)
-            if form.is_valid():
-                orderId = data["orderId"]
-                self._api.verify(
-                    transaction=_create_transaction_from_payment(payment),
-                    orderId=orderId,
-                )
-                form.save()
-                payment.change_status(PaymentStatus.CONFIRMED)
-            else:
+            if not form.is_valid():
                 error_str = ", ".join([f"{k}: {v}" for k, v in form.errors.items()])
                 logger.error(error_str)
                 return HttpResponseBadRequest("Failed - incorrect data")
+
+            PaymentWebhook.enqueue(payment, form.cleaned_data["orderId"], PaymentStatus.CONFIRMED, data)
         except Exception as e:
             logger.error(f"{str(e)}, {request.body.decode('utf-8')}")
             capture_exception(e)
@@ -94,6 +102,56 @@ class Przelewy24Provider(BasicProvider):
             return HttpResponseBadRequest("Failed")
         return HttpResponse("OK")
 
+    def verify_webhook(self, payment, data: dict) -> dict:
+        """Verifies the transaction with Przelewy24. Called outside of any
+        database transaction, returns the data for apply_webhook()."""
+        if data.get("reconciled"):
+            # Transaction found by reconcile(), not a signed notification:
+            order_id, statement, amount = data["orderId"], data["statement"], data["amount"]
+            needs_verification = not data.get("verified")
+        else:
+            form = ProcessForm(payment=payment, config=self._config, data=data)
+            if not form.is_valid():
+                raise ValueError(f"Queued notification is no longer valid: {form.errors}")
+
+            order_id, statement, amount = (form.cleaned_data[k] for k in ("orderId", "statement", "amount"))
+            needs_verification = True
+
+        if needs_verification:
+            verified = self._api.verify(
+                transaction=_create_transaction_from_payment(payment),
+                orderId=order_id,
+            )
+            if not verified:
+                raise RuntimeError(f"Przelewy24 did not verify the transaction for payment {payment.id}")
+
+        return {"statement": statement, "amount": amount}
+
+    def apply_webhook(self, payment, data: dict):
+        payment.transaction_id = data["statement"]
+        payment.captured_amount = payment.captured_amount + Decimal(data["amount"]) / 100
+        payment.save()
+        payment.change_status(PaymentStatus.CONFIRMED)
+
+    def reconcile(self, payment) -> tuple[str, str, dict] | None:
+        """Checks a payment whose notification might have been lost. Returns
+        the (transaction ID, status, data) to process like a notification,
+        or None if it was not paid. Runs in worker threads - no queries!"""
+        transaction = self._api.get_by_session_id(session_id=str(payment.pk))["data"]
+
+        # 1 - paid, waiting for our verification, 2 - paid and verified:
+        if transaction.get("status") not in (1, 2):
+            return None
+
+        data = {
+            "reconciled": True,
+            "verified": transaction["status"] == 2,
+            "orderId": transaction["orderId"],
+            "statement": transaction.get("statement", ""),
+            "amount": transaction["amount"],
+        }
+        return str(transaction["orderId"]), PaymentStatus.CONFIRMED, data
+
     def refund(self, payment, amount=None):
         if amount is None:
             amount = payment.captured_amount
@@ -115,6 +173,6 @@ class Przelewy24Provider(BasicProvider):
             }],
         }
 
-        response = self._api._do("POST", self._config.endpoints.transactionRefund, payload)
+        response = self._api._do("POST", self._config.endpoints.transactionRefund, payload, name="refund")
         payment.refund_data = response
         return amount
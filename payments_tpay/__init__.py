@@ -1,10 +1,12 @@
 import json
+import time
 import logging
 import hashlib
 import warnings
 from enum import StrEnum
 from decimal import Decimal
-from urllib.parse import urljoin
+from datetime import timedelta
+from urllib.parse import urljoin, urlsplit
 from typing import TYPE_CHECKING
 
 from django.core.cache import cache
@@ -20,6 +22,8 @@ from joserfc.jwk import RSAKey, KeySet
 from payments import PaymentStatus, get_payment_model
 from payments.core import BasicProvider
 
+from events.http import GATEWAY_TIMEOUT, ThreadLocalSessions, mount_gateway_adapter, observe_gateway_request
+
 if TYPE_CHECKING:
     Payment = get_payment_model()
 
@@ -38,6 +42,16 @@ Nii5pXmnYj5I6xstQbd7FFZN7j7jchqstfFGkkFG6YGrv1ds9e5WWxM+U6ST4u8j
 """)
 
 TPAY_JWS_KEYSET = KeySet([TPAY_JWS_PUBKEY])
+
+# Notification tr_status values and the matching payment statuses:
+TPAY_PAYMENT_STATUSES = {
+    "true": PaymentStatus.CONFIRMED,
+    "chargeback": PaymentStatus.REFUNDED,
+}
+
+# How long a registered transaction payment page is reused for:
+TPAY_PAYMENT_URL_TTL = timedelta(minutes=30)
+
 TPAY_ENVIRONMENTS = {
     "production": "https://api.tpay.com",
     "sandbox": "https://openapi.sandbox.tpay.com",
@@ -47,13 +61,13 @@ TPAY_ENVIRONMENTS = {
 class TpayApiClient(OAuth2Session):
     """
     A wrapper around a requests.Session that automatically handles
-    Tpay base API and session handling. An instance of this class is
-    valid only as long as the token in use is - up to a few minutes,
-    if a cached token is reused, but up to 2 hours otherwise.
-
-    TODO: Handle automatic token refreshing for long-lived clients.
+    Tpay base API and session handling. Clients are long-lived (one
+    per provider and thread) - call ensure_token() before using one
+    to refresh the access token when it is about to expire.
     """
     base_url: str
+    client_secret: str
+    token_refresh_at: float
 
     class Endpoint(StrEnum):
         AUTH = "/oauth/auth"
@@ -67,29 +81,52 @@ class TpayApiClient(OAuth2Session):
             client_secret: str,
     ):
         self.base_url = base_url
+        self.client_secret = client_secret
+        self.token_refresh_at = 0.0
         client = BackendApplicationClient(client_id=client_id)
         super().__init__(client=client)
+        mount_gateway_adapter(self)
+        self.ensure_token()
+
+    def ensure_token(self):
+        if time.time() < self.token_refresh_at:
+            return
 
         token_cache_key = f"tpay-api-client-key.{self.client_id}"
         if cached_key := cache.get(token_cache_key):
-            # Reuse the same key:
+            # Reuse the same key, shared by all workers:
             self.token = json.loads(cached_key)
+            if (expires_at := self.token.get("expires_at")) and (expires_in := self.token.get("expires_in")):
+                self.token_refresh_at = expires_at - expires_in * 0.1
+            else:
+                self.token_refresh_at = time.time() + 60
+            return
+
+        # Fetch a new one (method updates self.token internally):
+        self.token = self.fetch_token(
+            token_url=urljoin(self.base_url, TpayApiClient.Endpoint.AUTH),
+            include_client_id=True,
+            client_secret=self.client_secret,
+        )
+
+        # Reuse it for subsequent requests, refresh when we've got <10% of time left:
+        if token_timeout := self.token.get("expires_in"):
+            cache_timeout = round(token_timeout * 0.9)
+            cache.set(token_cache_key, json.dumps(self.token), timeout=cache_timeout)
+            self.token_refresh_at = time.time() + cache_timeout
         else:
-            # Fetch a new one (method updates self.token internally):
-            self.token = self.fetch_token(
-                token_url=urljoin(self.base_url, TpayApiClient.Endpoint.AUTH),
-                include_client_id=True,
-                client_secret=client_secret,
-            )
-
-            # Reuse it for subsequent requests, refresh when we've got <10% of time left:
-            if token_timeout := self.token.get("expires_in"):
-                cache_timeout = round(token_timeout * 0.9)
-                cache.set(token_cache_key, json.dumps(self.token), timeout=cache_timeout)
-
-    def request(self, method, url, *args, **kwargs):
+            self.token_refresh_at = 0.0
+
+    def request(self, method, url, *args, endpoint: str | None = None, **kwargs):
+        """Pass `endpoint` for paths with IDs, to keep the latency metric labels sane."""
         url = self.create_url(url)
-        return super().request(method, url, *args, **kwargs)
+        kwargs.setdefault("timeout", GATEWAY_TIMEOUT)
+
+        with observe_gateway_request("tpay", endpoint or urlsplit(url).path) as observation:
+            response = super().request(method, url, *args, **kwargs)
+            observation.status = response.status_code
+
+        return response
 
     def prepare_request(self, request):
         """Prepare the request after generating the complete URL."""
@@ -134,10 +171,22 @@ class TpayProvider(BasicProvider):
         if (self.api_url == TPAY_ENVIRONMENTS["production"]) and test_mode:
             warnings.warn("Accepting test mode payments on the production Tpay API endpoint!", RuntimeWarning)
 
+        self._clients = ThreadLocalSessions(
+            lambda: TpayApiClient(self.api_url, self.client_id, self.client_secret)
+        )
+
+    def get_client(self) -> TpayApiClient:
+        client = self._clients.get()
+        client.ensure_token()
+        return client
+
     def get_hidden_fields(self, payment):
         return {}
 
     def get_action(self, payment: "Payment"):
+        if url := payment.get_gateway_url():
+            return url
+
         merchant_description = f"Payment ID {payment.id} - Ticket ID {payment.ticket.id} - User {payment.user.email}"
         payload = {
             "amount": float(payment.total),
@@ -158,8 +207,7 @@ class TpayProvider(BasicProvider):
             },
         }
 
-        client = TpayApiClient(self.api_url, self.client_id, self.client_secret)
-        r = client.post("/transactions", json=payload)
+        r = self.get_client().post(TpayApiClient.Endpoint.TRANSACTIONS, json=payload)
         r.raise_for_status()
         data = r.json()
 
@@ -167,15 +215,55 @@ class TpayProvider(BasicProvider):
         payment.transaction_id = data["title"]
         payment.extra_data = json.dumps(data)
         payment.message = data["title"]
-        payment.save()
 
         url = data["transactionPaymentUrl"]
+        payment.set_gateway_url(url, TPAY_PAYMENT_URL_TTL, save=False)
+        payment.save()
+
         logging.debug(f"Transaction registered: {url=}")
         return url
 
     # get_form - super() only
 
+    def verify_webhook(self, payment, data: dict) -> dict:
+        # The notification signature was checked when it was received:
+        return data
+
+    def apply_webhook(self, payment, data: dict):
+        payment_status = data["tr_status"].strip().lower()
+        logging.debug(f"{payment.id=} being set per {payment_status=}")
+
+        # Capture and save one last time:
+        payment.captured_amount = Decimal(data["tr_paid"])
+        payment.save()
+
+        payment.change_status(TPAY_PAYMENT_STATUSES[payment_status])
+
+    def reconcile(self, payment: "Payment") -> tuple[str, str, dict] | None:
+        """Checks a payment whose notification might have been lost. Returns
+        the (transaction ID, status, data) to process like a notification,
+        or None if it was not paid. Runs in worker threads - no queries!"""
+        transaction_id = json.loads(payment.extra_data or "{}").get("transactionId")
+        if not transaction_id:
+            return None
+
+        r = self.get_client().get(
+            f"{TpayApiClient.Endpoint.TRANSACTIONS}/{transaction_id}",
+            endpoint=f"{TpayApiClient.Endpoint.TRANSACTIONS}/{{id}}",
+        )
+        r.raise_for_status()
+        data = r.json()
+
+        if data.get("status") not in ("correct", "paid"):
+            return None
+
+        amount_paid = (data.get("payments") or {}).get("amountPaid") or data["amount"]
+        return payment.transaction_id, "true", {"tr_status": "true", "tr_paid": str(amount_paid)}
+
     def process_data(self, payment, request):
+        # This module is imported while the app registry is being populated:
+        from events.models import PaymentWebhook
+
         if request.method != "POST":
             return HttpResponseBadRequest("Not a POST request")
 
@@ -211,18 +299,11 @@ class TpayProvider(BasicProvider):
             return HttpResponseBadRequest("Invalid amount paid (expected full, cannot handle other cases yet)")
 
         payment_status = request.POST["tr_status"].strip().lower()
-        logging.debug(f"{payment.id=} being set per {payment_status=}")
-
-        # Capture and save one last time:
-        payment.captured_amount = Decimal(request.POST["tr_paid"])
-        payment.save()
-
-        if payment_status == "true":
-            payment.change_status(PaymentStatus.CONFIRMED)
-        elif payment_status == "chargeback":
-            payment.change_status(PaymentStatus.REFUNDED)
-        else:
+        if payment_status not in TPAY_PAYMENT_STATUSES:
             return HttpResponseBadRequest("Payment status not understood")
 
+        # Status changes (and the ticket updates) happen in the background:
+        PaymentWebhook.enqueue(payment, request.POST["tr_id"], payment_status, request.POST.dict())
+
         # Tpay expects this exact body to ack the notification on their side:
         return HttpResponse("TRUE")